@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Offline traffic-light detection over large sets of archived frames.
+
+The batch counterpart of detect_traffic_lights(): instead of opening
+img_1.jpg..img_N.jpg one after the other, images come from directories,
+glob patterns or a manifest file and are decoded on a thread or process
+pool. A bounded prefetch window keeps the decoders ahead of the detector
+without holding the whole set in memory, decoded images are grouped into
+batched sess.run calls by the MicroBatcher, and post-processing (the same
+postprocess.decide as the API) runs while the next batch is in the detector.
+
+Results are appended to a CSV or JSONL file (by extension) and flushed per
+image. A rerun with the same output file skips the images already in it, so
+an interrupted run resumes where it stopped.
+
+Usage: python batch_detect.py INPUT [INPUT ...] -o results.csv [--model ssd] [--manifest list.txt]
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from batching import MicroBatcher
+from image_decoder import DECODER_CV2, DECODER_DRAFT, DECODER_PIL, ImageDecoder
+from model_registry import CASCADE_MODEL, resolve_model_name
+from postprocess import decide, first_red_wins_from_env
+from prepare_model import preferred_graph_path
+from resize_policy import MODE_MAX_SIDE, MODE_NATIVE, MODE_OFF, ResizePolicy
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+RESULT_FIELDS = ("path", "command", "stop", "traffic_light_detected", "confidence", "error")
+
+
+def collect_inputs(sources, manifest=None):
+    """
+    Image paths to process, in a stable order and without duplicates.
+    :param sources: directories (searched recursively for IMAGE_EXTENSIONS), glob patterns or files
+    :param manifest: optional text file with one image path per line ('#' starts a comment)
+    :return: list of paths
+    """
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            found = [os.path.join(root, name)
+                     for root, _, names in os.walk(source)
+                     for name in names if name.lower().endswith(IMAGE_EXTENSIONS)]
+            paths.extend(sorted(found))
+        elif os.path.isfile(source):
+            paths.append(source)
+        else:
+            paths.extend(sorted(glob.glob(source, recursive=True)))
+    if manifest:
+        with open(manifest) as fid:
+            paths.extend(line.strip() for line in fid if line.strip() and not line.startswith("#"))
+    seen = set()
+    return [p for p in paths if not (p in seen or seen.add(p))]
+
+
+def load_processed(output_path):
+    """Paths already recorded in an existing output file (empty when there is none)."""
+    if not os.path.exists(output_path):
+        return set()
+    with open(output_path, newline="") as fid:
+        if output_path.endswith(".jsonl"):
+            done = set()
+            for line in fid:
+                try:
+                    done.add(json.loads(line)["path"])
+                except (ValueError, KeyError):
+                    continue  # a line cut short by an interrupted run
+            return done
+        return {row["path"] for row in csv.DictReader(fid) if row.get("path")}
+
+
+def _ends_with_newline(path):
+    with open(path, "rb") as fid:
+        fid.seek(-1, os.SEEK_END)
+        return fid.read(1) == b"\n"
+
+
+class ResultWriter:
+    """
+    Appends one result per image to a CSV or JSONL file, flushing each row.
+    :param output_path: file path; ".jsonl" selects JSON lines, anything else CSV
+    """
+
+    def __init__(self, output_path):
+        self.jsonl = output_path.endswith(".jsonl")
+        is_new = not os.path.exists(output_path) or os.path.getsize(output_path) == 0
+        self._fid = open(output_path, "a", newline="")
+        if not is_new and not _ends_with_newline(output_path):
+            self._fid.write("\n")  # end a row cut short by an interrupted run
+        self._csv = None
+        if not self.jsonl:
+            self._csv = csv.DictWriter(self._fid, fieldnames=RESULT_FIELDS)
+            if is_new:
+                self._csv.writeheader()
+
+    def write(self, row):
+        if self.jsonl:
+            self._fid.write(json.dumps(row) + "\n")
+        else:
+            self._csv.writerow(row)
+        self._fid.flush()
+
+    def close(self):
+        self._fid.close()
+
+
+def decode_for_detection(path, resize_mode=MODE_OFF, max_side=1024, model_name=None, decoder=DECODER_PIL):
+    """
+    Decode one image on a pool worker.
+    :return: (RGB uint8 array the colour crops are cut from, detector input array);
+             the first is at full resolution unless `decoder` decoded a JPEG at reduced scale
+    """
+    # Policy and decoder are rebuilt per call so the function stays picklable for process pools
+    policy = ResizePolicy(resize_mode, max_side)
+    with open(path, 'rb') as fid:
+        image = ImageDecoder(decoder, policy).decode(fid.read(), model_name)
+    tensor_image = policy.apply(image, model_name)
+    full = np.asarray(image)
+    return full, full if tensor_image is image else np.asarray(tensor_image)
+
+
+def iter_decoded(paths, executor, prefetch, decode_args=()):
+    """
+    Decode `paths` on `executor`, keeping at most `prefetch` images in flight.
+    :return: iterator of (path, (full, tensor) or exception), in input order
+    """
+    pending = deque()
+    paths = iter(paths)
+    for path in paths:
+        pending.append((path, executor.submit(decode_for_detection, path, *decode_args)))
+        if len(pending) >= prefetch:
+            break
+    while pending:
+        path, future = pending.popleft()
+        next_path = next(paths, None)
+        if next_path is not None:
+            pending.append((next_path, executor.submit(decode_for_detection, next_path, *decode_args)))
+        try:
+            yield path, future.result()
+        except Exception as e:
+            yield path, e
+
+
+def _result_row(path, decision=None, error=None):
+    if error is not None:
+        return {"path": path, "command": None, "stop": None, "traffic_light_detected": None,
+                "confidence": None, "error": error}
+    return {
+        "path": path,
+        "command": "Stop" if decision["stop"] else "Go",
+        "stop": decision["stop"],
+        "traffic_light_detected": decision["traffic_light_detected"],
+        "confidence": round(decision["confidence"], 4),
+        "error": None,
+    }
+
+
+def process_images(decoded, batcher, writer, first_red_wins=True, in_flight=16, progress=None):
+    """
+    Batched detection and post-processing of decoded images.
+    :param decoded: iterator from iter_decoded()
+    :param batcher: MicroBatcher in front of the detector
+    :param writer: ResultWriter (or anything with write(row))
+    :param in_flight: images submitted to the batcher ahead of post-processing
+    :param progress: optional callable(processed_count) called after every image
+    :return: dict with "processed" and "errors" counts
+    """
+    counts = {"processed": 0, "errors": 0}
+    pending = deque()
+
+    def finish(path, full, future, error=None):
+        try:
+            if error is not None:
+                raise error
+            boxes, scores, classes, num = future.result()
+            decision = decide(Image.fromarray(full), np.squeeze(boxes), np.squeeze(scores),
+                              np.squeeze(classes).astype(np.int32), first_red_wins=first_red_wins)
+            writer.write(_result_row(path, decision))
+        except Exception as e:
+            counts["errors"] += 1
+            writer.write(_result_row(path, error=f"{type(e).__name__}: {e}"))
+        counts["processed"] += 1
+        if progress is not None:
+            progress(counts["processed"])
+
+    for path, outcome in decoded:
+        if isinstance(outcome, Exception):
+            # Keep the output in input order: earlier images are finished first
+            while pending:
+                finish(*pending.popleft())
+            finish(path, None, None, outcome)
+            continue
+        full, tensor = outcome
+        pending.append((path, full, batcher.submit(tensor)))
+        if len(pending) >= in_flight:
+            finish(*pending.popleft())
+    while pending:
+        finish(*pending.popleft())
+    return counts
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline traffic-light detection over directories, globs or a manifest.")
+    parser.add_argument("inputs", nargs="*", help="image directories, glob patterns or files")
+    parser.add_argument("--manifest", help="text file with one image path per line")
+    parser.add_argument("-o", "--output", required=True, help="results file (.csv or .jsonl); existing rows are skipped")
+    parser.add_argument("--model", default="faster_rcnn_resnet101_coco_11_06_2017",
+                        help="model name or alias (faster_rcnn / accurate, ssd_mobilenet / ssd / fast)")
+    parser.add_argument("--decode-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--decode-mode", choices=("thread", "process"), default="thread",
+                        help="decode on threads (PIL releases the GIL) or on worker processes")
+    parser.add_argument("--prefetch", type=int, default=64, help="decoded images buffered ahead of the detector")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--batch-window-ms", type=float, default=50.0)
+    parser.add_argument("--pad-multiple", type=int, default=0,
+                        help="zero-pad images to a multiple of this size so mixed resolutions share batches")
+    parser.add_argument("--resize", choices=(MODE_OFF, MODE_MAX_SIDE, MODE_NATIVE), default=MODE_OFF,
+                        help="downscale the detector input (see resize_policy)")
+    parser.add_argument("--max-side", type=int, default=1024)
+    parser.add_argument("--decoder", choices=(DECODER_PIL, DECODER_DRAFT, DECODER_CV2), default=DECODER_PIL,
+                        help="JPEG decoder; draft and cv2 decode at reduced scale when --resize allows it")
+    parser.add_argument("--intra-op-threads", type=int, default=0, help="TF intra-op threads (0 = all cores)")
+    parser.add_argument("--inter-op-threads", type=int, default=0, help="TF inter-op threads (0 = TF default)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    model_name = resolve_model_name(args.model)
+    if model_name == CASCADE_MODEL:
+        sys.exit("The cascade is not supported offline; pick one model")
+    # The same graph the API would load: prepared by prepare_model.py, or a MODEL_VARIANT
+    try:
+        model_path = preferred_graph_path(model_name)
+    except FileNotFoundError as e:
+        sys.exit(str(e))
+    if not os.path.exists(model_path):
+        sys.exit(f"Model graph not found: {model_path}")
+
+    paths = collect_inputs(args.inputs, args.manifest)
+    done = load_processed(args.output)
+    todo = [p for p in paths if p not in done]
+    print(f"{len(paths)} images, {len(paths) - len(todo)} already in {args.output}, {len(todo)} to process",
+          file=sys.stderr)
+    if not todo:
+        return
+
+    from worker_pool import load_engine  # imports tensorflow
+    engine = load_engine(model_path, args.inter_op_threads, args.intra_op_threads)
+    batcher = MicroBatcher(engine.run_batch, max_batch_size=args.batch_size,
+                           window_ms=args.batch_window_ms, pad_multiple=args.pad_multiple)
+    pool_class = ProcessPoolExecutor if args.decode_mode == "process" else ThreadPoolExecutor
+    writer = ResultWriter(args.output)
+    started = time.perf_counter()
+
+    def progress(count):
+        if count % 100 == 0 or count == len(todo):
+            elapsed = time.perf_counter() - started
+            print(f"{count}/{len(todo)} images, {count / elapsed:.1f} img/s", file=sys.stderr)
+
+    try:
+        with pool_class(max_workers=max(1, args.decode_workers)) as executor:
+            decoded = iter_decoded(todo, executor, max(1, args.prefetch),
+                                   (args.resize, args.max_side, model_name, args.decoder))
+            counts = process_images(decoded, batcher, writer, first_red_wins_from_env(),
+                                    in_flight=2 * args.batch_size, progress=progress)
+    finally:
+        writer.close()
+        engine.close()
+    print(f"Done: {counts['processed']} images ({counts['errors']} errors), batching {batcher.stats()}",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Tests for batch_detect."""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from batch_detect import (ResultWriter, collect_inputs, decode_for_detection, iter_decoded, load_processed,
+                          process_images)
+from batching import MicroBatcher
+
+
+def _fake_run_batch(batch):
+    """One red-lit traffic light in the left half of every image."""
+    n = batch.shape[0]
+    boxes = np.tile(np.array([[0.1, 0.1, 0.9, 0.4]], dtype=np.float32), (n, 100, 1))
+    scores = np.zeros((n, 100), dtype=np.float32)
+    scores[:, 0] = 0.9
+    classes = np.ones((n, 100), dtype=np.float32)
+    classes[:, 0] = 10
+    return boxes, scores, classes, np.full((n,), 100.0, dtype=np.float32)
+
+
+class BatchDetectTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.tmp, "frames", "sub"))
+        red = np.zeros((60, 40, 3), dtype=np.uint8)
+        red[..., 0] = 230
+        green = np.zeros((60, 40, 3), dtype=np.uint8)
+        green[..., 1] = 230
+        self.paths = []
+        for name, pixels in (("a.jpg", red), ("b.png", green), ("sub/c.jpg", red)):
+            path = os.path.join(self.tmp, "frames", name)
+            Image.fromarray(pixels).save(path)
+            self.paths.append(path)
+        self.broken = os.path.join(self.tmp, "frames", "broken.jpg")
+        with open(self.broken, "wb") as fid:
+            fid.write(b"not an image")
+        with open(os.path.join(self.tmp, "frames", "notes.txt"), "w") as fid:
+            fid.write("ignored")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def _run(self, paths, output):
+        writer = ResultWriter(output)
+        batcher = MicroBatcher(_fake_run_batch, max_batch_size=4, window_ms=5)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            counts = process_images(iter_decoded(paths, executor, 2), batcher, writer, in_flight=3)
+        writer.close()
+        return counts
+
+    def test_collect_inputs(self):
+        frames = os.path.join(self.tmp, "frames")
+        manifest = os.path.join(self.tmp, "list.txt")
+        with open(manifest, "w") as fid:
+            fid.write("# archived\n" + self.paths[0] + "\n/extra/x.jpg\n\n")
+        paths = collect_inputs([frames, os.path.join(frames, "*.png")], manifest)
+        self.assertEqual(paths, [os.path.join(frames, "a.jpg"), os.path.join(frames, "b.png"),
+                                 self.broken, os.path.join(frames, "sub", "c.jpg"), "/extra/x.jpg"])
+
+    def test_decode_resizes_only_the_detector_input(self):
+        full, tensor = decode_for_detection(self.paths[0], "max_side", 30)
+        self.assertEqual(full.shape, (60, 40, 3))
+        self.assertEqual(tensor.shape, (30, 20, 3))
+        full, tensor = decode_for_detection(self.paths[0])
+        self.assertIs(full, tensor)
+
+    def test_csv_results_in_order_with_errors(self):
+        output = os.path.join(self.tmp, "out.csv")
+        paths = [self.paths[0], self.broken, self.paths[1], self.paths[2]]
+        counts = self._run(paths, output)
+        self.assertEqual(counts, {"processed": 4, "errors": 1})
+        with open(output) as fid:
+            lines = fid.read().splitlines()
+        self.assertEqual(lines[0], "path,command,stop,traffic_light_detected,confidence,error")
+        self.assertEqual([line.split(",")[0] for line in lines[1:]], paths)
+        self.assertEqual([line.split(",")[1] for line in lines[1:]], ["Stop", "", "Go", "Stop"])
+        self.assertEqual(load_processed(output), set(paths))
+
+    def test_jsonl_resume(self):
+        output = os.path.join(self.tmp, "out.jsonl")
+        self._run(self.paths[:2], output)
+        with open(output, "a") as fid:
+            fid.write('{"path": "cut sh')  # interrupted write
+        done = load_processed(output)
+        self.assertEqual(done, set(self.paths[:2]))
+        todo = [p for p in self.paths if p not in done]
+        self.assertEqual(todo, self.paths[2:])
+        self._run(todo, output)
+        self.assertEqual(load_processed(output), set(self.paths))
+        with open(output) as fid:
+            first = json.loads(fid.readline())
+        self.assertEqual(first["command"], "Stop")
+        self.assertTrue(first["traffic_light_detected"])
+
+
+if __name__ == "__main__":
+    unittest.main()
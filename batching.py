@@ -0,0 +1,182 @@
+"""
+Dynamic micro-batching in front of the detection session.
+
+Concurrent requests submit one image each. Background threads collect them
+for up to `window_ms` (or until `max_batch_size` images are queued), groups
+them by resolution and runs one batched inference call per group, then fans
+the per-image results back out to the waiting callers.
+"""
+import os
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class _BatchItem:
+    __slots__ = ("image_np", "future", "enqueued_at")
+
+    def __init__(self, image_np, future):
+        self.image_np = image_np
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class MicroBatcher:
+    """
+    Collects single-image requests into batches for one `run_batch` call.
+    :param run_batch: callable taking a uint8 array [N, H, W, 3] and returning
+                      (boxes, scores, classes, num) with a leading batch dimension
+    :param max_batch_size: maximum number of images per `run_batch` call
+    :param window_ms: how long the first image of a batch waits for company
+    :param pad_multiple: if > 0, images are zero-padded (bottom/right) up to a
+                         multiple of this many pixels so that close resolutions
+                         share a batch; boxes are re-projected to the original
+                         image. 0 groups by exact resolution only.
+    :param concurrency: number of batches that may be in `run_batch` at once,
+                        e.g. one per inference worker process
+    """
+
+    def __init__(self, run_batch, max_batch_size=8, window_ms=10.0, pad_multiple=0, concurrency=1):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.window = max(0.0, float(window_ms)) / 1000.0
+        self.pad_multiple = max(0, int(pad_multiple))
+        self.concurrency = max(1, int(concurrency))
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._images = 0
+        self._sess_runs = 0
+        self._max_observed_batch = 0
+        self._last_batch_ms = 0.0
+        self._last_wait_ms = 0.0
+
+    @classmethod
+    def from_env(cls, run_batch, concurrency=1):
+        """Build a batcher configured from BATCH_MAX_SIZE / BATCH_WINDOW_MS / BATCH_PAD_MULTIPLE."""
+        return cls(
+            run_batch,
+            max_batch_size=int(os.environ.get("BATCH_MAX_SIZE", 8)),
+            window_ms=float(os.environ.get("BATCH_WINDOW_MS", 10)),
+            pad_multiple=int(os.environ.get("BATCH_PAD_MULTIPLE", 0)),
+            concurrency=concurrency,
+        )
+
+    def submit(self, image_np):
+        """
+        Queue one image for detection.
+        :param image_np: uint8 array [H, W, 3]
+        :return: concurrent.futures.Future resolving to (boxes, scores, classes, num)
+                 for this image, without the batch dimension
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put(_BatchItem(image_np, future))
+        return future
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "window_ms": self.window * 1000.0,
+                "pad_multiple": self.pad_multiple,
+                "concurrency": self.concurrency,
+                "queue_depth": self._queue.qsize(),
+                "batches": self._batches,
+                "images": self._images,
+                "sess_runs": self._sess_runs,
+                "mean_batch_size": (self._images / self._batches) if self._batches else 0.0,
+                "max_observed_batch": self._max_observed_batch,
+                "last_batch_ms": round(self._last_batch_ms, 2),
+                "last_queue_wait_ms": round(self._last_wait_ms, 2),
+            }
+
+    def _ensure_started(self):
+        if len(self._threads) == self.concurrency:
+            return
+        with self._lock:
+            while len(self._threads) < self.concurrency:
+                thread = threading.Thread(target=self._loop, name=f"micro-batcher-{len(self._threads)}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _collect(self):
+        items = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(items) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return items
+
+    def _loop(self):
+        while True:
+            items = self._collect()
+            # Drop requests whose callers already gave up
+            items = [item for item in items if item.future.set_running_or_notify_cancel()]
+            if not items:
+                continue
+            started = time.monotonic()
+            groups = {}
+            for item in items:
+                groups.setdefault(self._bucket_shape(item.image_np.shape), []).append(item)
+            for shape, group in groups.items():
+                self._run_group(shape, group)
+            with self._stats_lock:
+                self._batches += 1
+                self._images += len(items)
+                self._sess_runs += len(groups)
+                self._max_observed_batch = max(self._max_observed_batch, len(items))
+                self._last_batch_ms = (time.monotonic() - started) * 1000.0
+                self._last_wait_ms = (started - items[0].enqueued_at) * 1000.0
+
+    def _bucket_shape(self, shape):
+        height, width = shape[0], shape[1]
+        if self.pad_multiple:
+            m = self.pad_multiple
+            height = -(-height // m) * m
+            width = -(-width // m) * m
+        return (height, width, shape[2])
+
+    def _run_group(self, shape, group):
+        try:
+            if self.pad_multiple:
+                batch = np.zeros((len(group),) + shape, dtype=np.uint8)
+                for i, item in enumerate(group):
+                    h, w = item.image_np.shape[:2]
+                    batch[i, :h, :w] = item.image_np
+            else:
+                batch = np.stack([item.image_np for item in group])
+            boxes, scores, classes, num = self.run_batch(batch)
+        except Exception as e:
+            traceback.print_exc()
+            for item in group:
+                item.future.set_exception(e)
+            return
+
+        for i, item in enumerate(group):
+            item_boxes = boxes[i]
+            if self.pad_multiple:
+                item_boxes = _reproject_boxes(item_boxes, shape[:2], item.image_np.shape[:2])
+            item.future.set_result((item_boxes, scores[i], classes[i], num[i]))
+
+
+def _reproject_boxes(boxes, padded_hw, original_hw):
+    """Map normalized boxes from a zero-padded canvas back onto the original image."""
+    scale = np.array([padded_hw[0] / original_hw[0], padded_hw[1] / original_hw[1],
+                      padded_hw[0] / original_hw[0], padded_hw[1] / original_hw[1]],
+                     dtype=np.float32)
+    return np.clip(boxes * scale, 0.0, 1.0)
@@ -0,0 +1,81 @@
+"""Tests for batching."""
+
+import threading
+import unittest
+
+import numpy as np
+
+from batching import MicroBatcher
+
+
+def _fake_run_batch(calls):
+    def run_batch(batch):
+        calls.append(batch.shape)
+        n = batch.shape[0]
+        # Encode each image's first pixel into its score so results can be matched
+        scores = np.tile(batch[:, 0, 0, 0:1].astype(np.float32), (1, 100))
+        boxes = np.tile(np.array([0.0, 0.0, 0.5, 0.5], dtype=np.float32), (n, 100, 1))
+        classes = np.full((n, 100), 10, dtype=np.float32)
+        num = np.full((n,), 100, dtype=np.float32)
+        return boxes, scores, classes, num
+    return run_batch
+
+
+class MicroBatcherTest(unittest.TestCase):
+
+    def _submit_concurrently(self, batcher, images):
+        futures = [None] * len(images)
+        barrier = threading.Barrier(len(images))
+
+        def worker(i):
+            barrier.wait()
+            futures[i] = batcher.submit(images[i])
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(images))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return [f.result(timeout=5) for f in futures]
+
+    def test_concurrent_requests_share_one_run(self):
+        calls = []
+        batcher = MicroBatcher(_fake_run_batch(calls), max_batch_size=4, window_ms=200)
+        images = [np.full((8, 6, 3), i, dtype=np.uint8) for i in range(4)]
+        results = self._submit_concurrently(batcher, images)
+        self.assertEqual(calls, [(4, 8, 6, 3)])
+        for i, (boxes, scores, classes, num) in enumerate(results):
+            self.assertEqual(boxes.shape, (100, 4))
+            self.assertEqual(scores[0], i)
+
+    def test_groups_by_resolution(self):
+        calls = []
+        batcher = MicroBatcher(_fake_run_batch(calls), max_batch_size=4, window_ms=200)
+        images = [np.full((8, 6, 3), 1, dtype=np.uint8), np.full((8, 6, 3), 2, dtype=np.uint8),
+                  np.full((4, 4, 3), 3, dtype=np.uint8), np.full((4, 4, 3), 4, dtype=np.uint8)]
+        results = self._submit_concurrently(batcher, images)
+        self.assertEqual(sorted(calls), [(2, 4, 4, 3), (2, 8, 6, 3)])
+        self.assertEqual([r[1][0] for r in results], [1, 2, 3, 4])
+        self.assertEqual(batcher.stats()["sess_runs"], 2)
+
+    def test_padding_reprojects_boxes(self):
+        calls = []
+        batcher = MicroBatcher(_fake_run_batch(calls), max_batch_size=2, window_ms=200, pad_multiple=16)
+        images = [np.full((8, 8, 3), 1, dtype=np.uint8), np.full((16, 16, 3), 2, dtype=np.uint8)]
+        results = self._submit_concurrently(batcher, images)
+        self.assertEqual(calls, [(2, 16, 16, 3)])
+        # Box covering the top-left half of the padded canvas covers all of the 8x8 image
+        np.testing.assert_allclose(results[0][0][0], [0.0, 0.0, 1.0, 1.0])
+        np.testing.assert_allclose(results[1][0][0], [0.0, 0.0, 0.5, 0.5])
+
+    def test_errors_propagate_to_callers(self):
+        def failing_run_batch(batch):
+            raise RuntimeError("boom")
+        batcher = MicroBatcher(failing_run_batch, max_batch_size=1, window_ms=0)
+        future = batcher.submit(np.zeros((2, 2, 3), dtype=np.uint8))
+        with self.assertRaises(RuntimeError):
+            future.result(timeout=5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark image-to-tensor conversion against the original implementation.
+
+Checks that image_io.load_image_into_numpy_array is bitwise identical to the
+original getdata()-based conversion on every image in test_images/ and on a
+synthetic 1080p frame, then reports timings for both.
+
+Usage: python benchmark_image_io.py [image_dir] [repeats]
+"""
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from image_io import load_image_into_numpy_array
+
+
+def load_image_into_numpy_array_original(image):
+    (im_width, im_height) = image.size
+    return np.array(image.getdata()).reshape(
+        (im_height, im_width, 3)).astype(np.uint8)
+
+
+def _time(fn, image, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(image)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000.0
+
+
+def main():
+    image_dir = sys.argv[1] if len(sys.argv) > 1 else './test_images'
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    images = []
+    for image_path in sorted(glob.glob(os.path.join(image_dir, '*.jpg'))):
+        image = Image.open(image_path)
+        image.load()
+        images.append((os.path.basename(image_path), image))
+    rng = np.random.RandomState(0)
+    images.append(('synthetic_1920x1080', Image.fromarray(rng.randint(0, 256, (1080, 1920, 3), dtype=np.uint8))))
+
+    print(f"{'image':<22}{'size':>12}{'original ms':>14}{'fast ms':>10}{'speedup':>10}  identical")
+    all_identical = True
+    for name, image in images:
+        identical = np.array_equal(load_image_into_numpy_array_original(image),
+                                   load_image_into_numpy_array(image))
+        all_identical = all_identical and identical
+        original_ms = _time(load_image_into_numpy_array_original, image, repeats)
+        fast_ms = _time(load_image_into_numpy_array, image, repeats)
+        size = f"{image.size[0]}x{image.size[1]}"
+        print(f"{name:<22}{size:>12}{original_ms:>14.2f}{fast_ms:>10.3f}{original_ms / fast_ms:>9.0f}x  {identical}")
+
+    if not all_identical:
+        print("❌ Outputs differ from the original conversion")
+        sys.exit(1)
+    print("✅ All outputs are bitwise identical to the original conversion")
+
+
+if __name__ == "__main__":
+    main()
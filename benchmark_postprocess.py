@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-frame post-processing against the original implementation.
+
+The original path classifies every traffic-light box one crop at a time
+(detect_red_and_yellow) and then re-scans the scores for
+traffic_light_detected; postprocess.decide does both in one pass, with and
+without "first red wins". Detector outputs are synthesized for each image in
+test_images/ (a 1080p synthetic frame when there are none), with a varying
+number of lights so that intersections with many lights are covered too.
+The decisions of all three variants are checked to be identical.
+
+Usage: python benchmark_postprocess.py [image_dir] [repeats]
+"""
+import glob
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from postprocess import decide
+
+
+def detect_red_and_yellow_original(img, Threshold=0.01):
+    desired_dim = (30, 90)  # width, height
+    img = cv2.resize(np.array(img), desired_dim, interpolation=cv2.INTER_LINEAR)
+    img_hsv = cv2.cvtColor(img, cv2.COLOR_RGB2HSV)
+    mask0 = cv2.inRange(img_hsv, np.array([0, 70, 50]), np.array([10, 255, 255]))
+    mask1 = cv2.inRange(img_hsv, np.array([170, 70, 50]), np.array([180, 255, 255]))
+    mask2 = cv2.inRange(img_hsv, np.array([21, 39, 64]), np.array([40, 255, 255]))
+    mask = mask0 + mask1 + mask2
+    rate = np.count_nonzero(mask) / (desired_dim[0] * desired_dim[1])
+    return rate > Threshold
+
+
+def postprocess_original(image, boxes, scores, classes):
+    im_width, im_height = image.size
+    stop_flag = False
+    for i in range(min(20, boxes.shape[0])):
+        if scores[i] > 0.5 and classes[i] == 10:
+            ymin, xmin, ymax, xmax = tuple(boxes[i].tolist())
+            left, right = max(0, int(xmin * im_width)), min(im_width, int(xmax * im_width))
+            top, bottom = max(0, int(ymin * im_height)), min(im_height, int(ymax * im_height))
+            if right <= left or bottom <= top:
+                continue
+            if detect_red_and_yellow_original(image.crop((left, top, right, bottom))):
+                stop_flag = True
+    traffic_light_detected = False
+    for i in range(min(20, len(scores))):
+        if scores[i] > 0.5 and classes[i] == 10:
+            traffic_light_detected = True
+            break
+    confidence = float(np.max(scores)) if len(scores) > 0 else 0.0
+    return stop_flag, traffic_light_detected, confidence
+
+
+def synthetic_detections(rng, num_lights):
+    """100 detections sorted by score, the best `num_lights` of them traffic lights."""
+    scores = np.sort(rng.uniform(0.0, 1.0, 100))[::-1].copy()
+    scores[:num_lights] = np.linspace(0.99, 0.55, num_lights) if num_lights else scores[:0]
+    classes = rng.randint(1, 90, 100)
+    classes[classes == 10] = 1
+    classes[:num_lights] = 10
+    ymin = rng.uniform(0.0, 0.8, 100)
+    xmin = rng.uniform(0.0, 0.9, 100)
+    boxes = np.stack([ymin, xmin, ymin + rng.uniform(0.05, 0.2, 100), xmin + rng.uniform(0.02, 0.1, 100)], axis=1)
+    return boxes, scores, classes
+
+
+def _time(fn, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000.0
+
+
+def main():
+    image_dir = sys.argv[1] if len(sys.argv) > 1 else './test_images'
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    images = []
+    for image_path in sorted(glob.glob(os.path.join(image_dir, '*.jpg'))):
+        image = Image.open(image_path).convert('RGB')
+        images.append((os.path.basename(image_path), image))
+    rng = np.random.RandomState(0)
+    if not images:
+        images.append(('synthetic_1920x1080', Image.fromarray(rng.randint(0, 256, (1080, 1920, 3), dtype=np.uint8))))
+
+    print(f"{'image':<14}{'lights':>7}{'original ms':>13}{'single-pass ms':>16}{'first-red ms':>14}  identical")
+    totals = [0.0, 0.0, 0.0]
+    all_identical = True
+    for name, image in images:
+        for num_lights in (0, 3, 12):
+            boxes, scores, classes = synthetic_detections(rng, num_lights)
+            expected = postprocess_original(image, boxes, scores, classes)
+            outcomes = [decide(image, boxes, scores, classes, first_red_wins=mode) for mode in (False, True)]
+            identical = all((d["stop"], d["traffic_light_detected"], d["confidence"]) == expected for d in outcomes)
+            all_identical = all_identical and identical
+
+            timings = [
+                _time(lambda: postprocess_original(image, boxes, scores, classes), repeats),
+                _time(lambda: decide(image, boxes, scores, classes), repeats),
+                _time(lambda: decide(image, boxes, scores, classes, first_red_wins=True), repeats),
+            ]
+            totals = [t + s for t, s in zip(totals, timings)]
+            print(f"{name:<14}{num_lights:>7}{timings[0]:>13.3f}{timings[1]:>16.3f}{timings[2]:>14.3f}  {identical}")
+
+    print(f"{'total':<21}{totals[0]:>13.2f}{totals[1]:>16.2f}{totals[2]:>14.2f}")
+    print(f"speedup: single-pass {totals[0] / totals[1]:.1f}x, first-red-wins {totals[0] / totals[2]:.1f}x")
+    if not all_identical:
+        print("❌ Decisions differ from the original post-processing")
+        sys.exit(1)
+    print("✅ All decisions are identical to the original post-processing")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Compare the quantized model variants against the float32 graph.
+
+Each graph (original, optimized when present, float16, int8) is loaded in
+its own freshly spawned process, so load time and RSS growth are not skewed
+by the graphs loaded before it. Reported per variant: size on disk, load,
+first-run and mean latency, RSS growth, and how often its Go/Stop decision
+agrees with the float32 graph's on the images in test_images/ (or --images).
+"Missed stops" counts images where float32 says STOP and the variant says
+GO, the disagreement that matters for a driver.
+
+Usage: python benchmark_quantized.py [MODEL ...] [--images DIR] [--repeats N]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from model_registry import KNOWN_MODELS, resolve_model_name
+from prepare_model import GRAPH_FILE, OPTIMIZED_GRAPH_FILE, variant_graph_file
+from quantize_model import VARIANT_FLOAT16, VARIANT_INT8
+
+
+def graph_variants(model_name):
+    """(label, path) of every graph of a model that exists on disk, float32 first."""
+    candidates = [
+        ("float32", os.path.join(model_name, GRAPH_FILE)),
+        ("optimized", os.path.join(model_name, OPTIMIZED_GRAPH_FILE)),
+        (VARIANT_FLOAT16, os.path.join(model_name, variant_graph_file(VARIANT_FLOAT16))),
+        (VARIANT_INT8, os.path.join(model_name, variant_graph_file(VARIANT_INT8))),
+    ]
+    return [(label, path) for label, path in candidates if os.path.exists(path)]
+
+
+def compare_decisions(reference, candidate):
+    """
+    Go/Stop agreement of a variant with the reference graph.
+    :param reference: per-image stop flags of the float32 graph
+    :param candidate: per-image stop flags of the variant, same order
+    :return: dict with "agree", "missed_stops" (reference STOP, variant GO) and "extra_stops"
+    """
+    pairs = list(zip(reference, candidate))
+    return {
+        "agree": sum(ref == cand for ref, cand in pairs),
+        "missed_stops": sum(ref and not cand for ref, cand in pairs),
+        "extra_stops": sum(cand and not ref for ref, cand in pairs),
+    }
+
+
+def _benchmark_in_process(path, image_dir, repeats):
+    # Imported here so the parent process never loads TensorFlow
+    from prepare_model import _benchmark_images, benchmark
+
+    images = _benchmark_images(image_dir)
+    timings, decisions = benchmark(path, images, repeats)
+    return timings, [bool(stop) for stop in decisions]
+
+
+def benchmark_isolated(path, image_dir, repeats):
+    """Run prepare_model.benchmark for one graph in a fresh spawned process."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(_benchmark_in_process, path, image_dir, repeats).result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare quantized model variants with the float32 graph.")
+    parser.add_argument("models", nargs="*", help="model names or aliases (default: every bundled model present)")
+    parser.add_argument("--images", default="./test_images", help="validation images (*.jpg)")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    models = [resolve_model_name(name) for name in args.models] or \
+             [name for name in KNOWN_MODELS if os.path.exists(os.path.join(name, GRAPH_FILE))]
+    if not models:
+        sys.exit("No model graphs found; extract a model first")
+
+    print(f"{'model':<40}{'graph':<11}{'MB':>7}{'load ms':>10}{'first ms':>10}{'mean ms':>10}"
+          f"{'speedup':>9}{'RSS MB':>9}{'agree':>9}{'missed':>8}")
+    for model_name in models:
+        variants = graph_variants(model_name)
+        if len(variants) < 2:
+            print(f"{model_name:<40}no variants; run quantize_model.py first")
+            continue
+        reference = None
+        for label, path in variants:
+            timings, decisions = benchmark_isolated(path, args.images, args.repeats)
+            if reference is None:
+                reference = (timings, decisions)
+            ref_timings, ref_decisions = reference
+            delta = compare_decisions(ref_decisions, decisions)
+            print(f"{model_name:<40}{label:<11}{os.path.getsize(path) / 1e6:>7.1f}{timings['load_ms']:>10.0f}"
+                  f"{timings['first_run_ms']:>10.0f}{timings['mean_run_ms']:>10.1f}"
+                  f"{ref_timings['mean_run_ms'] / timings['mean_run_ms']:>8.2f}x"
+                  f"{timings['rss_growth_mb']:>9.0f}{delta['agree']:>5}/{len(decisions):<3}"
+                  f"{delta['missed_stops']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""Tests for benchmark_quantized."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from benchmark_quantized import compare_decisions, graph_variants
+from prepare_model import GRAPH_FILE, variant_graph_file
+
+
+class BenchmarkQuantizedTest(unittest.TestCase):
+
+    def test_compare_decisions(self):
+        reference = [True, True, False, False, True]
+        candidate = [True, False, False, True, True]
+        self.assertEqual(compare_decisions(reference, candidate),
+                         {"agree": 3, "missed_stops": 1, "extra_stops": 1})
+
+    def test_graph_variants_lists_existing_graphs_float32_first(self):
+        model_dir = tempfile.mkdtemp()
+        try:
+            for name in (variant_graph_file("int8"), GRAPH_FILE):
+                open(os.path.join(model_dir, name), "wb").close()
+            self.assertEqual([label for label, _ in graph_variants(model_dir)], ["float32", "int8"])
+        finally:
+            shutil.rmtree(model_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
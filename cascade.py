@@ -0,0 +1,121 @@
+"""
+Two-stage cascade detector.
+
+Every frame goes through the fast model (SSD MobileNet) first. Only when its
+best traffic-light score falls inside an uncertainty band is the frame sent
+to the accurate model (Faster R-CNN); frames that are clearly empty (below the
+band) or clearly contain a light (above it) are answered by the fast model.
+The detector has the same submit() interface as a MicroBatcher, so the
+detection paths do not need to know whether they talk to one model or two.
+"""
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+TRAFFIC_LIGHT_LABEL = 10  # COCO
+
+
+def best_traffic_light_score(scores, classes, traffic_light_label=TRAFFIC_LIGHT_LABEL):
+    """Highest detection score of the traffic-light class (0.0 when there is none)."""
+    scores = np.asarray(scores).ravel()
+    classes = np.asarray(classes).ravel()
+    light_scores = scores[classes == traffic_light_label]
+    return float(light_scores.max()) if light_scores.size else 0.0
+
+
+class CascadeDetector:
+    """
+    Fast model first, accurate model only for ambiguous frames.
+    :param fast_submit: callable(image_np) -> Future of (boxes, scores, classes, num)
+    :param accurate_submit: same, for the accurate model
+    :param low: traffic-light scores below this are treated as "no light"
+    :param high: traffic-light scores at or above this are trusted as-is
+    """
+
+    def __init__(self, fast_submit, accurate_submit, low=0.3, high=0.7):
+        if not 0.0 <= low <= high <= 1.0:
+            raise ValueError(f"Invalid cascade band [{low}, {high})")
+        self._fast_submit = fast_submit
+        self._accurate_submit = accurate_submit
+        self.low = float(low)
+        self.high = float(high)
+        self._lock = threading.Lock()
+        self._frames = 0
+        self._escalations = 0
+        self._fast_seconds = 0.0
+        self._accurate_seconds = 0.0
+
+    @classmethod
+    def from_env(cls, fast_submit, accurate_submit):
+        """Build a cascade from CASCADE_LOW / CASCADE_HIGH (uncertainty band on the fast model's score)."""
+        return cls(fast_submit, accurate_submit,
+                   low=float(os.environ.get('CASCADE_LOW', 0.3)),
+                   high=float(os.environ.get('CASCADE_HIGH', 0.7)))
+
+    def should_escalate(self, scores, classes):
+        return self.low <= best_traffic_light_score(scores, classes) < self.high
+
+    def submit(self, image_np):
+        """
+        Detect on one image.
+        :param image_np: uint8 array [H, W, 3]
+        :return: Future resolving to (boxes, scores, classes, num) of the stage that answered
+        """
+        result = Future()
+        started = time.perf_counter()
+
+        def fast_done(fast_future):
+            fast_seconds = time.perf_counter() - started
+            try:
+                outputs = fast_future.result()
+                escalate = self.should_escalate(outputs[1], outputs[2])
+            except Exception as e:
+                self._record(fast_seconds, None)
+                result.set_exception(e)
+                return
+            if not escalate:
+                self._record(fast_seconds, None)
+                result.set_result(outputs)
+                return
+            escalated = time.perf_counter()
+
+            def accurate_done(accurate_future):
+                self._record(fast_seconds, time.perf_counter() - escalated)
+                try:
+                    result.set_result(accurate_future.result())
+                except Exception as e:
+                    result.set_exception(e)
+
+            try:
+                self._accurate_submit(image_np).add_done_callback(accurate_done)
+            except Exception as e:
+                self._record(fast_seconds, 0.0)
+                result.set_exception(e)
+
+        self._fast_submit(image_np).add_done_callback(fast_done)
+        return result
+
+    def _record(self, fast_seconds, accurate_seconds):
+        with self._lock:
+            self._frames += 1
+            self._fast_seconds += fast_seconds
+            if accurate_seconds is not None:
+                self._escalations += 1
+                self._accurate_seconds += accurate_seconds
+
+    def stats(self):
+        with self._lock:
+            frames, escalations = self._frames, self._escalations
+            return {
+                "band": [self.low, self.high],
+                "frames": frames,
+                "escalations": escalations,
+                "escalation_rate": round(escalations / frames, 4) if frames else 0.0,
+                "fast_stage_avg_ms": round(1000 * self._fast_seconds / frames, 2) if frames else 0.0,
+                "accurate_stage_avg_ms": round(1000 * self._accurate_seconds / escalations, 2) if escalations else 0.0,
+                "avg_ms_per_frame": round(1000 * (self._fast_seconds + self._accurate_seconds) / frames, 2)
+                if frames else 0.0,
+            }
@@ -0,0 +1,58 @@
+"""Tests for cascade."""
+
+import unittest
+from concurrent.futures import Future
+
+import numpy as np
+
+from cascade import CascadeDetector, best_traffic_light_score
+
+
+def _stage(light_score, calls):
+    def submit(image_np):
+        calls.append(image_np.shape)
+        future = Future()
+        scores = np.array([0.9, light_score, 0.1])
+        classes = np.array([1.0, 10.0, 3.0])
+        future.set_result((np.zeros((3, 4)), scores, classes, 3.0))
+        return future
+    return submit
+
+
+class CascadeDetectorTest(unittest.TestCase):
+
+    def test_best_traffic_light_score(self):
+        self.assertEqual(best_traffic_light_score([0.9, 0.4], [1, 10]), 0.4)
+        self.assertEqual(best_traffic_light_score([0.9], [1]), 0.0)
+
+    def test_confident_frames_stay_on_fast_model(self):
+        image = np.zeros((4, 4, 3), dtype=np.uint8)
+        for light_score in (0.05, 0.95):
+            fast_calls, accurate_calls = [], []
+            cascade = CascadeDetector(_stage(light_score, fast_calls), _stage(0.5, accurate_calls))
+            _, scores, _, _ = cascade.submit(image).result(timeout=5)
+            self.assertEqual(scores[1], light_score)
+            self.assertEqual((len(fast_calls), len(accurate_calls)), (1, 0))
+            self.assertEqual(cascade.stats()["escalations"], 0)
+
+    def test_ambiguous_frames_escalate(self):
+        fast_calls, accurate_calls = [], []
+        cascade = CascadeDetector(_stage(0.5, fast_calls), _stage(0.8, accurate_calls), low=0.3, high=0.7)
+        _, scores, _, _ = cascade.submit(np.zeros((4, 4, 3), dtype=np.uint8)).result(timeout=5)
+        self.assertEqual(scores[1], 0.8)
+        self.assertEqual(len(accurate_calls), 1)
+        stats = cascade.stats()
+        self.assertEqual((stats["frames"], stats["escalations"], stats["escalation_rate"]), (1, 1, 1.0))
+
+    def test_stage_errors_propagate(self):
+        def failing(image_np):
+            future = Future()
+            future.set_exception(RuntimeError("boom"))
+            return future
+        cascade = CascadeDetector(failing, failing)
+        with self.assertRaises(RuntimeError):
+            cascade.submit(np.zeros((4, 4, 3), dtype=np.uint8)).result(timeout=5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+"""Tests for color_classifier."""
+
+import unittest
+
+import cv2
+import numpy as np
+
+from color_classifier import box_to_pixels, classify_crops
+
+
+def _reference_rate(crop):
+    """Per-crop rule of detect_red_and_yellow, returning the red/yellow pixel rate."""
+    img = cv2.resize(crop, (30, 90), interpolation=cv2.INTER_LINEAR)
+    hsv = cv2.cvtColor(img, cv2.COLOR_RGB2HSV)
+    mask = (cv2.inRange(hsv, np.array([0, 70, 50]), np.array([10, 255, 255]))
+            + cv2.inRange(hsv, np.array([170, 70, 50]), np.array([180, 255, 255]))
+            + cv2.inRange(hsv, np.array([21, 39, 64]), np.array([40, 255, 255])))
+    return np.count_nonzero(mask) / (30 * 90)
+
+
+class ColorClassifierTest(unittest.TestCase):
+
+    def test_matches_per_crop_rule(self):
+        rng = np.random.RandomState(0)
+        crops = [rng.randint(0, 256, (rng.randint(5, 120), rng.randint(5, 60), 3)).astype(np.uint8)
+                 for _ in range(40)]
+        red, yellow, stop = classify_crops(crops)
+        for i, crop in enumerate(crops):
+            rate = _reference_rate(crop)
+            self.assertAlmostEqual(red[i] + yellow[i], rate)
+            self.assertEqual(bool(stop[i]), rate > 0.01)
+
+    def test_solid_colors(self):
+        red = np.zeros((60, 20, 3), dtype=np.uint8)
+        red[..., 0] = 230
+        yellow = np.zeros((60, 20, 3), dtype=np.uint8)
+        yellow[..., :2] = 230
+        green = np.zeros((60, 20, 3), dtype=np.uint8)
+        green[..., 1] = 230
+        red_ratios, yellow_ratios, stop = classify_crops([red, yellow, green])
+        self.assertEqual(red_ratios.tolist(), [1.0, 0.0, 0.0])
+        self.assertEqual(yellow_ratios.tolist(), [0.0, 1.0, 0.0])
+        self.assertEqual(stop.tolist(), [True, True, False])
+
+    def test_empty_batch(self):
+        red, yellow, stop = classify_crops([])
+        self.assertEqual((red.size, yellow.size, stop.size), (0, 0, 0))
+
+    def test_box_to_pixels_clips_and_skips_empty_boxes(self):
+        self.assertEqual(box_to_pixels([0.0, 0.0, 0.5, 0.5], 100, 50), (0, 0, 50, 25))
+        self.assertEqual(box_to_pixels([0.5, 0.5, 1.5, 1.5], 100, 50), (50, 25, 100, 50))
+        self.assertIsNone(box_to_pixels([0.2, 0.2, 0.2, 0.6], 100, 50))
+        self.assertIsNone(box_to_pixels([0.5, 0.5, 0.5, 0.9], 100, 50))
+
+
+if __name__ == "__main__":
+    unittest.main()
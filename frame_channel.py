@@ -0,0 +1,51 @@
+"""
+Newest-frame mailbox for streaming detection.
+
+A live camera client can send frames faster than the detector answers.
+Queuing them would make every result staler than the last, so the mailbox
+holds at most one pending frame: a new frame replaces the one still waiting
+(which is counted as dropped), and the detector always picks up the newest.
+"""
+import asyncio
+import time
+
+
+class LatestFrameSlot:
+    """Single-slot mailbox of (sequence number, frame data, received time) on one event loop."""
+
+    def __init__(self):
+        self._pending = None
+        self._event = asyncio.Event()
+        self._closed = False
+        self._next_seq = 0
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, data):
+        """Offer a frame, replacing any frame not yet picked up; returns its sequence number."""
+        seq = self._next_seq
+        self._next_seq += 1
+        self.received += 1
+        if self._pending is not None:
+            self.dropped += 1
+        self._pending = (seq, data, time.perf_counter())
+        self._event.set()
+        return seq
+
+    def close(self):
+        """No more frames; get() returns None once the pending frame (if any) is taken."""
+        self._closed = True
+        self._event.set()
+
+    async def get(self):
+        """Wait for the newest frame; None when the slot is closed and empty."""
+        while self._pending is None:
+            if self._closed:
+                return None
+            self._event.clear()
+            await self._event.wait()
+        item, self._pending = self._pending, None
+        return item
+
+    def stats(self):
+        return {"received": self.received, "dropped": self.dropped}
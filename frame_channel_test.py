@@ -0,0 +1,39 @@
+"""Tests for frame_channel."""
+
+import asyncio
+import unittest
+
+from frame_channel import LatestFrameSlot
+
+
+class LatestFrameSlotTest(unittest.TestCase):
+
+    def test_newest_frame_wins(self):
+        async def scenario():
+            slot = LatestFrameSlot()
+            for frame in (b"f0", b"f1", b"f2"):
+                slot.put(frame)
+            seq, data, _ = await slot.get()
+            return seq, data, slot.stats()
+
+        seq, data, stats = asyncio.run(scenario())
+        self.assertEqual((seq, data), (2, b"f2"))
+        self.assertEqual(stats, {"received": 3, "dropped": 2})
+
+    def test_waits_for_frames_and_drains_on_close(self):
+        async def scenario():
+            slot = LatestFrameSlot()
+            waiter = asyncio.ensure_future(slot.get())
+            await asyncio.sleep(0)
+            self.assertFalse(waiter.done())
+            slot.put(b"f0")
+            first = await waiter
+            slot.put(b"f1")
+            slot.close()
+            return first[1], (await slot.get())[1], await slot.get()
+
+        self.assertEqual(asyncio.run(scenario()), (b"f0", b"f1", None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+"""
+Per-session traffic-light tracking for sequential frames.
+
+Frames of one camera stream change little from one to the next, so the full
+detector only runs every `detect_every` frames, or on every frame while a
+tracked light has a low detector score. In between, the boxes of the last
+detection are re-used and only the cheap colour check runs on their crops
+in the new frame. The reported command goes through hysteresis: it only
+switches after `hysteresis` consecutive frames agree on the new command,
+which removes single-frame Go/Stop flicker.
+"""
+import os
+
+from postprocess import classify_lights, decode_boxes
+
+
+class TrafficLightTracker:
+    """
+    Tracking state of one stream (a WebSocket connection or a video).
+    :param detect_every: run the detector on every N-th frame
+    :param min_confidence: re-detect on every frame while a tracked light scores below this
+    :param hysteresis: consecutive frames needed to switch the command
+    """
+
+    def __init__(self, detect_every=10, min_confidence=0.7, hysteresis=2):
+        self.detect_every = max(1, int(detect_every))
+        self.min_confidence = float(min_confidence)
+        self.hysteresis = max(1, int(hysteresis))
+        self._lights = []
+        self.confidence = 0.0
+        self._frames_since_detection = None
+        self._stable_stop = None
+        self._disagreeing = 0
+        self.frames = 0
+        self.detections = 0
+        self.rechecks = 0
+        self.command_changes = 0
+
+    @classmethod
+    def from_env(cls):
+        """Build a tracker from TRACK_DETECT_EVERY / TRACK_MIN_CONFIDENCE / TRACK_HYSTERESIS."""
+        return cls(
+            detect_every=int(os.environ.get("TRACK_DETECT_EVERY", 10)),
+            min_confidence=float(os.environ.get("TRACK_MIN_CONFIDENCE", 0.7)),
+            hysteresis=int(os.environ.get("TRACK_HYSTERESIS", 2)),
+        )
+
+    def needs_detection(self):
+        """Whether the next frame has to go through the full detector."""
+        if self._frames_since_detection is None or self._frames_since_detection >= self.detect_every:
+            return True
+        return any(light["score"] < self.min_confidence for light in self._lights)
+
+    def observe_detection(self, encoded_lights, confidence=0.0):
+        """
+        Track the lights of a full detection.
+        :param encoded_lights: per-light output of the detection (postprocess.encode_lights)
+        :param confidence: detection confidence, reported again for the tracked frames
+        """
+        scale = float(encoded_lights["scale"])
+        boxes = decode_boxes(encoded_lights)
+        scores = [score / scale for score in encoded_lights["scores"]]
+        self._lights = [{"box": box, "score": score} for box, score in zip(boxes, scores)]
+        self.confidence = float(confidence)
+        self._frames_since_detection = 1
+        self.detections += 1
+        self.frames += 1
+
+    def recheck(self, image, color_threshold=0.01):
+        """
+        Colour check of the tracked boxes on a new frame.
+        :param image: PIL Image of the new frame
+        :return: (stop, lights) with lights in decide() format
+        """
+        # The detector's own colour check (postprocess.decide), so both decide alike
+        lights = classify_lights(image, [(index, light["score"], light["box"])
+                                         for index, light in enumerate(self._lights)], color_threshold)
+        self._frames_since_detection += 1
+        self.rechecks += 1
+        self.frames += 1
+        return any(light["stop"] for light in lights), lights
+
+    def smooth(self, raw_stop):
+        """Apply hysteresis to a per-frame stop decision and return the reported one."""
+        if self._stable_stop is None or raw_stop == self._stable_stop:
+            self._stable_stop = raw_stop
+            self._disagreeing = 0
+            return raw_stop
+        self._disagreeing += 1
+        if self._disagreeing >= self.hysteresis:
+            self._stable_stop = raw_stop
+            self._disagreeing = 0
+            self.command_changes += 1
+        return self._stable_stop
+
+    @property
+    def tracked_lights(self):
+        return len(self._lights)
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "detections": self.detections,
+            "rechecks": self.rechecks,
+            "detector_fraction": round(self.detections / self.frames, 4) if self.frames else 0.0,
+            "command_changes": self.command_changes,
+        }
@@ -0,0 +1,83 @@
+"""Tests for frame_tracker."""
+
+import os
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from frame_tracker import TrafficLightTracker
+from postprocess import encode_lights
+
+BOX = [0.2, 0.4, 0.6, 0.5]
+
+
+def _frame(rgb):
+    """100x100 green background with a solid light of colour `rgb` inside BOX."""
+    image = np.zeros((100, 100, 3), dtype=np.uint8)
+    image[..., 1] = 200
+    image[20:60, 40:50] = rgb
+    return Image.fromarray(image)
+
+
+def _detected(score, stop=False):
+    light = {"index": 0, "score": score, "box": BOX, "red_ratio": 0.0, "yellow_ratio": 0.0, "stop": stop}
+    return encode_lights([light])
+
+
+class TrafficLightTrackerTest(unittest.TestCase):
+
+    def test_detects_every_n_frames(self):
+        tracker = TrafficLightTracker(detect_every=3, min_confidence=0.5, hysteresis=1)
+        pattern = []
+        for _ in range(7):
+            if tracker.needs_detection():
+                pattern.append("D")
+                tracker.observe_detection(_detected(0.9), 0.9)
+            else:
+                pattern.append("r")
+                tracker.recheck(_frame((0, 200, 0)))
+        self.assertEqual("".join(pattern), "DrrDrrD")
+        self.assertEqual(tracker.stats()["detections"], 3)
+        self.assertEqual(tracker.stats()["rechecks"], 4)
+
+    def test_low_confidence_forces_detection(self):
+        tracker = TrafficLightTracker(detect_every=10, min_confidence=0.7)
+        tracker.observe_detection(_detected(0.6), 0.6)
+        self.assertTrue(tracker.needs_detection())
+        tracker.observe_detection(_detected(0.8), 0.8)
+        self.assertFalse(tracker.needs_detection())
+
+    def test_recheck_sees_colour_change(self):
+        tracker = TrafficLightTracker()
+        tracker.observe_detection(_detected(0.9), 0.9)
+        stop, lights = tracker.recheck(_frame((230, 0, 0)))
+        self.assertTrue(stop)
+        self.assertEqual(len(lights), 1)
+        self.assertGreater(lights[0]["red_ratio"], 0.5)
+        self.assertAlmostEqual(lights[0]["box"][0], BOX[0])
+        stop, lights = tracker.recheck(_frame((0, 230, 0)))
+        self.assertFalse(stop)
+        self.assertEqual(tracker.confidence, 0.9)
+
+    def test_recheck_without_lights(self):
+        tracker = TrafficLightTracker()
+        tracker.observe_detection(encode_lights([]), 0.0)
+        self.assertEqual(tracker.recheck(_frame((230, 0, 0))), (False, []))
+
+    def test_hysteresis(self):
+        tracker = TrafficLightTracker(hysteresis=2)
+        reported = [tracker.smooth(raw) for raw in [False, True, False, True, True, False, True]]
+        self.assertEqual(reported, [False, False, False, False, True, True, True])
+        self.assertEqual(tracker.command_changes, 1)
+
+    def test_from_env(self):
+        os.environ["TRACK_DETECT_EVERY"] = "5"
+        try:
+            self.assertEqual(TrafficLightTracker.from_env().detect_every, 5)
+        finally:
+            del os.environ["TRACK_DETECT_EVERY"]
+
+
+if __name__ == "__main__":
+    unittest.main()
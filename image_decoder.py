@@ -0,0 +1,139 @@
+"""
+Pluggable image decoding with reduced-scale JPEG decode.
+
+A JPEG can be decoded at 1/2, 1/4 or 1/8 scale in the DCT domain, which skips
+most of the inverse-DCT and colour-conversion work of a full decode. When the
+resize policy is going to shrink an image anyway, the decoder picks the
+largest such factor that still leaves the image at least as large as the
+policy's target, so the detector input only loses pixels it would have lost
+in the resize. The decoded image is then used for both the detector input
+and the colour crops.
+
+Backends:
+  pil    Image.open + convert('RGB'), always at full scale (default, the original behaviour)
+  draft  PIL with Image.draft(), reduced-scale JPEG decode when the policy allows it
+  cv2    cv2.imdecode with IMREAD_REDUCED_COLOR_2/4/8, straight to an RGB uint8 array
+
+Non-JPEG inputs always take the PIL path. EXIF orientation is ignored on
+every backend, as PIL does.
+"""
+import io
+import os
+import threading
+
+import cv2
+import numpy as np
+from PIL import Image
+
+DECODER_PIL = "pil"
+DECODER_DRAFT = "draft"
+DECODER_CV2 = "cv2"
+
+REDUCTION_FACTORS = (8, 4, 2)
+_CV2_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+def reduction_factor(width, height, target_size):
+    """
+    Largest JPEG scale denominator that keeps the decoded image at least `target_size`.
+    :param target_size: (width, height) the image is resized to afterwards, or None
+    :return: 1, 2, 4 or 8
+    """
+    if target_size is None:
+        return 1
+    target_width, target_height = target_size
+    for factor in REDUCTION_FACTORS:
+        if -(-width // factor) >= target_width and -(-height // factor) >= target_height:
+            return factor
+    return 1
+
+
+class ImageDecoder:
+    """
+    Decodes uploaded image bytes into RGB.
+    :param backend: "pil", "draft" or "cv2"
+    :param resize_policy: ResizePolicy deciding how far the image may be reduced;
+                          None decodes at full scale
+    """
+
+    def __init__(self, backend=DECODER_PIL, resize_policy=None):
+        if backend not in (DECODER_PIL, DECODER_DRAFT, DECODER_CV2):
+            raise ValueError(f"Unknown image decoder: {backend}")
+        self.backend = backend
+        self.resize_policy = resize_policy
+        self._lock = threading.Lock()
+        self._decoded = 0
+        self._reduced = {factor: 0 for factor in REDUCTION_FACTORS}
+
+    @classmethod
+    def from_env(cls, resize_policy=None):
+        """Build a decoder from the IMAGE_DECODER env var (pil / draft / cv2)."""
+        return cls(os.environ.get("IMAGE_DECODER", DECODER_PIL), resize_policy)
+
+    def _target_size(self, image, model_name):
+        if self.backend == DECODER_PIL or self.resize_policy is None or image.format != "JPEG":
+            return None
+        return self.resize_policy.target_size(image.size[0], image.size[1], model_name)
+
+    def _count(self, factor):
+        with self._lock:
+            self._decoded += 1
+            if factor > 1:
+                self._reduced[factor] += 1
+
+    def decode(self, data, model_name=None):
+        """
+        Decode image bytes.
+        :param data: encoded image (bytes-like)
+        :param model_name: model the image goes to; selects the native resize target
+        :return: PIL Image in RGB mode
+        """
+        if self.backend == DECODER_CV2:
+            array = self.decode_array(data, model_name)
+            return Image.fromarray(array)
+        image = Image.open(io.BytesIO(data))  # reads the header only
+        target = self._target_size(image, model_name)
+        factor = 1
+        if target is not None:
+            # draft() picks the smallest DCT scale whose result is at least `target`
+            width = image.size[0]
+            image.draft('RGB', target)
+            factor = round(width / image.size[0])
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        self._count(factor)
+        return image
+
+    def decode_array(self, data, model_name=None):
+        """Decode image bytes into an RGB uint8 array [H, W, 3]."""
+        if self.backend != DECODER_CV2:
+            return np.asarray(self.decode(data, model_name))
+        header = Image.open(io.BytesIO(data))
+        if header.format == "JPEG":
+            target = None
+            if self.resize_policy is not None:
+                target = self.resize_policy.target_size(header.size[0], header.size[1], model_name)
+            factor = reduction_factor(header.size[0], header.size[1], target)
+            flags = _CV2_FLAGS[factor] | cv2.IMREAD_IGNORE_ORIENTATION
+            bgr = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flags)
+            if bgr is not None:
+                self._count(factor)
+                return cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+        # Not a JPEG, or one OpenCV cannot read: the PIL path handles (or reports) it
+        if header.mode != 'RGB':
+            header = header.convert('RGB')
+        self._count(1)
+        return np.asarray(header)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": self.backend,
+                "decoded": self._decoded,
+                "reduced": {f"1/{factor}": count for factor, count in sorted(self._reduced.items())},
+            }
@@ -0,0 +1,93 @@
+"""Tests for image_decoder."""
+
+import io
+import os
+import unittest
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from image_decoder import ImageDecoder, reduction_factor
+from model_registry import FASTER_RCNN_MODEL
+from resize_policy import ResizePolicy
+
+
+def _encode(array, fmt="JPEG"):
+    buf = io.BytesIO()
+    Image.fromarray(array).save(buf, fmt, **({"quality": 95} if fmt == "JPEG" else {}))
+    return buf.getvalue()
+
+
+def _photo(width, height):
+    rng = np.random.RandomState(0)
+    return cv2.resize(rng.randint(0, 256, (24, 32, 3), dtype=np.uint8), (width, height))
+
+
+class ImageDecoderTest(unittest.TestCase):
+
+    def test_reduction_factor(self):
+        self.assertEqual(reduction_factor(4000, 3000, None), 1)
+        self.assertEqual(reduction_factor(4000, 3000, (800, 600)), 4)
+        self.assertEqual(reduction_factor(4000, 3000, (500, 375)), 8)
+        self.assertEqual(reduction_factor(4000, 3000, (2000, 1500)), 2)
+        self.assertEqual(reduction_factor(4000, 3000, (2001, 1500)), 1)
+        self.assertEqual(reduction_factor(1001, 751, (126, 94)), 8)  # ceil(1001 / 8) = 126
+
+    def test_pil_backend_matches_plain_open(self):
+        data = _encode(_photo(640, 480))
+        decoded = ImageDecoder("pil", ResizePolicy("max_side", 100)).decode(data)
+        self.assertEqual(decoded.mode, "RGB")
+        self.assertTrue(np.array_equal(np.asarray(decoded), np.asarray(Image.open(io.BytesIO(data)))))
+
+    def test_reduced_decode_stays_above_target(self):
+        data = _encode(_photo(2400, 1800))
+        policy = ResizePolicy("native")
+        target = policy.target_size(2400, 1800, FASTER_RCNN_MODEL)
+        for backend in ("draft", "cv2"):
+            decoder = ImageDecoder(backend, policy)
+            image = decoder.decode(data, FASTER_RCNN_MODEL)
+            self.assertEqual(image.mode, "RGB")
+            self.assertEqual(image.size, (1200, 900), backend)
+            self.assertGreaterEqual(image.size[0], target[0])
+            self.assertGreaterEqual(image.size[1], target[1])
+            self.assertEqual(decoder.stats()["reduced"]["1/2"], 1)
+            array = decoder.decode_array(data, FASTER_RCNN_MODEL)
+            self.assertEqual(array.shape, (900, 1200, 3))
+            self.assertEqual(array.dtype, np.uint8)
+
+    def test_cv2_matches_pil_colours(self):
+        data = _encode(_photo(320, 240))
+        pil = ImageDecoder("pil").decode_array(data)
+        ocv = ImageDecoder("cv2").decode_array(data)
+        self.assertEqual(pil.shape, ocv.shape)
+        self.assertLess(np.abs(pil.astype(int) - ocv.astype(int)).mean(), 2.0)
+
+    def test_non_jpeg_takes_pil_path(self):
+        rgba = np.zeros((300, 400, 4), dtype=np.uint8)
+        rgba[..., 0] = 200
+        rgba[..., 3] = 255
+        data = _encode(rgba, "PNG")
+        for backend in ("draft", "cv2"):
+            decoder = ImageDecoder(backend, ResizePolicy("max_side", 50))
+            array = decoder.decode_array(data)
+            self.assertEqual(array.shape, (300, 400, 3))
+            self.assertEqual(int(array[0, 0, 0]), 200)
+
+    def test_invalid_data_raises(self):
+        for backend in ("pil", "draft", "cv2"):
+            with self.assertRaises(Exception):
+                ImageDecoder(backend).decode(b"not an image")
+
+    def test_from_env(self):
+        os.environ["IMAGE_DECODER"] = "cv2"
+        try:
+            self.assertEqual(ImageDecoder.from_env().backend, "cv2")
+        finally:
+            del os.environ["IMAGE_DECODER"]
+        with self.assertRaises(ValueError):
+            ImageDecoder("turbo")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+"""
+Header-only validation of uploaded images.
+
+PIL's Image.open only parses the file header, so format, dimensions, mode
+and frame count are known before a single pixel buffer is allocated. The
+guard rejects uploads that are unsupported, implausibly large (a few KB of
+PNG can declare a 40000x40000 canvas) or not images at all, and counts the
+rejections per reason. For streamed uploads the check can already run on the
+first bytes of the body, so a rejected upload is not read to the end.
+"""
+import io
+import os
+import threading
+import warnings
+
+from PIL import Image, UnidentifiedImageError
+
+HEADER_PEEK_BYTES = 64 * 1024  # covers the markers before a JPEG's frame header, EXIF included
+
+DEFAULT_FORMATS = ("JPEG", "MPO", "PNG", "BMP", "WEBP")
+SUPPORTED_MODES = ("1", "L", "LA", "P", "PA", "RGB", "RGBA", "RGBX", "CMYK", "YCbCr")
+
+REASON_FORMAT = "unsupported_format"
+REASON_MODE = "unsupported_mode"
+REASON_PIXELS = "too_many_pixels"
+REASON_SIDE = "side_too_long"
+REASON_FRAMES = "too_many_frames"
+REASON_CORRUPT = "not_an_image"
+
+_STATUS_CODES = {
+    REASON_FORMAT: 415,
+    REASON_MODE: 415,
+    REASON_PIXELS: 413,
+    REASON_SIDE: 413,
+    REASON_FRAMES: 413,
+    REASON_CORRUPT: 400,
+}
+
+
+class ImageRejected(Exception):
+    """Raised when an upload fails header validation; `reason` is the counter key."""
+
+    def __init__(self, reason, message):
+        super().__init__(message)
+        self.reason = reason
+        self.status_code = _STATUS_CODES[reason]
+
+
+class ImageGuard:
+    """
+    Validates image headers before decoding.
+    :param max_pixels: largest accepted width * height
+    :param max_side: largest accepted width or height
+    :param max_frames: largest accepted frame count (MPO photos carry 2)
+    :param formats: accepted PIL format names
+    """
+
+    def __init__(self, max_pixels=50_000_000, max_side=16384, max_frames=4, formats=DEFAULT_FORMATS):
+        self.max_pixels = int(max_pixels)
+        self.max_side = int(max_side)
+        self.max_frames = int(max_frames)
+        self.formats = tuple(f.upper() for f in formats)
+        self._lock = threading.Lock()
+        self._passed = 0
+        self._early = 0
+        self._rejected = {reason: 0 for reason in _STATUS_CODES}
+
+    @classmethod
+    def from_env(cls):
+        """Build a guard from IMAGE_MAX_MEGAPIXELS / IMAGE_MAX_SIDE / IMAGE_MAX_FRAMES / IMAGE_FORMATS."""
+        formats = os.environ.get("IMAGE_FORMATS")
+        return cls(
+            max_pixels=float(os.environ.get("IMAGE_MAX_MEGAPIXELS", 50)) * 1_000_000,
+            max_side=int(os.environ.get("IMAGE_MAX_SIDE", 16384)),
+            max_frames=int(os.environ.get("IMAGE_MAX_FRAMES", 4)),
+            formats=formats.split(",") if formats else DEFAULT_FORMATS,
+        )
+
+    def _reject(self, reason, message, early=False):
+        with self._lock:
+            self._rejected[reason] += 1
+            if early:
+                self._early += 1
+        raise ImageRejected(reason, message)
+
+    def check(self, data, complete=True):
+        """
+        Validate the header of an encoded image.
+        :param data: the encoded image, or only its first bytes when `complete` is False
+        :param complete: whether `data` is the whole upload; a header that does not parse
+                         from a prefix is left undecided instead of rejected
+        :return: dict with "format", "width", "height", "mode" and "frames",
+                 or None when a prefix was not enough to decide
+        """
+        early = not complete
+        try:
+            with warnings.catch_warnings():
+                # The guard enforces its own pixel limit; PIL's bomb warning is noise here
+                warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+                image = Image.open(io.BytesIO(data))
+        except Image.DecompressionBombError as e:
+            self._reject(REASON_PIXELS, str(e), early)
+        except (UnidentifiedImageError, OSError, SyntaxError, ValueError, EOFError) as e:
+            if early:
+                return None
+            self._reject(REASON_CORRUPT, f"Not a readable image: {e}")
+
+        width, height = image.size
+        if image.format not in self.formats:
+            self._reject(REASON_FORMAT, f"Unsupported image format {image.format}; "
+                                        f"use one of {', '.join(self.formats)}", early)
+        if image.mode not in SUPPORTED_MODES:
+            self._reject(REASON_MODE, f"Unsupported image mode {image.mode}", early)
+        if max(width, height) > self.max_side:
+            self._reject(REASON_SIDE, f"Image of {width}x{height} exceeds the {self.max_side} pixel side limit",
+                         early)
+        if width * height > self.max_pixels:
+            self._reject(REASON_PIXELS, f"Image of {width}x{height} exceeds the "
+                                        f"{self.max_pixels / 1e6:g} megapixel limit", early)
+        try:
+            frames = getattr(image, "n_frames", 1)
+        except (OSError, SyntaxError, ValueError, EOFError):
+            frames = 1  # the frame index lies beyond the bytes received so far
+        if frames > self.max_frames:
+            self._reject(REASON_FRAMES, f"Image has {frames} frames (limit {self.max_frames})", early)
+        if complete:
+            with self._lock:
+                self._passed += 1
+        return {"format": image.format, "width": width, "height": height, "mode": image.mode, "frames": frames}
+
+    def stats(self):
+        with self._lock:
+            return {
+                "passed": self._passed,
+                "rejected": dict(self._rejected),
+                "rejected_early": self._early,
+                "max_megapixels": self.max_pixels / 1e6,
+                "max_side": self.max_side,
+            }
@@ -0,0 +1,96 @@
+"""Tests for image_guard."""
+
+import io
+import os
+import struct
+import unittest
+import zlib
+
+import numpy as np
+from PIL import Image
+
+from image_guard import HEADER_PEEK_BYTES, ImageGuard, ImageRejected
+
+
+def _encode(array, fmt="JPEG", **params):
+    buf = io.BytesIO()
+    Image.fromarray(array).save(buf, fmt, **params)
+    return buf.getvalue()
+
+
+def _png_header(width, height):
+    """A PNG declaring width x height with only a few bytes of pixel data."""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", zlib.compress(b"\x00" * 64))
+
+
+class ImageGuardTest(unittest.TestCase):
+
+    def test_accepts_normal_images(self):
+        guard = ImageGuard()
+        info = guard.check(_encode(np.zeros((480, 640, 3), dtype=np.uint8)))
+        self.assertEqual(info, {"format": "JPEG", "width": 640, "height": 480, "mode": "RGB", "frames": 1})
+        self.assertEqual(guard.check(_encode(np.zeros((10, 10, 4), dtype=np.uint8), "PNG"))["mode"], "RGBA")
+        self.assertEqual(guard.stats()["passed"], 2)
+
+    def test_rejects_declared_giant_from_header(self):
+        guard = ImageGuard(max_pixels=50_000_000, max_side=100000)
+        with self.assertRaises(ImageRejected) as ctx:
+            guard.check(_png_header(40000, 40000))
+        self.assertEqual(ctx.exception.reason, "too_many_pixels")
+        self.assertEqual(ctx.exception.status_code, 413)
+
+    def test_rejects_long_side(self):
+        with self.assertRaises(ImageRejected) as ctx:
+            ImageGuard(max_side=1000).check(_png_header(1001, 10))
+        self.assertEqual(ctx.exception.reason, "side_too_long")
+
+    def test_rejects_unsupported_format_and_garbage(self):
+        guard = ImageGuard()
+        with self.assertRaises(ImageRejected) as ctx:
+            guard.check(_encode(np.zeros((10, 10, 3), dtype=np.uint8), "GIF"))
+        self.assertEqual(ctx.exception.status_code, 415)
+        with self.assertRaises(ImageRejected) as ctx:
+            guard.check(b"not an image at all")
+        self.assertEqual(ctx.exception.reason, "not_an_image")
+        self.assertEqual(ctx.exception.status_code, 400)
+        self.assertEqual(guard.stats()["rejected"]["unsupported_format"], 1)
+        self.assertEqual(guard.stats()["rejected"]["not_an_image"], 1)
+
+    def test_rejects_too_many_frames(self):
+        frames = [Image.fromarray(np.full((8, 8, 3), i * 40, dtype=np.uint8)) for i in range(5)]
+        buf = io.BytesIO()
+        frames[0].save(buf, "PNG", save_all=True, append_images=frames[1:])
+        with self.assertRaises(ImageRejected) as ctx:
+            ImageGuard(max_frames=4).check(buf.getvalue())
+        self.assertEqual(ctx.exception.reason, "too_many_frames")
+
+    def test_prefix_check(self):
+        guard = ImageGuard(max_pixels=1_000_000)
+        rng = np.random.RandomState(0)
+        data = _encode(rng.randint(0, 256, (1200, 1600, 3), dtype=np.uint8), quality=95)
+        self.assertGreater(len(data), HEADER_PEEK_BYTES)
+        with self.assertRaises(ImageRejected):
+            guard.check(data[:HEADER_PEEK_BYTES], complete=False)
+        self.assertEqual(guard.stats()["rejected_early"], 1)
+        # A prefix too short to parse is undecided, not rejected
+        self.assertIsNone(guard.check(data[:4], complete=False))
+        self.assertEqual(ImageGuard().check(data[:HEADER_PEEK_BYTES], complete=False)["width"], 1600)
+
+    def test_from_env(self):
+        os.environ["IMAGE_MAX_MEGAPIXELS"] = "12"
+        os.environ["IMAGE_FORMATS"] = "jpeg,png"
+        try:
+            guard = ImageGuard.from_env()
+        finally:
+            del os.environ["IMAGE_MAX_MEGAPIXELS"]
+            del os.environ["IMAGE_FORMATS"]
+        self.assertEqual(guard.max_pixels, 12_000_000)
+        self.assertEqual(guard.formats, ("JPEG", "PNG"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,20 @@
+"""
+Image decoding and conversion helpers shared by the API modules.
+"""
+import numpy as np
+
+
+def load_image_into_numpy_array(image):
+    """
+    Load image into numpy array.
+    Matching original code behavior - no contrast adjustment, preserves original pixel values.
+
+    RGB images are exposed through PIL's array interface, which hands numpy the
+    decoded pixel buffer directly as uint8 [H, W, 3] instead of materialising a
+    Python tuple per pixel. The result is read-only; copy it before drawing on it.
+    Other modes keep the original per-pixel path (and its errors).
+    """
+    if image.mode == 'RGB':
+        return np.asarray(image)
+    (im_width, im_height) = image.size
+    return np.array(image.getdata()).reshape((im_height, im_width, 3)).astype(np.uint8)
@@ -0,0 +1,38 @@
+"""Tests for image_io."""
+
+import unittest
+
+import numpy as np
+from PIL import Image
+
+import image_io
+
+
+def _original_conversion(image):
+    (im_width, im_height) = image.size
+    return np.array(image.getdata()).reshape((im_height, im_width, 3)).astype(np.uint8)
+
+
+class LoadImageIntoNumpyArrayTest(unittest.TestCase):
+
+    def test_rgb_matches_original_conversion(self):
+        rng = np.random.RandomState(0)
+        image = Image.fromarray(rng.randint(0, 256, (37, 53, 3), dtype=np.uint8))
+        image_np = image_io.load_image_into_numpy_array(image)
+        self.assertEqual(image_np.dtype, np.uint8)
+        self.assertEqual(image_np.shape, (37, 53, 3))
+        np.testing.assert_array_equal(image_np, _original_conversion(image))
+
+    def test_jpeg_matches_original_conversion(self):
+        image = Image.open('test_images/img_1.jpg')
+        np.testing.assert_array_equal(image_io.load_image_into_numpy_array(image),
+                                      _original_conversion(image))
+
+    def test_non_rgb_keeps_original_behavior(self):
+        image = Image.new('L', (4, 4))
+        with self.assertRaises(ValueError):
+            image_io.load_image_into_numpy_array(image)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+"""
+Inference engine wrapping a loaded detection graph and its session.
+
+Resolves the input/output tensors once and prepares a session callable with
+`sess.make_callable`, so a detection call is a single pre-bound invocation
+without graph lookups or a feed_dict. Also keeps per-call timing counters.
+"""
+import threading
+import time
+
+INPUT_TENSOR_NAME = 'image_tensor:0'
+OUTPUT_TENSOR_NAMES = ('detection_boxes:0', 'detection_scores:0', 'detection_classes:0', 'num_detections:0')
+
+
+class InferenceEngine:
+    """
+    Pre-bound detection call for one graph/session pair.
+    :param graph: tf.Graph holding the imported frozen detection graph
+    :param sess: tf.compat.v1.Session created on `graph`
+    :param name: model name, used in stats
+    """
+
+    def __init__(self, graph, sess, name=None):
+        self.graph = graph
+        self.sess = sess
+        self.name = name
+        self.image_tensor = graph.get_tensor_by_name(INPUT_TENSOR_NAME)
+        self.output_tensors = [graph.get_tensor_by_name(tensor_name) for tensor_name in OUTPUT_TENSOR_NAMES]
+        self._callable = sess.make_callable(self.output_tensors, feed_list=[self.image_tensor])
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._images = 0
+        self._total_ms = 0.0
+        self._last_ms = 0.0
+
+    def run_batch(self, images_batch):
+        """
+        Run detection on a batch of equally sized images.
+        :param images_batch: uint8 array [N, H, W, 3]
+        :return: (boxes, scores, classes, num) each with a leading batch dimension
+        """
+        started = time.perf_counter()
+        boxes, scores, classes, num = self._callable(images_batch)
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        with self._lock:
+            self._calls += 1
+            self._images += images_batch.shape[0]
+            self._total_ms += elapsed_ms
+            self._last_ms = elapsed_ms
+        return boxes, scores, classes, num
+
+    def stats(self):
+        with self._lock:
+            return {
+                "model": self.name,
+                "calls": self._calls,
+                "images": self._images,
+                "mean_call_ms": round(self._total_ms / self._calls, 2) if self._calls else 0.0,
+                "last_call_ms": round(self._last_ms, 2),
+            }
+
+    def close(self):
+        self.sess.close()
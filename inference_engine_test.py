@@ -0,0 +1,53 @@
+"""Tests for inference_engine."""
+
+import unittest
+
+import numpy as np
+
+from inference_engine import InferenceEngine, INPUT_TENSOR_NAME, OUTPUT_TENSOR_NAMES
+
+
+class _FakeGraph:
+    def __init__(self):
+        self.lookups = []
+
+    def get_tensor_by_name(self, name):
+        self.lookups.append(name)
+        return name
+
+
+class _FakeSession:
+    def __init__(self):
+        self.calls = []
+
+    def make_callable(self, fetches, feed_list):
+        self.fetches = fetches
+        self.feed_list = feed_list
+
+        def call(batch):
+            self.calls.append(batch.shape)
+            n = batch.shape[0]
+            return (np.zeros((n, 100, 4)), np.zeros((n, 100)), np.ones((n, 100)), np.full((n,), 100.0))
+        return call
+
+
+class InferenceEngineTest(unittest.TestCase):
+
+    def test_resolves_tensors_once_and_runs_prepared_callable(self):
+        graph, sess = _FakeGraph(), _FakeSession()
+        engine = InferenceEngine(graph, sess, name='fake')
+        self.assertEqual(sess.feed_list, [INPUT_TENSOR_NAME])
+        self.assertEqual(sess.fetches, list(OUTPUT_TENSOR_NAMES))
+
+        for _ in range(3):
+            boxes, scores, classes, num = engine.run_batch(np.zeros((2, 4, 4, 3), dtype=np.uint8))
+        self.assertEqual(boxes.shape, (2, 100, 4))
+        self.assertEqual(len(graph.lookups), 1 + len(OUTPUT_TENSOR_NAMES))
+        stats = engine.stats()
+        self.assertEqual(stats["calls"], 3)
+        self.assertEqual(stats["images"], 6)
+        self.assertEqual(stats["model"], 'fake')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""
+Bounded executor for blocking inference work.
+
+Keeps image decoding, tensor conversion and colour classification off the
+asyncio event loop so that /health and uploads stay responsive while a frame
+is being processed. Admission is bounded: once `max_workers + max_queue`
+requests are in flight, new ones are rejected with InferenceQueueFull so the
+API can answer 429 instead of piling up work it cannot finish.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class InferenceQueueFull(Exception):
+    """Raised when the executor has no free worker or queue slot."""
+
+
+class InferenceExecutor:
+    """
+    Thread pool with a bounded admission queue and queue-depth metrics.
+    :param max_workers: number of worker threads
+    :param max_queue: number of admitted requests allowed to wait for a worker
+    """
+
+    def __init__(self, max_workers, max_queue=16):
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(0, int(max_queue))
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._active = 0
+        self._pending = 0
+        self._calls = 0
+        self._admitted = 0
+        self._rejected = 0
+        self._completed = 0
+        self._max_queue_depth = 0
+        self._total_wait = 0.0
+
+    @classmethod
+    def from_env(cls, default_workers):
+        """Build an executor configured from INFERENCE_WORKERS / INFERENCE_QUEUE_SIZE."""
+        return cls(
+            max_workers=int(os.environ.get("INFERENCE_WORKERS", default_workers)),
+            max_queue=int(os.environ.get("INFERENCE_QUEUE_SIZE", 16)),
+        )
+
+    @property
+    def capacity(self):
+        return self.max_workers + self.max_queue
+
+    def queue_depth(self):
+        """Number of submitted calls waiting for a free worker."""
+        with self._lock:
+            return self._pending
+
+    def acquire(self):
+        """Reserve an admission slot or raise InferenceQueueFull."""
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                self._rejected += 1
+                raise InferenceQueueFull(
+                    f"Inference queue is full ({self._in_flight}/{self.capacity} requests in flight)")
+            self._in_flight += 1
+            self._admitted += 1
+
+    def release(self):
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
+
+    async def run(self, fn, *args):
+        """Run a blocking callable on the pool and await its result."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._pending += 1
+            self._max_queue_depth = max(self._max_queue_depth, self._pending)
+        return await loop.run_in_executor(self._pool, self._call, time.monotonic(), fn, args)
+
+    def _call(self, submitted_at, fn, args):
+        with self._lock:
+            self._pending -= 1
+            self._active += 1
+            self._calls += 1
+            self._total_wait += time.monotonic() - submitted_at
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "active": self._active,
+                "queue_depth": self._pending,
+                "max_queue_depth": self._max_queue_depth,
+                "admitted": self._admitted,
+                "rejected": self._rejected,
+                "completed": self._completed,
+                "mean_queue_wait_ms": round(self._total_wait * 1000.0 / self._calls, 2) if self._calls else 0.0,
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
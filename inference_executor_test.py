@@ -0,0 +1,54 @@
+"""Tests for inference_executor."""
+
+import asyncio
+import threading
+import unittest
+
+from inference_executor import InferenceExecutor, InferenceQueueFull
+
+
+class InferenceExecutorTest(unittest.TestCase):
+
+    def test_run_returns_result_off_the_loop(self):
+        executor = InferenceExecutor(max_workers=1, max_queue=0)
+
+        async def main():
+            return await executor.run(lambda a, b: (a + b, threading.current_thread().name), 2, 3)
+
+        value, thread_name = asyncio.run(main())
+        self.assertEqual(value, 5)
+        self.assertTrue(thread_name.startswith("inference"))
+        self.assertEqual(executor.stats()["queue_depth"], 0)
+
+    def test_rejects_when_saturated(self):
+        executor = InferenceExecutor(max_workers=1, max_queue=1)
+        executor.acquire()
+        executor.acquire()
+        with self.assertRaises(InferenceQueueFull):
+            executor.acquire()
+        executor.release()
+        executor.acquire()
+        stats = executor.stats()
+        self.assertEqual(stats["in_flight"], 2)
+        self.assertEqual(stats["rejected"], 1)
+        self.assertEqual(stats["admitted"], 3)
+
+    def test_queue_depth_counts_waiting_calls(self):
+        executor = InferenceExecutor(max_workers=1, max_queue=4)
+        gate = threading.Event()
+
+        async def main():
+            first = asyncio.ensure_future(executor.run(gate.wait, 5))
+            second = asyncio.ensure_future(executor.run(lambda: None))
+            await asyncio.sleep(0.05)
+            depth = executor.queue_depth()
+            gate.set()
+            await asyncio.gather(first, second)
+            return depth
+
+        self.assertEqual(asyncio.run(main()), 1)
+        self.assertGreaterEqual(executor.stats()["max_queue_depth"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,8 +4,11 @@
 
 ### Import Important Libraries
 
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query, Header, Request, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import StreamingResponse
+from starlette.formparsers import MultiPartException, MultiPartParser
+from starlette.background import BackgroundTask
 import os
 import gc  # Garbage collection for memory management
 import numpy as np
@@ -16,12 +19,38 @@ from PIL import Image
 from os import path
 from utils import label_map_util
 from utils import visualization_utils as vis_util
+from inference_executor import InferenceExecutor, InferenceQueueFull
+from worker_pool import InferenceWorkerPool
+from image_io import load_image_into_numpy_array
+from inference_engine import InferenceEngine
+from memory_governor import MemoryGovernor
+from result_cache import ResultCache, perceptual_hash
+from model_registry import ModelRegistry, UnknownModelError
+from resize_policy import ResizePolicy
+from image_decoder import ImageDecoder
+from image_guard import HEADER_PEEK_BYTES, ImageGuard, ImageRejected
+from prepare_model import keep_weights_quantized, preferred_graph_path
+from postprocess import decide, decode_boxes, encode_lights, first_red_wins_from_env, stop_at_boxes
+from upload_stream import (RAW_CONTENT_TYPES, UploadIncomplete, UploadTooLarge, copy_multipart_field,
+                           is_raw_content_type, limit_stream, max_batch_bytes_from_env, max_batch_images_from_env, max_upload_bytes_from_env,
+                           read_stream, split_envelope)
+from url_fetcher import FetchError, FetchTooLarge, UrlFetcher
+from frame_channel import LatestFrameSlot
+from frame_tracker import TrafficLightTracker
+from warmup import ModelWarmup
+from video_pipeline import (FrameSampler, iter_sampled_frames, max_video_bytes_from_env, pipeline_limits_from_env,
+                            run_pipeline)
 import time
 import cv2
 import io
 import base64
 import threading
 import traceback
+import asyncio
+import contextlib
+import json
+import tempfile
+from typing import List, Optional
 import urllib.request
 from pydantic import BaseModel
 
@@ -40,19 +69,43 @@ class Base64ImageRequest(BaseModel):
     image_base64: str
     image_format: str = "jpeg"
 
+class LightsResponse(BaseModel):
+    """Every traffic light above threshold, best first; values are fixed-point integers (value * scale)."""
+    scale: int
+    boxes: List[List[int]]  # normalized [ymin, xmin, ymax, xmax]
+    scores: List[int]
+    red_ratios: List[int]
+    yellow_ratios: List[int]
+    stop: List[bool]
+
 class DetectionResponse(BaseModel):
     command: str
     confidence: float
     traffic_light_detected: bool
     message: str
+    model: Optional[str] = None
+    lights: Optional[LightsResponse] = None
+
+class BatchItemResponse(BaseModel):
+    index: int
+    filename: Optional[str] = None
+    result: Optional[DetectionResponse] = None
+    error: Optional[str] = None
+
+class BatchDetectionResponse(BaseModel):
+    results: List[BatchItemResponse]
 
-# Globals
+# Globals (detection_graph / sess / engine belong to the default model)
 detection_graph = None
 sess = None
+engine = None
 category_index = None
 MODEL_LOADED = False
 MODEL_LOADING_ERROR = None
 
+# Number of inference worker processes (0 = run the session in this process)
+INFERENCE_PROCESSES = int(os.environ.get('INFERENCE_PROCESSES', 0))
+
 
 ### Function To Detect Red and Yellow Color
 # Here,we are detecting only Red and Yellow colors for the traffic lights as we need to stop the car when it detects these colors.
@@ -97,23 +150,17 @@ def detect_red_and_yellow(img, Threshold=0.01):
 
 
 
-### Loading Image Into Numpy Array
-
-def load_image_into_numpy_array(image):
-    (im_width, im_height) = image.size
-    return np.array(image.getdata()).reshape(
-        (im_height, im_width, 3)).astype(np.uint8)
-
 ### Convert Base64 to Image
 
-def base64_to_image(base64_string: str, image_format: str = "jpeg") -> Image.Image:
+def base64_to_image(base64_string: str, image_format: str = "jpeg", model_name: str = None) -> Image.Image:
     """
     Convert base64 string to PIL Image.
     """
     if base64_string.startswith('data:image'):
         base64_string = base64_string.split(',')[1]
     image_data = base64.b64decode(base64_string)
-    image = Image.open(io.BytesIO(image_data))
+    _check_image(image_data)
+    image = image_decoder.decode(image_data, model_name)
     
     # Convert to RGB only if necessary for TensorFlow compatibility
     if image.mode != 'RGB':
@@ -121,30 +168,36 @@ def base64_to_image(base64_string: str, image_format: str = "jpeg") -> Image.Ima
     
     return image
 
+### Convert Raw Bytes to Image
+
+def _check_image(image_data, complete: bool = True):
+    """
+    Header-only validation (see image_guard): a rejected upload becomes an HTTP error
+    before it is decoded. With complete=False `image_data` is only the start of the upload.
+    """
+    try:
+        return image_guard.check(image_data, complete)
+    except ImageRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+def bytes_to_image(image_data: bytes, model_name: str = None) -> Image.Image:
+    """RGB image of an upload; IMAGE_DECODER=draft/cv2 may decode a JPEG at reduced scale (see image_decoder)."""
+    _check_image(image_data)
+    return image_decoder.decode(image_data, model_name)
+
+def read_url(image_url: str) -> bytes:
+    return url_fetcher.fetch(image_url)
+
 
 ### Read Traffic Light objects
 # Here,we will write a function to detect TL objects and crop this part of the image to recognize color inside the object. We will create a stop flag,which we will use to take the actions based on recognized color of the traffic light.
 
 def read_traffic_lights_object(image, boxes, scores, classes, max_boxes_to_draw=20, min_score_thresh=0.5,
                                traffic_ligth_label=10):
-    im_width, im_height = image.size
-    stop_flag = False
-    for i in range(min(max_boxes_to_draw, boxes.shape[0])):
-        if scores[i] > min_score_thresh and classes[i] == traffic_ligth_label:
-            ymin, xmin, ymax, xmax = tuple(boxes[i].tolist())
-            (left, right, top, bottom) = (xmin * im_width, xmax * im_width,
-                                          ymin * im_height, ymax * im_height)
-            # guard bounds
-            left, right = max(0, int(left)), min(im_width, int(right))
-            top, bottom = max(0, int(top)), min(im_height, int(bottom))
-            if right <= left or bottom <= top:
-                continue
-            crop_img = image.crop((left, top, right, bottom))
-
-            if detect_red_and_yellow(crop_img):
-                stop_flag = True
-
-    return stop_flag
+    # All qualifying boxes are classified together in one vectorized pass
+    decision = decide(image, boxes, scores, classes, max_boxes=max_boxes_to_draw,
+                      min_score_thresh=min_score_thresh, traffic_light_label=traffic_ligth_label)
+    return decision["stop"]
 
 
 ### Function to Plot detected image
@@ -239,8 +292,8 @@ def detect_traffic_lights(PATH_TO_TEST_IMAGES_DIR, MODEL_NAME, Num_images, plot_
                 image = Image.open(image_path)
 
                 # the array based representation of the image will be used later in order to prepare the
-                # result image with boxes and labels on it.
-                image_np = load_image_into_numpy_array(image)
+                # result image with boxes and labels on it (copied, since we draw on it below).
+                image_np = load_image_into_numpy_array(image).copy()
                 # Expand dimensions since the model expects images to have shape: [1, None, None, 3]
                 image_np_expanded = np.expand_dims(image_np, axis=0)
                 # Actual detection.
@@ -268,76 +321,330 @@ def detect_traffic_lights(PATH_TO_TEST_IMAGES_DIR, MODEL_NAME, Num_images, plot_
 
 ### Function to Detect Traffic Lights in Single Image (for API)
 
-def detect_traffic_lights_in_image(image: Image.Image) -> dict:
-    global detection_graph, sess, MODEL_LOADED
+# Loaded models (see DEFAULT_MODEL / MODELS env vars). Each model has its own
+# micro-batcher collecting concurrent requests into one sess.run per batch
+# (see BATCH_* env vars); with a worker pool, one batch per worker can be in flight.
+model_registry = ModelRegistry.from_env(concurrency=max(1, INFERENCE_PROCESSES))
+
+# Keeps decoding and post-processing off the event loop (see INFERENCE_* env vars).
+# The session uses TF's default thread pools, so size to the core count.
+inference_executor = InferenceExecutor.from_env(default_workers=os.cpu_count() or 1)
+
+# Runs gc.collect() only above the RSS soft limit or when idle (see MEMORY_SOFT_LIMIT_MB / GC_IDLE_SECONDS)
+memory_governor = MemoryGovernor.from_env()
+
+# Detection results keyed by upload content (see RESULT_CACHE_* env vars)
+result_cache = ResultCache.from_env()
+
+# Optional downscaling of the detector input (see INPUT_RESIZE / INPUT_MAX_SIDE env vars)
+resize_policy = ResizePolicy.from_env()
+
+# Decoder of uploaded images; can decode JPEGs at reduced scale within the resize policy (see IMAGE_DECODER env var)
+image_decoder = ImageDecoder.from_env(resize_policy)
+
+# Header-only validation of uploads before any pixel buffer is allocated
+# (see IMAGE_MAX_MEGAPIXELS / IMAGE_MAX_SIDE / IMAGE_MAX_FRAMES / IMAGE_FORMATS env vars)
+image_guard = ImageGuard.from_env()
+
+# Synthetic inference runs at the expected resolutions before a loaded model takes requests
+# (see WARMUP / WARMUP_SIZES / WARMUP_RUNS / WARMUP_BATCH_SIZES env vars)
+model_warmup = ModelWarmup.from_env(resize_policy.target_size)
+
+# Stop colour classification at the first red/yellow light (see FIRST_RED_WINS env var)
+FIRST_RED_WINS = first_red_wins_from_env()
+
+# Size limit of raw uploads, enforced while the body streams in (see MAX_UPLOAD_MB env var)
+MAX_UPLOAD_BYTES = max_upload_bytes_from_env()
+
+# Images accepted by one /detect-batch request (see MAX_BATCH_IMAGES env var)
+MAX_BATCH_IMAGES = max_batch_images_from_env()
+
+# Whole-body size limit of one /detect-batch request, enforced while it streams in (see MAX_BATCH_MB env var)
+MAX_BATCH_BYTES = max_batch_bytes_from_env()
+
+# Pooled keep-alive HTTP client for /detect-url (see URL_FETCH_* env vars)
+url_fetcher = UrlFetcher.from_env()
+
+# /detect-video upload limit and decode/inference pipelining (see MAX_VIDEO_MB / VIDEO_* env vars)
+MAX_VIDEO_BYTES = max_video_bytes_from_env()
+VIDEO_MAX_IN_FLIGHT, VIDEO_PREFETCH = pipeline_limits_from_env()
+
+LIGHTS_PARAM_DESCRIPTION = ("Also return every traffic light above threshold with its box, score and "
+                            "red/yellow pixel ratios (fixed-point integers)")
+
+TRACK_PARAM_DESCRIPTION = ("Track lights across frames: the detector runs every TRACK_DETECT_EVERY frames (or "
+                           "on low confidence), frames in between only re-check the colours of the tracked boxes, "
+                           "and the command switches after TRACK_HYSTERESIS agreeing frames")
+MODEL_PARAM_DESCRIPTION = ("Model name or alias (faster_rcnn / accurate, ssd_mobilenet / ssd / fast, or cascade: "
+                           "SSD first, Faster R-CNN for ambiguous frames); "
+                           "can also be sent as an X-Model header. Defaults to DEFAULT_MODEL.")
+
+@contextlib.asynccontextmanager
+async def _inference_slot():
+    """Admit one request into the inference executor, answering 429 when it is saturated."""
+    try:
+        inference_executor.acquire()
+    except InferenceQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    try:
+        yield
+    finally:
+        inference_executor.release()
+
+def _require_model(requested: Optional[str] = None) -> str:
+    """Resolve a requested model name/alias to a loaded model, or raise the matching HTTP error."""
     if not MODEL_LOADED:
         raise HTTPException(status_code=503, detail=f"Model not loaded yet. Error: {MODEL_LOADING_ERROR}")
     try:
-        image_np = load_image_into_numpy_array(image)
-        image_np_expanded = np.expand_dims(image_np, axis=0)
-        
-        with detection_graph.as_default():
-            image_tensor = detection_graph.get_tensor_by_name('image_tensor:0')
-            detection_boxes = detection_graph.get_tensor_by_name('detection_boxes:0')
-            detection_scores = detection_graph.get_tensor_by_name('detection_scores:0')
-            detection_classes = detection_graph.get_tensor_by_name('detection_classes:0')
-            num_detections = detection_graph.get_tensor_by_name('num_detections:0')
+        model_name = model_registry.resolve(requested)
+    except UnknownModelError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not model_registry.is_loaded(model_name):
+        raise HTTPException(status_code=503, detail=f"Model {model_name} is not loaded. "
+                                                    f"Loaded models: {model_registry.loaded_models()}")
+    return model_name
+
+def _to_input_tensor(image: Image.Image, model_name: str):
+    """
+    Detector input for `image`, downscaled per the resize policy. Boxes come back
+    normalized, so post-processing still crops the full-resolution image.
+    """
+    return load_image_into_numpy_array(resize_policy.apply(image, model_name))
+
+def _command_for(stop_flag: bool):
+    """(command, message) of a stop decision: True = red/yellow detected (stop), False = green or no light (go)."""
+    if stop_flag:
+        return "Stop", "Traffic light detected: Red or Yellow signal (Stop)"
+    return "Go", "Traffic light detected: Green signal or no traffic light (Go)"
+
+def _build_detection_result(image, boxes, scores, classes, model_name=None, include_lights=False) -> dict:
+    boxes_squeezed = np.squeeze(boxes)
+    scores_squeezed = np.squeeze(scores)
+    classes_squeezed = np.squeeze(classes).astype(np.int32)
+    
+    # One pass yields the stop decision, traffic_light_detected and the confidence
+    # Per-light output needs every light classified, so no early exit then
+    decision = decide(image, boxes_squeezed, scores_squeezed, classes_squeezed,
+                      first_red_wins=FIRST_RED_WINS and not include_lights)
+    command, message = _command_for(decision["stop"])
+    
+    traffic_light_detected = decision["traffic_light_detected"]
+    confidence = decision["confidence"]
+    
+    # Clean up memory; the governor decides whether a full collection is worth it
+    del boxes, scores, classes
+    memory_governor.after_request()
+    
+    result = {
+        "command": command,
+        "confidence": confidence,
+        "traffic_light_detected": traffic_light_detected,
+        "message": message,
+        "model": model_name
+    }
+    if include_lights:
+        result["lights"] = encode_lights(decision["lights"])
+    return result
 
-            (boxes, scores, classes, num) = sess.run(
-                [detection_boxes, detection_scores, detection_classes, num_detections],
-                feed_dict={image_tensor: image_np_expanded})
+def detect_traffic_lights_in_image(image: Image.Image, model_name: Optional[str] = None,
+                                   include_lights: bool = False) -> dict:
+    model_name = _require_model(model_name)
+    try:
+        image_np = _to_input_tensor(image, model_name)
+        boxes, scores, classes, num = model_registry.batcher(model_name).submit(image_np).result()
+        del image_np
+        return _build_detection_result(image, boxes, scores, classes, model_name, include_lights)
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=400, detail=f"Error processing image: {str(e)}")
 
-        boxes_squeezed = np.squeeze(boxes)
-        scores_squeezed = np.squeeze(scores)
-        classes_squeezed = np.squeeze(classes).astype(np.int32)
-        
-        stop_flag = read_traffic_lights_object(
-            image, boxes_squeezed, scores_squeezed, classes_squeezed
-        )
-        
-        # Determine command based on original logic: True = go, False = stop
-        # stop_flag: True = red/yellow detected (stop), False = green or no traffic light (go)
-        if stop_flag:
-            command = "Stop"
-            message = "Traffic light detected: Red or Yellow signal (Stop)"
-        else:
-            command = "Go"
-            message = "Traffic light detected: Green signal or no traffic light (Go)"
-        
-        # Check if any traffic light was detected (for traffic_light_detected field)
-        traffic_light_detected = False
-        for i in range(min(20, len(scores_squeezed))):
-            if scores_squeezed[i] > 0.5 and classes_squeezed[i] == 10:  # traffic_light_label = 10
-                traffic_light_detected = True
-                break
-        
-        confidence = float(np.max(scores_squeezed)) if len(scores_squeezed) > 0 else 0.0
-        
-        # Clean up memory
-        del image_np, image_np_expanded, boxes, scores, classes, num
-        gc.collect()  # Force garbage collection to free memory
-        
-        return {
-            "command": command,
-            "confidence": confidence,
-            "traffic_light_detected": traffic_light_detected,
-            "message": message
-        }
+async def detect_traffic_lights_in_image_async(image: Image.Image, model_name: Optional[str] = None,
+                                               include_lights: bool = False) -> dict:
+    """
+    Same as detect_traffic_lights_in_image, but never blocks the event loop:
+    tensor conversion and colour classification run on the inference executor
+    and the batched sess.run is awaited, so concurrent requests can share a batch.
+    """
+    model_name = _require_model(model_name)
+    try:
+        image_np = await inference_executor.run(_to_input_tensor, image, model_name)
+        boxes, scores, classes, num = await asyncio.wrap_future(model_registry.batcher(model_name).submit(image_np))
+        del image_np
+        return await inference_executor.run(_build_detection_result, image, boxes, scores, classes,
+                                            model_name, include_lights)
     except Exception as e:
         traceback.print_exc()
         raise HTTPException(status_code=400, detail=f"Error processing image: {str(e)}")
 
+def _cache_namespace(model_name: str, include_lights: bool) -> str:
+    """Results differ per model and per response mode, so they are cached separately."""
+    return f"{model_name}:lights" if include_lights else model_name
+
+async def _detect_with_cache(image: Image.Image, cache_key: str, model_name: str,
+                             include_lights: bool = False) -> dict:
+    """
+    Detect on an image whose exact upload missed the result cache. In perceptual
+    mode a recent near-duplicate frame's result is reused, but only if the colour
+    check on its light boxes still gives the same command for this frame;
+    otherwise the result is stored.
+    """
+    namespace = _cache_namespace(model_name, include_lights)
+    if not result_cache.perceptual:
+        result = await detect_traffic_lights_in_image_async(image, model_name, include_lights)
+        result_cache.put(cache_key, result, namespace=namespace)
+        return result
+
+    phash = await inference_executor.run(perceptual_hash, image)
+    cached = await inference_executor.run(result_cache.get_similar, phash, namespace,
+                                          lambda boxes, cached: _same_stop_decision(image, boxes, cached))
+    if cached is not None:
+        return cached
+    # The light boxes are stored with the entry for that re-check
+    result = await detect_traffic_lights_in_image_async(image, model_name, include_lights=True)
+    boxes = decode_boxes(result["lights"])
+    if not include_lights:
+        del result["lights"]
+    result_cache.put(cache_key, result, phash, namespace, check=boxes)
+    return result
+
+def _same_stop_decision(image: Image.Image, boxes, cached: dict) -> bool:
+    """Whether the lights at a cached result's boxes still give its command on `image`."""
+    return stop_at_boxes(image, boxes) == (cached["command"] == "Stop")
+
+async def _detect_tracked(image: Image.Image, tracker: TrafficLightTracker, model_name: str,
+                          include_lights: bool = False) -> dict:
+    """
+    Detection on one frame of a tracked stream: the full detector when the tracker
+    asks for it, otherwise only the colour check on the tracked boxes. The command
+    goes through the tracker's hysteresis; "tracked" tells which path produced it.
+    """
+    if tracker.needs_detection():
+        result = await detect_traffic_lights_in_image_async(image, model_name, include_lights=True)
+        tracker.observe_detection(result["lights"], result["confidence"])
+        raw_stop = result["command"] == "Stop"
+        if not include_lights:
+            del result["lights"]
+        result["tracked"] = False
+    else:
+        try:
+            raw_stop, tracked_lights = await inference_executor.run(tracker.recheck, image)
+        except Exception as e:
+            traceback.print_exc()
+            raise HTTPException(status_code=400, detail=f"Error processing image: {str(e)}")
+        result = {
+            "confidence": tracker.confidence,
+            "traffic_light_detected": bool(tracked_lights),
+            "model": model_name,
+            "tracked": True
+        }
+        if include_lights:
+            result["lights"] = encode_lights(tracked_lights)
+    result["command"], result["message"] = _command_for(tracker.smooth(raw_stop))
+    return result
+
 ### Load Model Function
 
+async def _detect_bytes(contents, model_name: str, include_lights: bool = False) -> dict:
+    """Cached detection on one encoded image; the caller holds the inference slot."""
+    cache_key = result_cache.key_for_bytes(contents, _cache_namespace(model_name, include_lights))
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    image = await inference_executor.run(bytes_to_image, contents, model_name)
+    return await _detect_with_cache(image, cache_key, model_name, include_lights)
+
+async def _read_batch(request: Request):
+    """
+    Images of a /detect-batch request as (filename, bytes) pairs: multipart
+    "files" fields, or a raw body holding a length-prefixed envelope.
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        # Parsed from the size-limited stream: request.form() would spool a body of any size first
+        parser = MultiPartParser(request.headers, limit_stream(request.stream(), request.headers.get("content-length"),
+                                                               MAX_BATCH_BYTES))
+        try:
+            form = await parser.parse()
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except MultiPartException as e:
+            raise HTTPException(status_code=400, detail=e.message)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        try:
+            uploads = form.getlist("files")
+            if len(uploads) > MAX_BATCH_IMAGES:
+                raise HTTPException(status_code=413,
+                                    detail=f"Too many images in one batch (limit {MAX_BATCH_IMAGES})")
+            items = []
+            for upload in uploads:
+                contents = await upload.read()
+                if len(contents) > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413,
+                                        detail=f"{upload.filename} exceeds the {MAX_UPLOAD_BYTES} byte limit")
+                items.append((upload.filename, contents))
+            return items
+        finally:
+            await form.close()
+    if is_raw_content_type(content_type):
+        try:
+            envelope = await read_stream(request.stream(), request.headers.get("content-length"), MAX_BATCH_BYTES)
+            return [(None, image) for image in split_envelope(envelope, MAX_BATCH_IMAGES, MAX_UPLOAD_BYTES)]
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except UploadIncomplete as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Malformed batch envelope: {e}")
+    raise HTTPException(status_code=415, detail="Send multipart/form-data 'files' fields or a length-prefixed "
+                                                "application/octet-stream envelope")
+
+async def _save_video(request: Request) -> str:
+    """
+    Stream a /detect-video upload (multipart "file" field, or the raw body for
+    video/* and application/octet-stream) into a temporary file for OpenCV.
+    """
+    content_type = request.headers.get("content-type", "")
+    multipart = content_type.startswith("multipart/form-data")
+    if not (multipart or content_type.startswith("video/") or is_raw_content_type(content_type)):
+        raise HTTPException(status_code=415, detail="Send the video as a multipart 'file' field or a raw video/* body")
+    source = limit_stream(request.stream(), request.headers.get("content-length"), MAX_VIDEO_BYTES)
+
+    fd, path = tempfile.mkstemp(prefix="detect-video-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            try:
+                if multipart:
+                    # The "file" part goes straight to disk: request.form() would spool the whole body first
+                    await copy_multipart_field(content_type, source, "file", out)
+                else:
+                    async for chunk in source:
+                        out.write(chunk)
+            except UploadTooLarge as e:
+                raise HTTPException(status_code=413, detail=str(e))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
 def load_model():
     global detection_graph, sess, category_index, MODEL_LOADED, MODEL_LOADING_ERROR
     
+    # Load every configured model (default first); each one gets its own retries
+    for model_name in model_registry.configured_models:
+        _load_model_with_retries(model_name)
+
+def _load_model_with_retries(model_name):
+    global MODEL_LOADED, MODEL_LOADING_ERROR
+    
     # Retry mechanism for cloud environments
     max_retries = 3
     for attempt in range(max_retries):
         try:
-            print(f"🔄 Model loading attempt {attempt + 1}/{max_retries}")
-            _load_model_attempt()
+            print(f"🔄 Loading {model_name}: attempt {attempt + 1}/{max_retries}")
+            _load_model_attempt(model_name)
             return  # Success, exit the function
         except Exception as e:
             print(f"❌ Attempt {attempt + 1} failed: {str(e)}")
@@ -346,16 +653,16 @@ def load_model():
                 time.sleep(10)
             else:
                 print(f"💥 All {max_retries} attempts failed")
-                MODEL_LOADED = False
+                MODEL_LOADED = model_registry.is_loaded(model_registry.default_model)
                 MODEL_LOADING_ERROR = str(e)
                 traceback.print_exc()
 
-def _load_model_attempt():
-    global detection_graph, sess, category_index, MODEL_LOADED, MODEL_LOADING_ERROR
+def _load_model_attempt(model_name=None):
+    global detection_graph, sess, engine, category_index, MODEL_LOADED, MODEL_LOADING_ERROR
     try:
-        # Using the same model as original code by Nilesh Chopda
-        # MODEL_NAME = 'ssd_mobilenet_v1_coco_11_06_2017'    # for faster detection but low accuracy
-        MODEL_NAME = 'faster_rcnn_resnet101_coco_11_06_2017'  # for improved accuracy
+        # Faster R-CNN (original code by Nilesh Chopda) unless DEFAULT_MODEL / MODELS choose
+        # 'ssd_mobilenet_v1_coco_11_06_2017' for faster detection but low accuracy
+        MODEL_NAME = model_name or model_registry.configured_models[0]
         MODEL_FILE = MODEL_NAME + '.tar.gz'
         DOWNLOAD_BASE = 'http://download.tensorflow.org/models/object_detection/'
         PATH_TO_CKPT = MODEL_NAME + '/frozen_inference_graph.pb'
@@ -393,12 +700,22 @@ def _load_model_attempt():
                 tar_file.close()
                 print("✅ Model extracted successfully!")
 
+        # Prefer the graph optimized offline by prepare_model.py (see USE_OPTIMIZED_GRAPH env var),
+        # or serve a quantize_model.py variant with MODEL_VARIANT=float16 / int8
+        PATH_TO_GRAPH = preferred_graph_path(MODEL_NAME)
+        if PATH_TO_GRAPH != PATH_TO_CKPT:
+            print(f"⚡ Using prepared graph: {PATH_TO_GRAPH}")
+
+        if INFERENCE_PROCESSES > 0:
+            _start_worker_pool(MODEL_NAME, PATH_TO_GRAPH, PATH_TO_LABELS, NUM_CLASSES, INFERENCE_PROCESSES)
+            return
+
         print("🧠 Loading TensorFlow model...")
         detection_graph_local = tf.Graph()
         with detection_graph_local.as_default():
             try:
                 od_graph_def = tf.compat.v1.GraphDef()
-                with tf.io.gfile.GFile(PATH_TO_CKPT, 'rb') as fid:
+                with tf.io.gfile.GFile(PATH_TO_GRAPH, 'rb') as fid:
                     serialized_graph = fid.read()
                     od_graph_def.ParseFromString(serialized_graph)
                     tf.import_graph_def(od_graph_def, name='')
@@ -407,7 +724,7 @@ def _load_model_attempt():
                 # Fallback for older TensorFlow versions
                 try:
                     od_graph_def = tf.GraphDef()
-                    with tf.gfile.GFile(PATH_TO_CKPT, 'rb') as fid:
+                    with tf.gfile.GFile(PATH_TO_GRAPH, 'rb') as fid:
                         serialized_graph = fid.read()
                         od_graph_def.ParseFromString(serialized_graph)
                         tf.import_graph_def(od_graph_def, name='')
@@ -428,26 +745,89 @@ def _load_model_attempt():
         config = tf.compat.v1.ConfigProto()
         config.allow_soft_placement = True
         config.log_device_placement = False
+        # A quantized variant only stays small in memory without constant folding
+        keep_weights_quantized(config, PATH_TO_GRAPH)
         sess_local = tf.compat.v1.Session(graph=detection_graph_local, config=config)
         print("✅ TensorFlow session created successfully!")
 
+        # Resolve input/output tensors once and prepare the session callable
+        engine_local = InferenceEngine(detection_graph_local, sess_local, name=MODEL_NAME)
+
+        # Pay TF's lazy initialisation before the model takes requests
+        _warm_up(MODEL_NAME, engine_local)
+
         # assign to globals only after success
-        detection_graph = detection_graph_local
-        sess = sess_local
+        model_registry.register(MODEL_NAME, engine_local)
+        if MODEL_NAME == model_registry.configured_models[0]:
+            detection_graph = detection_graph_local
+            sess = sess_local
+            engine = engine_local
         category_index = category_index_local
-        MODEL_LOADED = True
+        MODEL_LOADED = model_registry.is_loaded(model_registry.default_model)
         MODEL_LOADING_ERROR = None
-        print("🎉 Model loaded successfully and ready for inference!")
+        result_cache.clear()  # results from a previous model are stale
+        print(f"🎉 Model {MODEL_NAME} loaded successfully and ready for inference!")
         
         # Force garbage collection to free memory
         gc.collect()
         print("🧹 Performed garbage collection to free memory")
     except Exception as e:
-        MODEL_LOADED = False
+        MODEL_LOADED = model_registry.is_loaded(model_registry.default_model)
         MODEL_LOADING_ERROR = str(e)
         traceback.print_exc()
         print(f"❌ Model failed to load: {MODEL_LOADING_ERROR}")
 
+def _warm_up(model_name, backend):
+    """Run the synthetic warm-up batches on a loaded backend before it is registered."""
+    if model_warmup.enabled:
+        shapes = ", ".join(f"{height}x{width}" for height, width in model_warmup.input_shapes(model_name))
+        print(f"🔥 Warming up {model_name} at {shapes}...")
+    record = model_warmup.run(model_name, backend)
+    if record["error"]:
+        print(f"⚠️ Warm-up of {model_name} failed, serving it cold: {record['error']}")
+    elif record["runs"]:
+        print(f"✅ Warm-up of {model_name} done in {record['total_ms']:.0f} ms "
+              f"(first run {record['runs'][0]['ms']:.0f} ms, last {record['runs'][-1]['ms']:.0f} ms)")
+
+def _warm_up_restarted_worker(model_name, run_batch):
+    """Warm-up of a pool worker restarted after a crash, before it rejoins dispatch."""
+    elapsed_ms = model_warmup.warm_worker(model_name, run_batch)
+    if model_warmup.enabled:
+        print(f"✅ Restarted inference worker of {model_name} warmed up in {elapsed_ms:.0f} ms")
+
+def _start_worker_pool(model_name, path_to_ckpt, path_to_labels, num_classes, num_processes):
+    """
+    Serve inference from worker processes instead of an in-process session.
+    Each worker loads its own copy of the graph, so the pool starts only as many
+    workers as fit in memory (see InferenceWorkerPool.start).
+    """
+    global detection_graph, sess, engine, category_index, MODEL_LOADED, MODEL_LOADING_ERROR
+
+    label_map = label_map_util.load_labelmap(path_to_labels)
+    categories = label_map_util.convert_label_map_to_categories(label_map,
+                                                                max_num_classes=num_classes,
+                                                                use_display_name=True)
+    category_index_local = label_map_util.create_category_index(categories)
+
+    # Split the cores between workers so their TF thread pools do not oversubscribe
+    intra_op_threads = max(1, (os.cpu_count() or 1) // num_processes)
+    print(f"🧵 Starting {num_processes} inference worker processes for {model_name} ({intra_op_threads} intra-op threads each)...")
+    pool = InferenceWorkerPool(path_to_ckpt, num_processes, inter_op_threads=1, intra_op_threads=intra_op_threads,
+                               warmup=lambda run_batch: _warm_up_restarted_worker(model_name, run_batch))
+    pool.start()
+    _warm_up(model_name, pool)
+
+    model_registry.register(model_name, pool)
+    if model_name == model_registry.configured_models[0]:
+        detection_graph = None
+        sess = None
+        engine = None
+    category_index = category_index_local
+    MODEL_LOADED = model_registry.is_loaded(model_registry.default_model)
+    MODEL_LOADING_ERROR = None
+    result_cache.clear()  # results from a previous model are stale
+    print(f"🎉 Worker pool for {model_name} ready for inference!")
+
 ### FastAPI Startup Event
 
 @app.on_event("startup")
@@ -459,6 +839,7 @@ async def startup_event():
     loader = threading.Thread(target=load_model, daemon=True)
     loader.start()
     print("✅ Model loader thread started (loading in background)")
+    memory_governor.start()
     
     # Wait a bit for initial model loading
     time.sleep(5)
@@ -468,6 +849,11 @@ async def startup_event():
     else:
         print("⏳ Model still loading... (this may take a few minutes)")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    model_registry.close()
+    url_fetcher.close()
+
 ### FastAPI Routes
 
 @app.get("/")
@@ -485,9 +871,17 @@ async def health_check():
     """Health check endpoint"""
     if MODEL_LOADED:
         return {
-            "status": "healthy",
+            "status": "ready",
             "model_loaded": True,
-            "message": "API is ready to process requests"
+            "message": "API is ready to process requests",
+            "warmup": model_warmup.stats()["models"]
+        }
+    elif model_warmup.is_warming():
+        return {
+            "status": "warming",
+            "model_loaded": False,
+            "message": "Model is loaded and running its warm-up inference, please wait...",
+            "warmup": model_warmup.stats()["models"]
         }
     elif MODEL_LOADING_ERROR:
         return {
@@ -509,17 +903,36 @@ async def status():
     return {
         "api_status": "running",
         "model_loaded": MODEL_LOADED,
-        "model_error": MODEL_LOADING_ERROR
+        "model_error": MODEL_LOADING_ERROR,
+        "models": model_registry.stats(),
+        "inference_executor": inference_executor.stats(),
+        "result_cache": result_cache.stats(),
+        "input_resize": resize_policy.stats(),
+        "image_decoder": image_decoder.stats(),
+        "image_guard": image_guard.stats(),
+        "warmup": model_warmup.stats(),
+        "url_fetcher": url_fetcher.stats(),
+        "memory_info": memory_governor.stats()
     }
 
 @app.post("/detect", response_model=DetectionResponse)
-async def detect_traffic_light(file: UploadFile = File(...)):
+async def detect_traffic_light(file: UploadFile = File(...),
+                               model: Optional[str] = Query(None, description=MODEL_PARAM_DESCRIPTION),
+                               x_model: Optional[str] = Header(None),
+                               lights: bool = Query(False, description=LIGHTS_PARAM_DESCRIPTION)):
     try:
+        model_name = _require_model(model or x_model)
+        # Reject by header before the whole upload is read into memory
+        _check_image(await file.read(HEADER_PEEK_BYTES), complete=False)
+        await file.seek(0)
         contents = await file.read()
-        image = Image.open(io.BytesIO(contents))
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        result = detect_traffic_lights_in_image(image)
+        cache_key = result_cache.key_for_bytes(contents, _cache_namespace(model_name, lights))
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return DetectionResponse(**cached)
+        async with _inference_slot():
+            image = await inference_executor.run(bytes_to_image, contents, model_name)
+            result = await _detect_with_cache(image, cache_key, model_name, lights)
         return DetectionResponse(**result)
     except HTTPException:
         raise
@@ -528,13 +941,22 @@ async def detect_traffic_light(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail=f"Error processing image: {str(e)}")
 
 @app.post("/detect-base64", response_model=DetectionResponse)
-async def detect_traffic_light_base64(request: Base64ImageRequest):
+async def detect_traffic_light_base64(request: Base64ImageRequest,
+                                      model: Optional[str] = Query(None, description=MODEL_PARAM_DESCRIPTION),
+                                      x_model: Optional[str] = Header(None),
+                               lights: bool = Query(False, description=LIGHTS_PARAM_DESCRIPTION)):
     try:
-        image = base64_to_image(request.image_base64, request.image_format)
-        result = detect_traffic_lights_in_image(image)
+        model_name = _require_model(model or x_model)
+        cache_key = result_cache.key_for_bytes(request.image_base64.encode(),
+                                               _cache_namespace(model_name, lights))
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return DetectionResponse(**cached)
+        async with _inference_slot():
+            image = await inference_executor.run(base64_to_image, request.image_base64, request.image_format, model_name)
+            result = await _detect_with_cache(image, cache_key, model_name, lights)
         # Clean up image from memory
         del image
-        gc.collect()  # Force garbage collection
         return DetectionResponse(**result)
     except HTTPException:
         raise
@@ -542,15 +964,223 @@ async def detect_traffic_light_base64(request: Base64ImageRequest):
         traceback.print_exc()
         raise HTTPException(status_code=400, detail=f"Error processing base64 image: {str(e)}")
 
+@app.post("/detect-raw", response_model=DetectionResponse)
+async def detect_traffic_light_raw(request: Request,
+                                   model: Optional[str] = Query(None, description=MODEL_PARAM_DESCRIPTION),
+                                   x_model: Optional[str] = Header(None),
+                                   lights: bool = Query(False, description=LIGHTS_PARAM_DESCRIPTION)):
+    """
+    Raw image upload: the request body is the encoded image itself
+    (application/octet-stream, image/jpeg or image/png), without multipart or base64.
+    """
+    if not is_raw_content_type(request.headers.get("content-type")):
+        raise HTTPException(status_code=415,
+                            detail=f"Unsupported content type. Use one of: {', '.join(RAW_CONTENT_TYPES)}")
+    try:
+        model_name = _require_model(model or x_model)
+        try:
+            contents = await read_stream(request.stream(), request.headers.get("content-length"), MAX_UPLOAD_BYTES,
+                                         inspect=lambda head: _check_image(head, complete=False))
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except UploadIncomplete as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        cache_key = result_cache.key_for_bytes(contents, _cache_namespace(model_name, lights))
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return DetectionResponse(**cached)
+        async with _inference_slot():
+            image = await inference_executor.run(bytes_to_image, contents, model_name)
+            result = await _detect_with_cache(image, cache_key, model_name, lights)
+        return DetectionResponse(**result)
+    except HTTPException:
+        raise
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=400, detail=f"Error processing raw image: {str(e)}")
+
+@app.post("/detect-batch", response_model=BatchDetectionResponse)
+async def detect_traffic_light_batch(request: Request,
+                                     model: Optional[str] = Query(None, description=MODEL_PARAM_DESCRIPTION),
+                                     x_model: Optional[str] = Header(None),
+                                     lights: bool = Query(False, description=LIGHTS_PARAM_DESCRIPTION)):
+    """
+    Several images in one request, as multipart "files" fields or a raw body of
+    length-prefixed images (4-byte big-endian size before each). Images are
+    decoded in parallel and submitted together, so equally sized frames share
+    sess.run calls. Results come back in request order, one per image; a bad
+    image fails only its own item.
+    """
+    model_name = _require_model(model or x_model)
+    items = await _read_batch(request)
+    async with _inference_slot():
+        outcomes = await asyncio.gather(*[_detect_bytes(contents, model_name, lights) for _, contents in items],
+                                        return_exceptions=True)
+    results = []
+    for index, ((filename, _), outcome) in enumerate(zip(items, outcomes)):
+        if isinstance(outcome, HTTPException):
+            results.append(BatchItemResponse(index=index, filename=filename, error=str(outcome.detail)))
+        elif isinstance(outcome, Exception):
+            results.append(BatchItemResponse(index=index, filename=filename, error=f"Error processing image: {outcome}"))
+        else:
+            results.append(BatchItemResponse(index=index, filename=filename, result=DetectionResponse(**outcome)))
+    return BatchDetectionResponse(results=results)
+
+@app.post("/detect-video")
+async def detect_traffic_light_video(request: Request,
+                                     model: Optional[str] = Query(None, description=MODEL_PARAM_DESCRIPTION),
+                                     x_model: Optional[str] = Header(None),
+                                     lights: bool = Query(False, description=LIGHTS_PARAM_DESCRIPTION),
+                                     sample_fps: Optional[float] = Query(
+                                         None, ge=0, description="Frames per second of video to detect on "
+                                                                 "(0 = no time-based sampling; default VIDEO_SAMPLE_FPS)"),
+                                     scene_threshold: Optional[float] = Query(
+                                         None, ge=0, description="Also detect on frames that differ from the last "
+                                                                 "detected one by this mean gray level (0-255; 0 = off)"),
+                                     track: bool = Query(False, description=TRACK_PARAM_DESCRIPTION)):
+    """
+    Detect on an uploaded video. Frames are decoded with OpenCV on a background
+    thread, sampled, and batched into the detector while decoding continues.
+    Results stream back as NDJSON: one line per sampled frame, in frame order,
+    then a summary line with "done": true. With track=true the frames are
+    processed one at a time through a tracker (see TRACK_PARAM_DESCRIPTION).
+    """
+    model_name = _require_model(model or x_model)
+    sampler = FrameSampler.from_env(sample_fps, scene_threshold)
+    decode_stats = {"frames_decoded": 0}
+    tracker = TrafficLightTracker.from_env() if track else None
+    # The tracker needs frames in order, so tracked videos run one frame at a time
+    max_in_flight = 1 if tracker is not None else VIDEO_MAX_IN_FLIGHT
+
+    path = await _save_video(request)
+    try:
+        inference_executor.acquire()
+    except InferenceQueueFull as e:
+        os.remove(path)
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+
+    def finish():
+        # A background task runs after the response even when the client disconnects
+        # mid-stream, which the generator's own cleanup would not
+        inference_executor.release()
+        os.remove(path)
+
+    async def detect(frame):
+        if tracker is not None:
+            return await _detect_tracked(Image.fromarray(frame), tracker, model_name, lights)
+        return await detect_traffic_lights_in_image_async(Image.fromarray(frame), model_name, lights)
+
+    async def lines():
+        sampled = 0
+        try:
+            frames = iter_sampled_frames(path, sampler, decode_stats)
+            async for index, timestamp_ms, outcome in run_pipeline(frames, detect, max_in_flight, VIDEO_PREFETCH):
+                sampled += 1
+                item = {"frame": index, "timestamp_ms": timestamp_ms}
+                if isinstance(outcome, HTTPException):
+                    item["error"] = str(outcome.detail)
+                elif isinstance(outcome, Exception):
+                    item["error"] = f"Error processing frame: {outcome}"
+                else:
+                    item.update(outcome)
+                yield json.dumps(item) + "\n"
+            summary = {"done": True}
+        except Exception as e:
+            traceback.print_exc()
+            summary = {"done": True, "error": f"Error processing video: {e}"}
+        summary.update(frames_decoded=decode_stats["frames_decoded"], frames_sampled=sampled,
+                       fps=decode_stats.get("fps"))
+        if tracker is not None:
+            summary["tracker"] = tracker.stats()
+        yield json.dumps(summary) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", background=BackgroundTask(finish))
+
+@app.websocket("/ws/detect")
+async def detect_traffic_light_ws(websocket: WebSocket,
+                                  model: Optional[str] = Query(None, description=MODEL_PARAM_DESCRIPTION),
+                                  x_model: Optional[str] = Header(None),
+                                  lights: bool = Query(False, description=LIGHTS_PARAM_DESCRIPTION),
+                                  track: bool = Query(False, description=TRACK_PARAM_DESCRIPTION)):
+    """
+    Live detection channel: the client sends binary JPEG/PNG frames and gets one
+    JSON result per processed frame. When frames arrive faster than detection,
+    only the newest waiting frame is processed and older ones are dropped;
+    each result carries its frame sequence number and the running drop count.
+    With track=true the connection keeps a tracker (see TRACK_PARAM_DESCRIPTION).
+    """
+    await websocket.accept()
+    try:
+        model_name = _require_model(model or x_model)
+    except HTTPException as e:
+        await websocket.send_json({"error": str(e.detail)})
+        await websocket.close(code=1008)
+        return
+
+    slot = LatestFrameSlot()
+    tracker = TrafficLightTracker.from_env() if track else None
+
+    async def receive_frames():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes"):
+                    slot.put(message["bytes"])
+        finally:
+            slot.close()
+
+    receiver = asyncio.ensure_future(receive_frames())
+    try:
+        while True:
+            item = await slot.get()
+            if item is None:
+                break
+            seq, data, received_at = item
+            payload = {"frame": seq}
+            try:
+                inference_executor.acquire()
+            except InferenceQueueFull as e:
+                payload["error"] = str(e)
+            else:
+                try:
+                    if tracker is not None:
+                        image = await inference_executor.run(bytes_to_image, data, model_name)
+                        payload.update(await _detect_tracked(image, tracker, model_name, lights))
+                    else:
+                        payload.update(await _detect_bytes(data, model_name, lights))
+                except HTTPException as e:
+                    payload["error"] = str(e.detail)
+                except Exception as e:
+                    payload["error"] = f"Error processing frame: {e}"
+                finally:
+                    inference_executor.release()
+            payload["latency_ms"] = round((time.perf_counter() - received_at) * 1000.0, 1)
+            payload["dropped"] = slot.dropped
+            await websocket.send_json(payload)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+
 @app.post("/detect-url", response_model=DetectionResponse)
-async def detect_traffic_light_url(image_url: str):
+async def detect_traffic_light_url(image_url: str,
+                                   model: Optional[str] = Query(None, description=MODEL_PARAM_DESCRIPTION),
+                                   x_model: Optional[str] = Header(None),
+                               lights: bool = Query(False, description=LIGHTS_PARAM_DESCRIPTION)):
     try:
-        response = urllib.request.urlopen(image_url)
-        image_data = response.read()
-        image = Image.open(io.BytesIO(image_data))
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        result = detect_traffic_lights_in_image(image)
+        model_name = _require_model(model or x_model)
+        # Network I/O goes to the default pool so it does not hold an inference worker
+        try:
+            image_data = await url_fetcher.fetch_async(image_url)
+        except FetchTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except FetchError as e:
+            raise HTTPException(status_code=502, detail=str(e))
+        async with _inference_slot():
+            image = await inference_executor.run(bytes_to_image, image_data, model_name)
+            result = await detect_traffic_lights_in_image_async(image, model_name, lights)
         return DetectionResponse(**result)
     except HTTPException:
         raise
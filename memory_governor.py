@@ -0,0 +1,164 @@
+"""
+Memory governor for the inference process.
+
+Replaces unconditional per-request gc.collect() calls. It tracks the process
+RSS and its high-water mark, and only runs a full collection when RSS crosses
+a soft limit (rate-limited) or when the service has been idle for a while
+after handling requests. Decisions are kept for /status.
+"""
+import gc
+import os
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+_MB = 1024 * 1024
+
+
+def process_rss_bytes(pid):
+    """Resident set size of process `pid`, or None when it cannot be read."""
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def current_rss_bytes():
+    """Resident set size of this process, or None when it cannot be read."""
+    return process_rss_bytes('self')
+
+
+def peak_rss_bytes():
+    if resource is None:
+        return 0
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def container_memory_limit_bytes():
+    """cgroup (v2 or v1) memory limit, or None when unlimited / unknown."""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < (1 << 60):
+            return int(value)
+    return None
+
+
+def available_memory_bytes():
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class MemoryGovernor:
+    """
+    Decides when to run gc.collect().
+    :param soft_limit_bytes: RSS above which a collection is triggered (None disables)
+    :param idle_seconds: collect once after this long without requests
+    :param min_interval: minimum seconds between threshold-triggered collections
+    """
+
+    def __init__(self, soft_limit_bytes=None, idle_seconds=5.0, min_interval=2.0):
+        self.soft_limit_bytes = soft_limit_bytes
+        self.idle_seconds = idle_seconds
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._thread = None
+        self._last_request = 0.0
+        self._last_collect = 0.0
+        self._requests_since_collect = 0
+        self._high_water = current_rss_bytes() or 0
+        self._collections = {"threshold": 0, "idle": 0}
+        self._last_decision = None
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build a governor from MEMORY_SOFT_LIMIT_MB / GC_IDLE_SECONDS.
+        The soft limit defaults to 80% of the container memory limit.
+        """
+        soft_limit_mb = os.environ.get('MEMORY_SOFT_LIMIT_MB')
+        if soft_limit_mb is not None:
+            soft_limit = int(float(soft_limit_mb) * _MB)
+        else:
+            limit = container_memory_limit_bytes()
+            soft_limit = int(limit * 0.8) if limit else None
+        return cls(soft_limit_bytes=soft_limit,
+                   idle_seconds=float(os.environ.get('GC_IDLE_SECONDS', 5)))
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._idle_loop, name="memory-governor", daemon=True)
+            self._thread.start()
+
+    def after_request(self):
+        """Record a finished request; collect only if RSS is over the soft limit."""
+        rss = current_rss_bytes()
+        now = time.monotonic()
+        with self._lock:
+            self._last_request = now
+            self._requests_since_collect += 1
+            if rss is None:
+                return
+            self._high_water = max(self._high_water, rss)
+            over_limit = self.soft_limit_bytes is not None and rss > self.soft_limit_bytes
+            if not over_limit or now - self._last_collect < self.min_interval:
+                return
+        self._collect("threshold", rss)
+
+    def _idle_loop(self):
+        while True:
+            time.sleep(max(0.5, self.idle_seconds / 2))
+            with self._lock:
+                idle = time.monotonic() - self._last_request
+                pending = self._requests_since_collect
+            if pending and idle >= self.idle_seconds:
+                self._collect("idle", current_rss_bytes())
+
+    def _collect(self, reason, rss_before):
+        started = time.monotonic()
+        freed_objects = gc.collect()
+        rss_after = current_rss_bytes()
+        with self._lock:
+            self._last_collect = time.monotonic()
+            self._requests_since_collect = 0
+            self._collections[reason] += 1
+            self._last_decision = {
+                "reason": reason,
+                "rss_before_mb": round(rss_before / _MB, 1) if rss_before else None,
+                "rss_after_mb": round(rss_after / _MB, 1) if rss_after else None,
+                "collected_objects": freed_objects,
+                "duration_ms": round((self._last_collect - started) * 1000.0, 2),
+            }
+
+    def stats(self):
+        rss = current_rss_bytes()
+        available = available_memory_bytes()
+        with self._lock:
+            if rss is not None:
+                self._high_water = max(self._high_water, rss)
+            return {
+                "rss_mb": round(rss / _MB, 1) if rss is not None else "N/A",
+                "high_water_mb": round(max(self._high_water, peak_rss_bytes()) / _MB, 1),
+                "available": f"{round(available / _MB)} MB" if available is not None else "N/A",
+                "soft_limit_mb": round(self.soft_limit_bytes / _MB, 1) if self.soft_limit_bytes else None,
+                "idle_seconds": self.idle_seconds,
+                "requests_since_collect": self._requests_since_collect,
+                "collections": dict(self._collections),
+                "last_collection": self._last_decision,
+            }
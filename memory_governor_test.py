@@ -0,0 +1,42 @@
+"""Tests for memory_governor."""
+
+import time
+import unittest
+
+import memory_governor
+from memory_governor import MemoryGovernor
+
+
+class MemoryGovernorTest(unittest.TestCase):
+
+    def test_no_collection_below_soft_limit(self):
+        governor = MemoryGovernor(soft_limit_bytes=1 << 50)
+        for _ in range(5):
+            governor.after_request()
+        stats = governor.stats()
+        self.assertEqual(stats["collections"], {"threshold": 0, "idle": 0})
+        self.assertEqual(stats["requests_since_collect"], 5)
+
+    @unittest.skipIf(memory_governor.current_rss_bytes() is None, "RSS not readable on this platform")
+    def test_collects_above_soft_limit_rate_limited(self):
+        governor = MemoryGovernor(soft_limit_bytes=1, min_interval=60)
+        governor.after_request()
+        governor.after_request()
+        stats = governor.stats()
+        self.assertEqual(stats["collections"]["threshold"], 1)
+        self.assertEqual(stats["last_collection"]["reason"], "threshold")
+        self.assertEqual(stats["requests_since_collect"], 1)
+
+    def test_collects_when_idle(self):
+        governor = MemoryGovernor(soft_limit_bytes=None, idle_seconds=0.2)
+        governor.start()
+        governor.after_request()
+        deadline = time.monotonic() + 5
+        while governor.stats()["collections"]["idle"] == 0 and time.monotonic() < deadline:
+            time.sleep(0.1)
+        self.assertEqual(governor.stats()["collections"]["idle"], 1)
+        self.assertEqual(governor.stats()["requests_since_collect"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+"""
+Registry of loaded detection models.
+
+Both bundled graphs can be served side by side: each loaded model has its own
+inference backend (an InferenceEngine or an InferenceWorkerPool) and its own
+micro-batcher, since a batch can only go through one graph. Requests pick a
+model by name or alias; otherwise the configured default is used. The
+"cascade" pseudo-model runs SSD MobileNet first and escalates ambiguous
+frames to Faster R-CNN (see cascade.py); it needs both models loaded.
+"""
+import os
+import threading
+
+from batching import MicroBatcher
+from cascade import CascadeDetector
+
+FASTER_RCNN_MODEL = 'faster_rcnn_resnet101_coco_11_06_2017'  # for improved accuracy
+SSD_MOBILENET_MODEL = 'ssd_mobilenet_v1_coco_11_06_2017'    # for faster detection but low accuracy
+
+CASCADE_MODEL = 'cascade'
+
+KNOWN_MODELS = (FASTER_RCNN_MODEL, SSD_MOBILENET_MODEL)
+
+# Models a cascade is built from: (fast, accurate)
+CASCADE_STAGES = (SSD_MOBILENET_MODEL, FASTER_RCNN_MODEL)
+
+MODEL_ALIASES = {
+    'faster_rcnn': FASTER_RCNN_MODEL,
+    'accurate': FASTER_RCNN_MODEL,
+    'ssd_mobilenet': SSD_MOBILENET_MODEL,
+    'ssd': SSD_MOBILENET_MODEL,
+    'fast': SSD_MOBILENET_MODEL,
+}
+
+
+class UnknownModelError(ValueError):
+    """Raised when a requested model name or alias is not recognised."""
+
+
+def resolve_model_name(name):
+    """Map a model name or alias (case-insensitive) to its full model name."""
+    key = name.strip().lower()
+    if key in KNOWN_MODELS or key == CASCADE_MODEL:
+        return key
+    if key in MODEL_ALIASES:
+        return MODEL_ALIASES[key]
+    raise UnknownModelError(
+        f"Unknown model '{name}'. Use one of: "
+        f"{', '.join(KNOWN_MODELS + tuple(MODEL_ALIASES) + (CASCADE_MODEL,))}")
+
+
+def _close_backend(backend):
+    close = getattr(backend, 'close', None) or getattr(backend, 'shutdown')
+    close()
+
+
+class ModelRegistry:
+    """
+    Loaded models, their backends and batchers.
+    :param default_model: model used when a request does not choose one
+    :param models: models to load at startup (the default is always included;
+                   "cascade" stands for both of its stages)
+    :param concurrency: batches per model that may run at once (one per worker process)
+    """
+
+    def __init__(self, default_model=FASTER_RCNN_MODEL, models=(), concurrency=1):
+        self.default_model = resolve_model_name(default_model)
+        configured = []
+        for name in [self.default_model] + [resolve_model_name(m) for m in models]:
+            configured.extend(CASCADE_STAGES if name == CASCADE_MODEL else (name,))
+        self.configured_models = list(dict.fromkeys(configured))
+        self.concurrency = max(1, int(concurrency))
+        self._backends = {}
+        self._batchers = {}
+        self._cascade = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, concurrency=1):
+        """
+        Build a registry from DEFAULT_MODEL (name or alias, default Faster R-CNN)
+        and MODELS (comma-separated list of models to load side by side).
+        """
+        models = [m for m in os.environ.get('MODELS', '').split(',') if m.strip()]
+        return cls(default_model=os.environ.get('DEFAULT_MODEL', FASTER_RCNN_MODEL),
+                   models=models, concurrency=concurrency)
+
+    def resolve(self, requested=None):
+        """Full name of the requested model (or the default when none is requested)."""
+        if not requested:
+            return self.default_model
+        return resolve_model_name(requested)
+
+    def register(self, name, backend):
+        """Install a freshly loaded backend for `name`, closing the one it replaces."""
+        with self._lock:
+            previous = self._backends.get(name)
+            self._backends[name] = backend
+            if name not in self._batchers:
+                self._batchers[name] = MicroBatcher.from_env(
+                    lambda images_batch, name=name: self._backends[name].run_batch(images_batch),
+                    concurrency=self.concurrency)
+        if previous is not None and previous is not backend:
+            _close_backend(previous)
+
+    def is_loaded(self, name):
+        if name == CASCADE_MODEL:
+            return all(stage in self._backends for stage in CASCADE_STAGES)
+        return name in self._backends
+
+    def loaded_models(self):
+        return list(self._backends)
+
+    def backend(self, name):
+        return self._backends[name]
+
+    def batcher(self, name):
+        """Object with a submit(image_np) -> Future interface for `name` (a MicroBatcher or the cascade)."""
+        if name == CASCADE_MODEL:
+            return self.cascade()
+        return self._batchers[name]
+
+    def cascade(self):
+        with self._lock:
+            if self._cascade is None:
+                fast, accurate = CASCADE_STAGES
+                self._cascade = CascadeDetector.from_env(
+                    lambda image_np: self._batchers[fast].submit(image_np),
+                    lambda image_np: self._batchers[accurate].submit(image_np))
+            return self._cascade
+
+    def stats(self):
+        with self._lock:
+            items = list(self._backends.items())
+        return {
+            "default_model": self.default_model,
+            "configured_models": self.configured_models,
+            "loaded_models": {
+                name: {
+                    "backend": backend.stats(),
+                    "batching": self._batchers[name].stats(),
+                }
+                for name, backend in items
+            },
+            "cascade": self._cascade.stats() if self._cascade is not None else None,
+        }
+
+    def close(self):
+        with self._lock:
+            backends = list(self._backends.values())
+            self._backends.clear()
+        for backend in backends:
+            _close_backend(backend)
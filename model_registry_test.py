@@ -0,0 +1,78 @@
+"""Tests for model_registry."""
+
+import unittest
+
+import numpy as np
+
+from model_registry import (CASCADE_MODEL, FASTER_RCNN_MODEL, SSD_MOBILENET_MODEL, ModelRegistry,
+                            UnknownModelError, resolve_model_name)
+
+
+class _FakeBackend:
+    def __init__(self, label):
+        self.label = label
+        self.closed = False
+
+    def run_batch(self, images_batch):
+        n = images_batch.shape[0]
+        return (np.zeros((n, 100, 4)), np.full((n, 100), self.label), np.ones((n, 100)), np.full((n,), 100.0))
+
+    def stats(self):
+        return {"label": self.label}
+
+    def close(self):
+        self.closed = True
+
+
+class ModelRegistryTest(unittest.TestCase):
+
+    def test_resolves_names_and_aliases(self):
+        self.assertEqual(resolve_model_name("SSD"), SSD_MOBILENET_MODEL)
+        self.assertEqual(resolve_model_name("accurate"), FASTER_RCNN_MODEL)
+        self.assertEqual(resolve_model_name(SSD_MOBILENET_MODEL), SSD_MOBILENET_MODEL)
+        with self.assertRaises(UnknownModelError):
+            resolve_model_name("yolo")
+
+    def test_default_first_and_deduplicated(self):
+        registry = ModelRegistry(default_model="fast", models=["faster_rcnn", "ssd"])
+        self.assertEqual(registry.configured_models, [SSD_MOBILENET_MODEL, FASTER_RCNN_MODEL])
+        self.assertEqual(registry.resolve(None), SSD_MOBILENET_MODEL)
+        self.assertEqual(registry.resolve("accurate"), FASTER_RCNN_MODEL)
+
+    def test_routes_batches_per_model_and_replaces_backends(self):
+        registry = ModelRegistry(models=["ssd"])
+        first = _FakeBackend(1.0)
+        registry.register(FASTER_RCNN_MODEL, first)
+        registry.register(SSD_MOBILENET_MODEL, _FakeBackend(2.0))
+        self.assertEqual(sorted(registry.loaded_models()), sorted([FASTER_RCNN_MODEL, SSD_MOBILENET_MODEL]))
+
+        image = np.zeros((8, 8, 3), dtype=np.uint8)
+        _, scores, _, _ = registry.batcher(SSD_MOBILENET_MODEL).submit(image).result(timeout=5)
+        self.assertEqual(scores[0], 2.0)
+
+        registry.register(FASTER_RCNN_MODEL, _FakeBackend(3.0))
+        self.assertTrue(first.closed)
+        _, scores, _, _ = registry.batcher(FASTER_RCNN_MODEL).submit(image).result(timeout=5)
+        self.assertEqual(scores[0], 3.0)
+        self.assertIn(SSD_MOBILENET_MODEL, registry.stats()["loaded_models"])
+
+        registry.close()
+        self.assertFalse(registry.is_loaded(FASTER_RCNN_MODEL))
+
+    def test_cascade_needs_both_stages(self):
+        registry = ModelRegistry(default_model="cascade")
+        self.assertEqual(registry.configured_models, [SSD_MOBILENET_MODEL, FASTER_RCNN_MODEL])
+        registry.register(SSD_MOBILENET_MODEL, _FakeBackend(0.0))
+        self.assertFalse(registry.is_loaded(CASCADE_MODEL))
+        registry.register(FASTER_RCNN_MODEL, _FakeBackend(1.0))
+        self.assertTrue(registry.is_loaded(CASCADE_MODEL))
+
+        image = np.zeros((8, 8, 3), dtype=np.uint8)
+        _, scores, _, _ = registry.batcher(CASCADE_MODEL).submit(image).result(timeout=5)
+        self.assertEqual(scores[0], 0.0)  # no traffic light on the fast stage, nothing to escalate
+        self.assertEqual(registry.stats()["cascade"]["frames"], 1)
+        registry.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
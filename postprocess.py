@@ -0,0 +1,122 @@
+"""
+Single-pass post-processing of detector outputs.
+
+Turns (boxes, scores, classes) of one image into the stop decision,
+`traffic_light_detected` and the confidence in one go: a vectorized mask
+selects the traffic-light candidates among the top boxes, they are ordered
+by score and their crops classified by color_classifier in one batched call.
+In "first red wins" mode they are cropped and classified in score order, a
+few per batched call (FIRST_RED_WINS_CHUNK), and the scan stops after the
+first chunk holding a red/yellow light, since a single one already decides
+"Stop". Chunks keep most of the batching gain while the best-scoring lights,
+which usually decide, are looked at first.
+"""
+import os
+
+import numpy as np
+
+from color_classifier import box_to_pixels, classify_crops
+
+TRAFFIC_LIGHT_LABEL = 10  # COCO
+FIXED_POINT_SCALE = 10000  # per-light output: integers of value * scale
+FIRST_RED_WINS_CHUNK = 4  # crops per classify_crops call in first-red-wins mode
+
+
+def first_red_wins_from_env():
+    """FIRST_RED_WINS env var (default on): stop classifying after the first red/yellow light."""
+    return os.environ.get('FIRST_RED_WINS', '1').lower() not in ('0', 'false', 'no')
+
+
+def select_candidates(scores, classes, max_boxes=20, min_score_thresh=0.5,
+                      traffic_light_label=TRAFFIC_LIGHT_LABEL):
+    """Indices of traffic-light boxes among the first `max_boxes` above the threshold, best first."""
+    n = min(max_boxes, scores.shape[0])
+    candidates = np.flatnonzero((scores[:n] > min_score_thresh) & (classes[:n] == traffic_light_label))
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+def decide(image, boxes, scores, classes, max_boxes=20, min_score_thresh=0.5,
+           traffic_light_label=TRAFFIC_LIGHT_LABEL, first_red_wins=False, color_threshold=0.01):
+    """
+    Stop decision for one image.
+    :param image: PIL Image the boxes are cropped from (full resolution)
+    :param boxes: normalized boxes [N, 4]
+    :param scores: scores [N]
+    :param classes: integer classes [N]
+    :param first_red_wins: stop classifying after the chunk holding the first red/yellow light
+    :param color_threshold: red/yellow pixel fraction that makes a light a stop
+    :return: dict with "stop", "traffic_light_detected", "confidence" and "lights"
+             (one entry per classified light, best score first)
+    """
+    candidates = select_candidates(scores, classes, max_boxes, min_score_thresh, traffic_light_label)
+    entries = [(i, float(scores[i]), boxes[i].tolist()) for i in candidates.tolist()]
+
+    lights = []
+    chunk = FIRST_RED_WINS_CHUNK if first_red_wins else max(1, len(entries))
+    for start in range(0, len(entries), chunk):
+        classified = classify_lights(image, entries[start:start + chunk], color_threshold)
+        lights.extend(classified)
+        if first_red_wins and any(light["stop"] for light in classified):
+            break
+
+    return {
+        "stop": any(light["stop"] for light in lights),
+        "traffic_light_detected": candidates.size > 0,
+        "confidence": float(scores.max()) if scores.shape[0] > 0 else 0.0,
+        "lights": lights,
+    }
+
+
+def classify_lights(image, entries, color_threshold=0.01):
+    """
+    Colour check of light boxes in `image`, in one batched classify_crops call.
+    :param entries: sequence of (index, score, box) with normalized [ymin, xmin, ymax, xmax] boxes
+    :return: decide()-format light dicts, one per entry whose box is not empty, in order
+    """
+    im_width, im_height = image.size
+    kept, crops = [], []
+    for entry in entries:
+        rect = box_to_pixels(entry[2], im_width, im_height)
+        if rect is not None:
+            kept.append(entry)
+            crops.append(np.asarray(image.crop(rect)))
+    red, yellow, stop_flags = classify_crops(crops, color_threshold)
+    return [{
+        "index": index,
+        "score": score,
+        "box": box,
+        "red_ratio": float(red[k]),
+        "yellow_ratio": float(yellow[k]),
+        "stop": bool(stop_flags[k]),
+    } for k, (index, score, box) in enumerate(kept)]
+
+
+def stop_at_boxes(image, boxes, color_threshold=0.01):
+    """Stop decision from the colour check alone, on known (normalized) light boxes of `image`."""
+    lights = classify_lights(image, [(i, None, box) for i, box in enumerate(boxes)], color_threshold)
+    return any(light["stop"] for light in lights)
+
+
+def decode_boxes(encoded_lights):
+    """Normalized [ymin, xmin, ymax, xmax] boxes of encode_lights() output."""
+    return (np.asarray(encoded_lights["boxes"], dtype=np.float64) / float(encoded_lights["scale"])).tolist()
+
+
+def encode_lights(lights, scale=FIXED_POINT_SCALE):
+    """
+    Compact per-light output: parallel arrays of fixed-point integers (value * scale).
+    :param lights: the "lights" list of decide()
+    :return: dict with "scale", "boxes" ([ymin, xmin, ymax, xmax] per light), "scores",
+             "red_ratios", "yellow_ratios" and "stop"
+    """
+    def fixed(values):
+        return np.rint(np.asarray(values, dtype=np.float64) * scale).astype(np.int64).tolist()
+
+    return {
+        "scale": scale,
+        "boxes": fixed([light["box"] for light in lights]) if lights else [],
+        "scores": fixed([light["score"] for light in lights]),
+        "red_ratios": fixed([light["red_ratio"] for light in lights]),
+        "yellow_ratios": fixed([light["yellow_ratio"] for light in lights]),
+        "stop": [light["stop"] for light in lights],
+    }
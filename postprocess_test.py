@@ -0,0 +1,97 @@
+"""Tests for postprocess."""
+
+import unittest
+from unittest import mock
+
+import numpy as np
+from PIL import Image
+
+import postprocess
+from postprocess import classify_lights, decide, decode_boxes, encode_lights, select_candidates, stop_at_boxes
+
+
+def _frame():
+    """100x100 frame: red light on the left, green light on the right."""
+    pixels = np.zeros((100, 100, 3), dtype=np.uint8)
+    pixels[10:70, 10:30, 0] = 230
+    pixels[10:70, 60:80, 1] = 230
+    return Image.fromarray(pixels)
+
+
+BOXES = np.array([[0.1, 0.6, 0.7, 0.8],   # green
+                  [0.1, 0.1, 0.7, 0.3],   # red
+                  [0.0, 0.0, 1.0, 1.0],   # person
+                  [0.1, 0.1, 0.7, 0.3]])  # low-score light
+SCORES = np.array([0.6, 0.9, 0.95, 0.3])
+CLASSES = np.array([10, 10, 1, 10])
+
+
+class PostprocessTest(unittest.TestCase):
+
+    def test_selects_lights_best_first(self):
+        self.assertEqual(select_candidates(SCORES, CLASSES).tolist(), [1, 0])
+        self.assertEqual(select_candidates(SCORES, CLASSES, max_boxes=1).tolist(), [0])
+
+    def test_full_scan(self):
+        decision = decide(_frame(), BOXES, SCORES, CLASSES)
+        self.assertTrue(decision["stop"])
+        self.assertTrue(decision["traffic_light_detected"])
+        self.assertAlmostEqual(decision["confidence"], 0.95)
+        self.assertEqual([light["index"] for light in decision["lights"]], [1, 0])
+        self.assertEqual([light["stop"] for light in decision["lights"]], [True, False])
+
+    def test_first_red_wins_stops_after_the_chunk_with_a_stop(self):
+        classified = []
+        classify_crops = postprocess.classify_crops
+
+        def counting(crops, threshold):
+            classified.append(len(crops))
+            return classify_crops(crops, threshold)
+
+        with mock.patch("postprocess.FIRST_RED_WINS_CHUNK", 1), mock.patch("postprocess.classify_crops", counting):
+            decision = decide(_frame(), BOXES, SCORES, CLASSES, first_red_wins=True)
+        self.assertTrue(decision["stop"])
+        self.assertEqual([light["index"] for light in decision["lights"]], [1])
+        # The red light scores best, so the green one is never cropped or classified
+        self.assertEqual(classified, [1])
+        # Both lights fit in one default chunk: same decision, every light classified
+        decision = decide(_frame(), BOXES, SCORES, CLASSES, first_red_wins=True)
+        self.assertTrue(decision["stop"])
+        self.assertEqual([light["index"] for light in decision["lights"]], [1, 0])
+
+    def test_classify_lights_matches_decide(self):
+        lights = decide(_frame(), BOXES, SCORES, CLASSES)["lights"]
+        entries = [(light["index"], light["score"], light["box"]) for light in lights]
+        # An empty box is skipped, the rest keep their order and index
+        self.assertEqual(classify_lights(_frame(), entries[:1] + [(7, 0.8, [0.5, 0.5, 0.5, 0.9])] + entries[1:]),
+                         lights)
+
+    def test_no_lights(self):
+        decision = decide(_frame(), BOXES, SCORES, np.array([1, 1, 1, 1]))
+        self.assertFalse(decision["stop"])
+        self.assertFalse(decision["traffic_light_detected"])
+        self.assertEqual(decision["lights"], [])
+
+    def test_encode_lights_fixed_point(self):
+        encoded = encode_lights(decide(_frame(), BOXES, SCORES, CLASSES)["lights"])
+        self.assertEqual(encoded["scale"], 10000)
+        self.assertEqual(encoded["boxes"], [[1000, 1000, 7000, 3000], [1000, 6000, 7000, 8000]])
+        self.assertEqual(encoded["scores"], [9000, 6000])
+        self.assertEqual(encoded["red_ratios"][1], 0)
+        self.assertGreater(encoded["red_ratios"][0], 5000)
+        self.assertEqual(encoded["stop"], [True, False])
+        self.assertEqual(encode_lights([])["boxes"], [])
+
+    def test_stop_at_known_boxes(self):
+        encoded = encode_lights(decide(_frame(), BOXES, SCORES, CLASSES)["lights"])
+        boxes = decode_boxes(encoded)
+        self.assertTrue(stop_at_boxes(_frame(), boxes))
+        # The red light went out: only the green one is left at the cached boxes
+        green_only = np.asarray(_frame()).copy()
+        green_only[10:70, 10:30] = 0
+        self.assertFalse(stop_at_boxes(Image.fromarray(green_only), boxes))
+        self.assertFalse(stop_at_boxes(_frame(), []))
+
+
+if __name__ == "__main__":
+    unittest.main()
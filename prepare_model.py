@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Offline preparation of optimized inference graphs.
+
+The bundled 2017 frozen graphs are imported as-is, and on Cloud Run the
+session even runs with constant folding and arithmetic optimization off.
+`prepare` rewrites a frozen graph once, offline, and writes
+frozen_inference_graph_optimized.pb next to the original:
+
+  - nodes that do not feed the detection outputs are stripped
+  - Grappler folds constants (batch-norm scale/offset included), simplifies
+    arithmetic, removes identity/debug nodes and fuses conv + bias +
+    activation / batch-norm chains into single CPU kernels
+  - optionally the input placeholder is pinned to one resolution, so shapes
+    become static and more of the graph folds; only valid when every image
+    fed to the model has that size, so such a graph is written to its own
+    file (frozen_inference_graph_optimized_HEIGHTxWIDTH.pb)
+
+The loaders in main.py / main1.py and batch_detect.py prefer the optimized
+graph when it exists (set USE_OPTIMIZED_GRAPH=0 to ignore it). A pinned graph
+is only picked by a caller that guarantees its input size; the API cannot,
+since uploads keep their own size, so it never serves one. The fused kernels are TF-version
+specific, so prepare the graph with the TF version that serves it.
+
+`benchmark` loads the original and the optimized graph of each model and
+reports load time, first-run time and mean latency over test_images/, and
+checks that the Go/Stop decisions agree.
+
+Usage:
+  python prepare_model.py prepare [MODEL ...] [--input-size HEIGHTxWIDTH]
+  python prepare_model.py benchmark [MODEL ...] [--images DIR] [--repeats N]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+
+from model_registry import KNOWN_MODELS, resolve_model_name
+
+GRAPH_FILE = 'frozen_inference_graph.pb'
+OPTIMIZED_GRAPH_FILE = 'frozen_inference_graph_optimized.pb'
+INPUT_NODE = 'image_tensor'
+OUTPUT_NODES = ('detection_boxes', 'detection_scores', 'detection_classes', 'num_detections')
+VARIANT_FLOAT16 = 'float16'
+VARIANT_INT8 = 'int8'
+GRAPPLER_OPTIMIZERS = ('pruning', 'debug_stripper', 'constfold', 'shape', 'arithmetic', 'dependency',
+                       'loop', 'remap', 'constfold')
+
+
+def use_optimized_graph_from_env():
+    """USE_OPTIMIZED_GRAPH env var (default on): load the prepared graph when there is one."""
+    return os.environ.get('USE_OPTIMIZED_GRAPH', '1').lower() not in ('0', 'false', 'no')
+
+
+def model_variant_from_env():
+    """MODEL_VARIANT env var: "" for full precision (default), or a quantize_model.py variant (float16 / int8)."""
+    return os.environ.get('MODEL_VARIANT', '').strip().lower()
+
+
+def variant_graph_file(variant):
+    """File name of a quantized variant written by quantize_model.py."""
+    return f'frozen_inference_graph_{variant}.pb'
+
+
+def is_quantized_graph(path):
+    """Whether `path` is a weight-quantized variant written by quantize_model.py."""
+    return os.path.basename(path) in (variant_graph_file(VARIANT_FLOAT16), variant_graph_file(VARIANT_INT8))
+
+
+def keep_weights_quantized(config, graph_path):
+    """
+    Turn constant folding off in a session ConfigProto when `graph_path` is a quantized
+    variant. Folding (Grappler's and the classic graph optimizer's, both on by default)
+    would turn the dequantized weights back into float32 constants at load time and undo
+    the memory saving; without it the weights stay int8 / float16 and are dequantized on
+    every run.
+    :return: `config`
+    """
+    if is_quantized_graph(graph_path):
+        import tensorflow as tf
+        from tensorflow.core.protobuf import rewriter_config_pb2
+
+        config.graph_options.rewrite_options.constant_folding = rewriter_config_pb2.RewriterConfig.OFF
+        config.graph_options.optimizer_options.opt_level = tf.compat.v1.OptimizerOptions.L0
+        config.graph_options.optimizer_options.do_constant_folding = False
+    return config
+
+
+def pinned_graph_file(height, width):
+    """File name of an optimized graph whose input is pinned to height x width."""
+    return f'frozen_inference_graph_optimized_{height}x{width}.pb'
+
+
+def preferred_graph_path(model_dir, use_optimized=None, variant=None, input_size=None):
+    """
+    Frozen graph the loaders should import for a model directory.
+    :param use_optimized: prefer the prepared graph; None reads USE_OPTIMIZED_GRAPH
+    :param variant: quantized variant to serve; None reads MODEL_VARIANT
+    :param input_size: (height, width) of every input the caller will feed, when it is fixed;
+                       only then can a graph pinned to that size be used
+    :return: path of the requested variant, else of the optimized graph (pinned to
+             `input_size` first) when it exists and is wanted, else of the original
+    """
+    if variant is None:
+        variant = model_variant_from_env()
+    if variant:
+        path = os.path.join(model_dir, variant_graph_file(variant))
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"MODEL_VARIANT={variant} but {path} does not exist; "
+                                    f"run `python quantize_model.py {variant}` first")
+        return path
+    if use_optimized is None:
+        use_optimized = use_optimized_graph_from_env()
+    if use_optimized:
+        candidates = [OPTIMIZED_GRAPH_FILE]
+        if input_size is not None:
+            candidates.insert(0, pinned_graph_file(*input_size))
+        for name in candidates:
+            path = os.path.join(model_dir, name)
+            if os.path.exists(path):
+                return path
+    return os.path.join(model_dir, GRAPH_FILE)
+
+
+def load_graph_def(path):
+    import tensorflow as tf
+
+    graph_def = tf.compat.v1.GraphDef()
+    with tf.io.gfile.GFile(path, 'rb') as fid:
+        graph_def.ParseFromString(fid.read())
+    return graph_def
+
+
+def fix_input_shape(graph_def, height, width):
+    """Pin the image_tensor placeholder to [batch, height, width, 3] (batch stays dynamic)."""
+    from tensorflow.core.framework import tensor_shape_pb2
+
+    for node in graph_def.node:
+        if node.name == INPUT_NODE:
+            shape = tensor_shape_pb2.TensorShapeProto(dim=[
+                tensor_shape_pb2.TensorShapeProto.Dim(size=size) for size in (-1, height, width, 3)])
+            node.attr['shape'].shape.CopyFrom(shape)
+            return graph_def
+    raise ValueError(f"No {INPUT_NODE} node in the graph")
+
+
+def optimize_graph_def(graph_def):
+    """Strip unused nodes and run the Grappler passes of GRAPPLER_OPTIMIZERS over a frozen graph."""
+    import tensorflow as tf
+    from tensorflow.core.protobuf import config_pb2, rewriter_config_pb2
+    from tensorflow.python.grappler import tf_optimizer
+
+    graph_def = tf.compat.v1.graph_util.extract_sub_graph(graph_def, list(OUTPUT_NODES))
+    graph = tf.Graph()
+    with graph.as_default():
+        tf.import_graph_def(graph_def, name='')
+    meta_graph = tf.compat.v1.train.export_meta_graph(graph=graph)
+    # Grappler keeps everything the fetch nodes depend on and may rewrite the rest
+    meta_graph.collection_def['train_op'].node_list.value.extend(OUTPUT_NODES)
+
+    config = config_pb2.ConfigProto()
+    rewriter = config.graph_options.rewrite_options
+    rewriter.optimizers.extend(GRAPPLER_OPTIMIZERS)
+    rewriter.meta_optimizer_iterations = rewriter_config_pb2.RewriterConfig.TWO
+    rewriter.min_graph_nodes = -1
+    return tf_optimizer.OptimizeGraph(config, meta_graph)
+
+
+def prepare(model_name, input_size=None):
+    """
+    Write the optimized graph of one model.
+    :param input_size: optional (height, width) to pin the input to; the graph then goes to
+                       pinned_graph_file() instead of the file the loaders pick up by default
+    :return: dict with node counts, file sizes and the output path
+    """
+    source = os.path.join(model_name, GRAPH_FILE)
+    target = os.path.join(model_name, pinned_graph_file(*input_size) if input_size else OPTIMIZED_GRAPH_FILE)
+    started = time.perf_counter()
+    graph_def = load_graph_def(source)
+    nodes_before = len(graph_def.node)
+    if input_size is not None:
+        graph_def = fix_input_shape(graph_def, *input_size)
+    optimized = optimize_graph_def(graph_def)
+    # Write to a temporary file first so a loader never sees a half-written graph
+    with open(target + '.tmp', 'wb') as fid:
+        fid.write(optimized.SerializeToString())
+    os.replace(target + '.tmp', target)
+    return {
+        "path": target,
+        "nodes_before": nodes_before,
+        "nodes_after": len(optimized.node),
+        "mb_before": round(os.path.getsize(source) / 1e6, 1),
+        "mb_after": round(os.path.getsize(target) / 1e6, 1),
+        "seconds": round(time.perf_counter() - started, 1),
+    }
+
+
+def _load_session(path):
+    import tensorflow as tf
+
+    started = time.perf_counter()
+    graph_def = load_graph_def(path)
+    graph = tf.Graph()
+    with graph.as_default():
+        tf.import_graph_def(graph_def, name='')
+    sess = tf.compat.v1.Session(graph=graph, config=keep_weights_quantized(tf.compat.v1.ConfigProto(), path))
+    fetches = [graph.get_tensor_by_name(name + ':0') for name in OUTPUT_NODES]
+    run = sess.make_callable(fetches, feed_list=[graph.get_tensor_by_name(INPUT_NODE + ':0')])
+    return sess, run, (time.perf_counter() - started) * 1000.0
+
+
+def _benchmark_images(image_dir):
+    from PIL import Image
+
+    images = []
+    for image_path in sorted(glob.glob(os.path.join(image_dir, '*.jpg'))):
+        image = Image.open(image_path)
+        images.append(image.convert('RGB') if image.mode != 'RGB' else image)
+    if not images:
+        rng = np.random.RandomState(0)
+        images.append(Image.fromarray(rng.randint(0, 256, (720, 1280, 3), dtype=np.uint8)))
+    return images
+
+
+def benchmark(path, images, repeats=3):
+    """
+    Load one graph and time it over `images`.
+    :return: (timings dict, list of Go/Stop decisions per image); "rss_growth_mb" is
+             the process RSS growth from loading and running the graph
+    """
+    from memory_governor import current_rss_bytes
+    from postprocess import decide
+
+    rss_before = current_rss_bytes() or 0
+    sess, run, load_ms = _load_session(path)
+    try:
+        tensors = [np.expand_dims(np.asarray(image), 0) for image in images]
+        started = time.perf_counter()
+        run(tensors[0])
+        first_ms = (time.perf_counter() - started) * 1000.0
+        decisions = []
+        run_ms = []
+        for image, tensor in zip(images, tensors):
+            for _ in range(repeats):
+                started = time.perf_counter()
+                boxes, scores, classes, num = run(tensor)
+                run_ms.append((time.perf_counter() - started) * 1000.0)
+            decisions.append(decide(image, boxes[0], scores[0], classes[0].astype(np.int32))["stop"])
+        rss_mb = ((current_rss_bytes() or 0) - rss_before) / 1e6
+    finally:
+        sess.close()
+    timings = {"load_ms": load_ms, "first_run_ms": first_ms, "mean_run_ms": float(np.mean(run_ms)),
+               "rss_growth_mb": rss_mb}
+    return timings, decisions
+
+
+def _parse_size(text):
+    height, width = text.lower().split('x')
+    return int(height), int(width)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prepare and benchmark optimized inference graphs.")
+    parser.add_argument("command", choices=("prepare", "benchmark"))
+    parser.add_argument("models", nargs="*", help="model names or aliases (default: every bundled model present)")
+    parser.add_argument("--input-size", type=_parse_size,
+                        help="HEIGHTxWIDTH to pin the input to (only if every input has this size)")
+    parser.add_argument("--images", default="./test_images", help="benchmark images (*.jpg)")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    models = [resolve_model_name(name) for name in args.models] or \
+             [name for name in KNOWN_MODELS if os.path.exists(os.path.join(name, GRAPH_FILE))]
+    if not models:
+        sys.exit("No model graphs found; extract a model first")
+
+    if args.command == "prepare":
+        for model_name in models:
+            print(f"🔧 {model_name}: optimizing...")
+            stats = prepare(model_name, args.input_size)
+            print(f"✅ {stats['path']}: {stats['nodes_before']} -> {stats['nodes_after']} nodes, "
+                  f"{stats['mb_before']} -> {stats['mb_after']} MB in {stats['seconds']} s")
+        return
+
+    images = _benchmark_images(args.images)
+    print(f"{'model':<40}{'graph':<11}{'load ms':>10}{'first ms':>10}{'mean ms':>10}")
+    for model_name in models:
+        optimized = os.path.join(model_name, OPTIMIZED_GRAPH_FILE)
+        if not os.path.exists(optimized):
+            print(f"{model_name:<40}no optimized graph; run `prepare` first")
+            continue
+        results = {}
+        for label, path in (("original", os.path.join(model_name, GRAPH_FILE)), ("optimized", optimized)):
+            timings, decisions = benchmark(path, images, args.repeats)
+            results[label] = decisions
+            print(f"{model_name:<40}{label:<11}{timings['load_ms']:>10.0f}{timings['first_run_ms']:>10.0f}"
+                  f"{timings['mean_run_ms']:>10.1f}")
+        agree = sum(a == b for a, b in zip(results["original"], results["optimized"]))
+        print(f"{'':<40}Go/Stop decisions agree on {agree}/{len(images)} images")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Tests for prepare_model (the parts that do not need TensorFlow)."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from prepare_model import (GRAPH_FILE, OPTIMIZED_GRAPH_FILE, _parse_size, is_quantized_graph, keep_weights_quantized,
+                           pinned_graph_file, preferred_graph_path, variant_graph_file)
+
+
+class PreferredGraphPathTest(unittest.TestCase):
+
+    def setUp(self):
+        self.model_dir = tempfile.mkdtemp()
+        open(os.path.join(self.model_dir, GRAPH_FILE), "wb").close()
+
+    def tearDown(self):
+        shutil.rmtree(self.model_dir)
+        os.environ.pop("USE_OPTIMIZED_GRAPH", None)
+        os.environ.pop("MODEL_VARIANT", None)
+
+    def test_original_without_optimized_graph(self):
+        self.assertEqual(preferred_graph_path(self.model_dir), os.path.join(self.model_dir, GRAPH_FILE))
+
+    def test_prefers_optimized_graph(self):
+        optimized = os.path.join(self.model_dir, OPTIMIZED_GRAPH_FILE)
+        open(optimized, "wb").close()
+        self.assertEqual(preferred_graph_path(self.model_dir), optimized)
+        self.assertEqual(preferred_graph_path(self.model_dir, use_optimized=False),
+                         os.path.join(self.model_dir, GRAPH_FILE))
+        os.environ["USE_OPTIMIZED_GRAPH"] = "0"
+        self.assertEqual(preferred_graph_path(self.model_dir), os.path.join(self.model_dir, GRAPH_FILE))
+
+    def test_pinned_graph_only_for_its_input_size(self):
+        pinned = os.path.join(self.model_dir, pinned_graph_file(300, 300))
+        open(pinned, "wb").close()
+        self.assertEqual(preferred_graph_path(self.model_dir), os.path.join(self.model_dir, GRAPH_FILE))
+        self.assertEqual(preferred_graph_path(self.model_dir, input_size=(600, 1024)),
+                         os.path.join(self.model_dir, GRAPH_FILE))
+        self.assertEqual(preferred_graph_path(self.model_dir, input_size=(300, 300)), pinned)
+        optimized = os.path.join(self.model_dir, OPTIMIZED_GRAPH_FILE)
+        open(optimized, "wb").close()
+        self.assertEqual(preferred_graph_path(self.model_dir, input_size=(600, 1024)), optimized)
+        self.assertEqual(preferred_graph_path(self.model_dir, use_optimized=False, input_size=(300, 300)),
+                         os.path.join(self.model_dir, GRAPH_FILE))
+
+    def test_model_variant(self):
+        open(os.path.join(self.model_dir, OPTIMIZED_GRAPH_FILE), "wb").close()
+        with self.assertRaises(FileNotFoundError):
+            preferred_graph_path(self.model_dir, variant="int8")
+        int8 = os.path.join(self.model_dir, variant_graph_file("int8"))
+        open(int8, "wb").close()
+        os.environ["MODEL_VARIANT"] = "INT8"
+        self.assertEqual(preferred_graph_path(self.model_dir), int8)
+
+    def test_quantized_graphs(self):
+        self.assertTrue(is_quantized_graph(os.path.join("ssd", variant_graph_file("int8"))))
+        self.assertTrue(is_quantized_graph(variant_graph_file("float16")))
+        self.assertFalse(is_quantized_graph(os.path.join("ssd", OPTIMIZED_GRAPH_FILE)))
+        self.assertFalse(is_quantized_graph(pinned_graph_file(300, 300)))
+        # Full-precision graphs keep the session config as it is (and need no TensorFlow here)
+        config = object()
+        self.assertIs(keep_weights_quantized(config, os.path.join("ssd", GRAPH_FILE)), config)
+
+    def test_parse_size(self):
+        self.assertEqual(_parse_size("300x300"), (300, 300))
+        self.assertEqual(_parse_size("600X1024"), (600, 1024))
+
+
+if __name__ == "__main__":
+    unittest.main()
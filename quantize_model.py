@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Post-training weight quantization of the frozen detection graphs.
+
+Writes a float16 or int8 variant of a model's frozen graph next to it
+(frozen_inference_graph_float16.pb / frozen_inference_graph_int8.pb). The
+weights of Conv2D, DepthwiseConv2dNative and MatMul layers (and of their
+_Fused* forms that Grappler's remapper writes into the optimized graph) are
+stored quantized and turned back into float32 inside the graph:
+
+  float16  weight -> float16 Const, Cast to float32
+  int8     symmetric per-output-channel int8: int8 Const, Cast, Mul by scale
+
+Every consumer keeps reading a float32 tensor of the same name, so the
+detector graph around the weights, its outputs and the post-processing are
+unchanged, and no custom op or TFLite runtime is needed.
+
+This is weight-only quantization, without calibration: no activation
+ranges are measured and compute stays float32, so a variant is not faster
+(the dequantization even adds a little work per run). What it buys is a
+graph file 2x / ~4x smaller and, since the loaders turn constant folding
+off for these files (prepare_model.keep_weights_quantized), weights that
+stay int8 / float16 in memory instead of being folded back into float32
+at load time. Calibrated int8 compute would need quantized kernels for the
+whole detector, i.e. a TFLite conversion, which the 2017 frozen graphs do
+not support.
+
+The loaders serve a variant with MODEL_VARIANT=float16 or int8.
+benchmark_quantized.py reports the decision, latency and memory deltas.
+
+Usage: python quantize_model.py {float16,int8} [MODEL ...] [--min-elements N] [--optimized]
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from model_registry import KNOWN_MODELS, resolve_model_name
+from prepare_model import (GRAPH_FILE, OPTIMIZED_GRAPH_FILE, VARIANT_FLOAT16, VARIANT_INT8, load_graph_def,
+                           variant_graph_file)
+
+# Op type -> number of trailing weight axes that get their own scale; the weights are input 1
+WEIGHT_CONSUMERS = {
+    "Conv2D": 1, "MatMul": 1, "DepthwiseConv2dNative": 2,
+    # Fused forms written by Grappler's remapper (prepare_model.py's optimized graph)
+    "_FusedConv2D": 1, "_FusedMatMul": 1, "_FusedDepthwiseConv2dNative": 2,
+}
+
+
+def quantize_int8(weights, channel_axes=1):
+    """
+    Symmetric int8 quantization with one scale per output channel.
+    :param weights: float32 array
+    :param channel_axes: trailing axes that are output channels
+    :return: (int8 array, float32 scale broadcastable against `weights`)
+    """
+    reduce_axes = tuple(range(weights.ndim - channel_axes))
+    scale = np.max(np.abs(weights), axis=reduce_axes, keepdims=True) / 127.0
+    scale = np.where(scale > 0, scale, 1.0).astype(np.float32)
+    quantized = np.clip(np.rint(weights / scale), -127, 127).astype(np.int8)
+    return quantized, scale
+
+
+def _weight_constants(graph_def, min_elements):
+    """Names of float32 Const nodes feeding a weight input, with their channel axes."""
+    nodes = {node.name: node for node in graph_def.node}
+
+    def source_const(name):
+        # Frozen graphs read weights through Identity ("/read") nodes
+        name = name.lstrip("^").split(":")[0]
+        node = nodes.get(name)
+        while node is not None and node.op == "Identity":
+            node = nodes.get(node.input[0].split(":")[0])
+        return node if node is not None and node.op == "Const" else None
+
+    found = {}
+    for node in graph_def.node:
+        channel_axes = WEIGHT_CONSUMERS.get(node.op)
+        if channel_axes is None or len(node.input) < 2:
+            continue
+        const = source_const(node.input[1])
+        if const is None or const.attr["dtype"].type != 1:  # DT_FLOAT
+            continue
+        shape = [dim.size for dim in const.attr["value"].tensor.tensor_shape.dim]
+        if int(np.prod(shape)) >= min_elements:
+            found[const.name] = channel_axes
+    return found
+
+
+def quantize_graph_def(graph_def, variant, min_elements=1024):
+    """
+    Quantized copy of a frozen GraphDef.
+    :param variant: "float16" or "int8"
+    :param min_elements: smaller weight tensors stay float32
+    :return: (GraphDef, number of quantized tensors)
+    """
+    import tensorflow as tf
+
+    weights = _weight_constants(graph_def, min_elements)
+    output = tf.compat.v1.GraphDef()
+    output.versions.CopyFrom(graph_def.versions)
+    output.library.CopyFrom(graph_def.library)
+    for node in graph_def.node:
+        if node.name not in weights:
+            output.node.add().CopyFrom(node)
+            continue
+        values = tf.make_ndarray(node.attr["value"].tensor)
+        device = node.device
+        if variant == VARIANT_FLOAT16:
+            stored = output.node.add(name=node.name + "/float16", op="Const", device=device)
+            stored.attr["dtype"].type = tf.float16.as_datatype_enum
+            stored.attr["value"].tensor.CopyFrom(tf.make_tensor_proto(values.astype(np.float16)))
+            cast = output.node.add(name=node.name, op="Cast", input=[stored.name], device=device)
+            cast.attr["SrcT"].type = tf.float16.as_datatype_enum
+            cast.attr["DstT"].type = tf.float32.as_datatype_enum
+        elif variant == VARIANT_INT8:
+            quantized, scale = quantize_int8(values, weights[node.name])
+            stored = output.node.add(name=node.name + "/int8", op="Const", device=device)
+            stored.attr["dtype"].type = tf.int8.as_datatype_enum
+            stored.attr["value"].tensor.CopyFrom(tf.make_tensor_proto(quantized))
+            scale_node = output.node.add(name=node.name + "/scale", op="Const", device=device)
+            scale_node.attr["dtype"].type = tf.float32.as_datatype_enum
+            scale_node.attr["value"].tensor.CopyFrom(tf.make_tensor_proto(scale))
+            cast = output.node.add(name=node.name + "/dequantize", op="Cast", input=[stored.name], device=device)
+            cast.attr["SrcT"].type = tf.int8.as_datatype_enum
+            cast.attr["DstT"].type = tf.float32.as_datatype_enum
+            mul = output.node.add(name=node.name, op="Mul", input=[cast.name, scale_node.name], device=device)
+            mul.attr["T"].type = tf.float32.as_datatype_enum
+        else:
+            raise ValueError(f"Unknown variant: {variant}")
+    return output, len(weights)
+
+
+def quantize(model_name, variant, min_elements=1024, from_optimized=False):
+    """
+    Write the quantized variant of one model.
+    :param from_optimized: start from prepare_model.py's optimized graph instead of the original
+    :return: dict with the output path, quantized tensor count and file sizes
+    :raises ValueError: when no weight tensor was found; nothing is written then
+    """
+    source = os.path.join(model_name, OPTIMIZED_GRAPH_FILE if from_optimized else GRAPH_FILE)
+    target = os.path.join(model_name, variant_graph_file(variant))
+    quantized, count = quantize_graph_def(load_graph_def(source), variant, min_elements)
+    if count == 0:
+        # A "quantized" file identical to its source would be benchmarked as if it were one
+        raise ValueError(f"No weight tensors to quantize in {source}")
+    with open(target + '.tmp', 'wb') as fid:
+        fid.write(quantized.SerializeToString())
+    os.replace(target + '.tmp', target)
+    return {
+        "path": target,
+        "tensors": count,
+        "mb_before": round(os.path.getsize(source) / 1e6, 1),
+        "mb_after": round(os.path.getsize(target) / 1e6, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write float16 / int8 weight-quantized model variants.")
+    parser.add_argument("variant", choices=(VARIANT_FLOAT16, VARIANT_INT8))
+    parser.add_argument("models", nargs="*", help="model names or aliases (default: every bundled model present)")
+    parser.add_argument("--min-elements", type=int, default=1024, help="smaller weight tensors stay float32")
+    parser.add_argument("--optimized", action="store_true",
+                        help="quantize the graph written by prepare_model.py instead of the original")
+    args = parser.parse_args(argv)
+
+    models = [resolve_model_name(name) for name in args.models] or \
+             [name for name in KNOWN_MODELS if os.path.exists(os.path.join(name, GRAPH_FILE))]
+    if not models:
+        sys.exit("No model graphs found; extract a model first")
+    for model_name in models:
+        print(f"🔧 {model_name}: {args.variant} weights...")
+        try:
+            stats = quantize(model_name, args.variant, args.min_elements, args.optimized)
+        except ValueError as e:
+            print(f"⚠️ {model_name}: {e}")
+            continue
+        print(f"✅ {stats['path']}: {stats['tensors']} weight tensors quantized, "
+              f"{stats['mb_before']} -> {stats['mb_after']} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Tests for quantize_model."""
+
+import importlib.util
+import unittest
+from collections import defaultdict
+from types import SimpleNamespace
+
+import numpy as np
+
+from quantize_model import VARIANT_FLOAT16, VARIANT_INT8, _weight_constants, quantize_graph_def, quantize_int8
+
+
+def _node(name, op, inputs=(), dtype=1, shape=()):
+    """Stand-in for a NodeDef with the fields _weight_constants reads."""
+    attr = defaultdict(lambda: SimpleNamespace(type=0))
+    attr["dtype"] = SimpleNamespace(type=dtype)
+    dims = [SimpleNamespace(size=size) for size in shape]
+    attr["value"] = SimpleNamespace(tensor=SimpleNamespace(tensor_shape=SimpleNamespace(dim=dims)))
+    return SimpleNamespace(name=name, op=op, input=list(inputs), attr=attr)
+
+
+class QuantizeInt8Test(unittest.TestCase):
+
+    def test_per_channel_round_trip(self):
+        rng = np.random.RandomState(0)
+        # Conv2D layout [h, w, in, out] with very different channel ranges
+        weights = (rng.randn(3, 3, 8, 4) * np.array([0.01, 0.1, 1.0, 10.0])).astype(np.float32)
+        quantized, scale = quantize_int8(weights)
+        self.assertEqual(quantized.dtype, np.int8)
+        self.assertEqual(scale.shape, (1, 1, 1, 4))
+        self.assertEqual(np.abs(quantized).max(axis=(0, 1, 2)).tolist(), [127] * 4)
+        error = np.abs(quantized * scale - weights).max(axis=(0, 1, 2))
+        self.assertTrue(np.all(error <= scale.ravel() / 2 + 1e-7))
+
+    def test_depthwise_and_zero_channels(self):
+        weights = np.zeros((3, 3, 2, 1), dtype=np.float32)
+        weights[..., 0, 0] = 0.5
+        quantized, scale = quantize_int8(weights, channel_axes=2)
+        self.assertEqual(scale.shape, (1, 1, 2, 1))
+        # An all-zero channel gets a unit scale instead of dividing by zero
+        self.assertEqual(scale[0, 0, 1, 0], 1.0)
+        self.assertFalse(quantized[..., 1, 0].any())
+
+
+class WeightConstantsTest(unittest.TestCase):
+
+    def test_finds_weights_of_plain_and_fused_ops(self):
+        graph_def = SimpleNamespace(node=[
+            _node("input", "Placeholder"),
+            _node("conv/kernel", "Const", shape=(3, 3, 3, 64)),
+            _node("conv/kernel/read", "Identity", ["conv/kernel"]),
+            _node("conv", "Conv2D", ["input", "conv/kernel/read"]),
+            # Grappler folds the Identity away and fuses bias add + activation
+            _node("fused/kernel", "Const", shape=(3, 3, 64, 64)),
+            _node("fused/bias", "Const", shape=(64,)),
+            _node("fused", "_FusedConv2D", ["conv", "fused/kernel", "fused/bias"]),
+            _node("dw/kernel", "Const", shape=(3, 3, 64, 1)),
+            _node("dw", "_FusedDepthwiseConv2dNative", ["fused", "dw/kernel:0", "fused/bias"]),
+            _node("fc/weights", "Const", shape=(64, 90)),
+            _node("fc", "_FusedMatMul", ["dw", "fc/weights", "fused/bias"]),
+            # Too small, and not float32
+            _node("small/kernel", "Const", shape=(1, 1, 8, 8)),
+            _node("small", "Conv2D", ["fc", "small/kernel"]),
+            _node("half/kernel", "Const", dtype=19, shape=(3, 3, 64, 64)),
+            _node("half", "Conv2D", ["small", "half/kernel"]),
+        ])
+        self.assertEqual(_weight_constants(graph_def, min_elements=100), {
+            "conv/kernel": 1, "fused/kernel": 1, "dw/kernel": 2, "fc/weights": 1,
+        })
+
+    def test_no_weights(self):
+        graph_def = SimpleNamespace(node=[_node("input", "Placeholder"), _node("add", "Add", ["input", "input"])])
+        self.assertEqual(_weight_constants(graph_def, min_elements=1), {})
+
+
+@unittest.skipIf(importlib.util.find_spec("tensorflow") is None, "TensorFlow not installed")
+class QuantizeGraphDefTest(unittest.TestCase):
+
+    def _run(self, graph_def, feed):
+        import tensorflow as tf
+
+        graph = tf.Graph()
+        with graph.as_default():
+            tf.import_graph_def(graph_def, name='')
+        with tf.compat.v1.Session(graph=graph) as sess:
+            return sess.run('output:0', {'input:0': feed})
+
+    def test_variants_match_float32(self):
+        import tensorflow as tf
+
+        rng = np.random.RandomState(0)
+        graph = tf.Graph()
+        with graph.as_default():
+            inputs = tf.compat.v1.placeholder(tf.float32, [1, 8, 8, 3], name='input')
+            kernel = tf.constant(rng.randn(3, 3, 3, 16).astype(np.float32), name='kernel')
+            bias = tf.constant(rng.randn(16).astype(np.float32), name='bias')
+            conv = tf.nn.conv2d(inputs, tf.identity(kernel, name='kernel/read'), [1, 1, 1, 1], 'SAME')
+            tf.nn.bias_add(conv, bias, name='output')
+        graph_def = graph.as_graph_def()
+        feed = rng.rand(1, 8, 8, 3).astype(np.float32)
+        expected = self._run(graph_def, feed)
+
+        for variant, tolerance in ((VARIANT_FLOAT16, 1e-2), (VARIANT_INT8, 1e-1)):
+            quantized, count = quantize_graph_def(graph_def, variant, min_elements=100)
+            self.assertEqual(count, 1)  # the bias is not a weight input and stays float32
+            np.testing.assert_allclose(self._run(quantized, feed), expected, atol=tolerance)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+Opt-in downscaling of images before they are fed to the detector.
+
+The graphs resize their input internally anyway, so sending a 12 MP photo
+mostly pays for decoding, copying and resizing pixels the model never sees.
+Only the tensor given to sess.run is downscaled: detection boxes are
+normalized, so the colour crops are still cut from the full-resolution image.
+
+Modes:
+  off       feed the original image (default, matches the original behaviour)
+  max_side  bound the long side to INPUT_MAX_SIDE pixels
+  native    resize to what the graph's own image resizer would produce
+"""
+import os
+import threading
+
+from PIL import Image
+
+from model_registry import CASCADE_MODEL, FASTER_RCNN_MODEL, SSD_MOBILENET_MODEL
+
+MODE_OFF = "off"
+MODE_MAX_SIDE = "max_side"
+MODE_NATIVE = "native"
+
+# Image resizers configured in the bundled pipelines:
+# ("keep_aspect", min_dimension, max_dimension) or ("fixed", height, width)
+NATIVE_RESIZERS = {
+    FASTER_RCNN_MODEL: ("keep_aspect", 600, 1024),
+    SSD_MOBILENET_MODEL: ("fixed", 300, 300),
+}
+# Both cascade stages see the same input, so it has to suit the larger one
+NATIVE_RESIZERS[CASCADE_MODEL] = NATIVE_RESIZERS[FASTER_RCNN_MODEL]
+
+
+def _native_scale(width, height, resizer):
+    kind, a, b = resizer
+    if kind == "keep_aspect":
+        scale = a / min(width, height)
+        if round(max(width, height) * scale) > b:
+            scale = b / max(width, height)
+        return scale
+    # A fixed-shape resizer stretches each axis independently; keep both at or above the target
+    return max(a / height, b / width)
+
+
+class ResizePolicy:
+    """
+    Decides the size of the image fed to the detector.
+    :param mode: "off", "max_side" or "native"
+    :param max_side: long-side bound in "max_side" mode
+    """
+
+    def __init__(self, mode=MODE_OFF, max_side=1024):
+        if mode not in (MODE_OFF, MODE_MAX_SIDE, MODE_NATIVE):
+            raise ValueError(f"Unknown resize mode: {mode}")
+        self.mode = mode
+        self.max_side = int(max_side)
+        self._resized = 0
+        self._passed_through = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """Build a policy from INPUT_RESIZE (off / max_side / native) and INPUT_MAX_SIDE."""
+        return cls(mode=os.environ.get("INPUT_RESIZE", MODE_OFF),
+                   max_side=int(os.environ.get("INPUT_MAX_SIDE", 1024)))
+
+    def target_size(self, width, height, model_name=None):
+        """
+        Size (width, height) to feed the detector, or None to feed the image as-is.
+        Images are only ever downscaled.
+        """
+        if self.mode == MODE_OFF:
+            return None
+        if self.mode == MODE_MAX_SIDE:
+            scale = self.max_side / max(width, height)
+        else:
+            resizer = NATIVE_RESIZERS.get(model_name)
+            if resizer is None:
+                return None
+            scale = _native_scale(width, height, resizer)
+        if scale >= 1.0:
+            return None
+        return max(1, round(width * scale)), max(1, round(height * scale))
+
+    def apply(self, image, model_name=None):
+        """Return the (possibly downscaled) PIL image to convert into the input tensor."""
+        size = self.target_size(image.size[0], image.size[1], model_name)
+        with self._lock:
+            if size is None:
+                self._passed_through += 1
+            else:
+                self._resized += 1
+        if size is None:
+            return image
+        # reducing_gap lets PIL shrink by an integer factor first, which is much cheaper on large photos
+        return image.resize(size, Image.BILINEAR, reducing_gap=3.0)
+
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "max_side": self.max_side if self.mode == MODE_MAX_SIDE else None,
+            "resized": self._resized,
+            "passed_through": self._passed_through,
+        }
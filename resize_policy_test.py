@@ -0,0 +1,42 @@
+"""Tests for resize_policy."""
+
+import unittest
+
+from PIL import Image
+
+from model_registry import CASCADE_MODEL, FASTER_RCNN_MODEL, SSD_MOBILENET_MODEL
+from resize_policy import ResizePolicy
+
+
+class ResizePolicyTest(unittest.TestCase):
+
+    def test_off_by_default(self):
+        policy = ResizePolicy()
+        image = Image.new("RGB", (4000, 3000))
+        self.assertIs(policy.apply(image, FASTER_RCNN_MODEL), image)
+
+    def test_max_side_only_downscales(self):
+        policy = ResizePolicy(mode="max_side", max_side=1000)
+        self.assertEqual(policy.target_size(4000, 3000), (1000, 750))
+        self.assertIsNone(policy.target_size(800, 600))
+        resized = policy.apply(Image.new("RGB", (4000, 3000)))
+        self.assertEqual(resized.size, (1000, 750))
+        self.assertEqual(policy.stats()["resized"], 1)
+
+    def test_native_matches_graph_resizers(self):
+        policy = ResizePolicy(mode="native")
+        # keep_aspect_ratio_resizer: short side 600 unless the long side would exceed 1024
+        self.assertEqual(policy.target_size(1200, 900, FASTER_RCNN_MODEL), (800, 600))
+        self.assertEqual(policy.target_size(4000, 1000, FASTER_RCNN_MODEL), (1024, 256))
+        self.assertEqual(policy.target_size(4000, 3000, CASCADE_MODEL), (800, 600))
+        # fixed_shape_resizer 300x300: keep both axes at or above 300
+        self.assertEqual(policy.target_size(4000, 3000, SSD_MOBILENET_MODEL), (400, 300))
+        self.assertIsNone(policy.target_size(320, 240, SSD_MOBILENET_MODEL))
+
+    def test_rejects_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            ResizePolicy(mode="tiny")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,257 @@
+"""
+Content-addressed cache of detection results.
+
+Results are keyed by a hash of the raw upload bytes, so retried or resent
+frames skip the detector entirely. In perceptual mode a 64-bit difference
+hash of the decoded frame is stored as well, and a miss on the exact key can
+still hit a near-duplicate frame (e.g. a stationary vehicle at a red light).
+
+A global 9x8 thumbnail cannot see a small light turn from red to green, so a
+near-duplicate is only reused when it is recent (`near_ttl_seconds`) and the
+caller's `verify` check passes, e.g. the colour check re-run on the cached
+light boxes of the new frame. Near-duplicate lookups go through a band
+index: with the hash split into max_distance + 1 bands, any hash within
+max_distance bits agrees exactly with at least one band, so only entries
+sharing a band are compared.
+
+The cache is LRU with a TTL and bounded by the serialized size of its results.
+"""
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+MODE_EXACT = "exact"
+MODE_PERCEPTUAL = "perceptual"
+
+_ENTRY_OVERHEAD = 200  # OrderedDict slot, entry object and timestamps
+_HASH_BITS = 64
+
+
+def perceptual_hash(image):
+    """
+    64-bit difference hash (dHash) of a PIL image: compares neighbouring
+    pixels of a 9x8 grayscale thumbnail.
+    """
+    thumb = np.asarray(image.convert('L').resize((9, 8), Image.BILINEAR), dtype=np.int16)
+    bits = thumb[:, 1:] > thumb[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def _hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+def _result_size(result):
+    """Serialized size of a result, nested per-light output included."""
+    return len(json.dumps(result, default=str))
+
+
+def _bands(phash, max_distance):
+    """(band number, band value) keys of a hash split into max_distance + 1 bands."""
+    count = max_distance + 1
+    width = -(-_HASH_BITS // count)
+    return [(i, (phash >> (i * width)) & ((1 << width) - 1)) for i in range(count)]
+
+
+class _Entry:
+    __slots__ = ("result", "phash", "namespace", "check", "size", "stored_at", "expires_at", "touched")
+
+    def __init__(self, result, phash, namespace, check, size, stored_at, expires_at):
+        self.result = result
+        self.phash = phash
+        self.namespace = namespace
+        self.check = check
+        self.size = size
+        self.stored_at = stored_at
+        self.expires_at = expires_at
+        self.touched = 0
+
+
+class ResultCache:
+    """
+    LRU/TTL cache of detection result dicts.
+    :param max_bytes: approximate memory budget; 0 disables the cache
+    :param ttl_seconds: lifetime of an entry
+    :param mode: "exact" (byte hash only) or "perceptual" (also near-duplicate frames)
+    :param max_distance: maximum Hamming distance between perceptual hashes for a hit
+    :param near_ttl_seconds: only entries stored this recently can serve a near-duplicate
+    """
+
+    def __init__(self, max_bytes=16 * 1024 * 1024, ttl_seconds=300.0, mode=MODE_EXACT, max_distance=4,
+                 near_ttl_seconds=2.0):
+        if mode not in (MODE_EXACT, MODE_PERCEPTUAL):
+            raise ValueError(f"Unknown cache mode: {mode}")
+        self.max_bytes = max(0, int(max_bytes))
+        self.ttl_seconds = float(ttl_seconds)
+        self.mode = mode
+        self.max_distance = max(0, int(max_distance))
+        self.near_ttl_seconds = float(near_ttl_seconds)
+        self._entries = OrderedDict()
+        self._band_index = {}
+        self._touches = itertools.count(1)
+        self._lock = threading.Lock()
+        self._size = 0
+        self._hits = 0
+        self._near_hits = 0
+        self._near_rejected = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build a cache from RESULT_CACHE_MB / RESULT_CACHE_TTL / RESULT_CACHE_MODE /
+        RESULT_CACHE_DISTANCE / RESULT_CACHE_NEAR_TTL.
+        """
+        return cls(
+            max_bytes=float(os.environ.get("RESULT_CACHE_MB", 16)) * 1024 * 1024,
+            ttl_seconds=float(os.environ.get("RESULT_CACHE_TTL", 300)),
+            mode=os.environ.get("RESULT_CACHE_MODE", MODE_EXACT),
+            max_distance=int(os.environ.get("RESULT_CACHE_DISTANCE", 4)),
+            near_ttl_seconds=float(os.environ.get("RESULT_CACHE_NEAR_TTL", 2)),
+        )
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    @property
+    def perceptual(self):
+        return self.enabled and self.mode == MODE_PERCEPTUAL
+
+    @staticmethod
+    def key_for_bytes(data, namespace=""):
+        """Content hash of the raw upload; `namespace` separates e.g. request options."""
+        digest = hashlib.blake2b(data, digest_size=16)
+        if namespace:
+            digest.update(namespace.encode())
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return a copy of the cached result for `key`, or None."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at < time.monotonic():
+                self._remove(key)
+                self._expirations += 1
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._touch(key, entry)
+            self._hits += 1
+            return dict(entry.result)
+
+    def get_similar(self, phash, namespace="", verify=None):
+        """
+        Result of the most recent near-duplicate frame in `namespace`, or None.
+        :param verify: optional callable (check, cached_result) -> bool run on the match,
+                       with the `check` data stored by put(); a False rejects the match
+        :return: a copy of the cached result
+        """
+        if not self.perceptual or phash is None:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            best = None
+            for band in _bands(phash, self.max_distance):
+                for key in self._band_index.get(band, ()):
+                    entry = self._entries[key]
+                    if entry.namespace != namespace or entry.expires_at < now or \
+                            now - entry.stored_at > self.near_ttl_seconds:
+                        continue
+                    if (best is None or entry.touched > best[1].touched) and \
+                            _hamming(entry.phash, phash) <= self.max_distance:
+                        best = (key, entry)
+            if best is None:
+                return None
+            key, entry = best
+            result, check = dict(entry.result), entry.check
+        # The verification (e.g. a colour check of the light crops) runs outside the lock
+        if verify is not None and not verify(check, result):
+            with self._lock:
+                self._near_rejected += 1
+            return None
+        with self._lock:
+            if self._entries.get(key) is entry:
+                self._touch(key, entry)
+            self._near_hits += 1
+        return result
+
+    def put(self, key, result, phash=None, namespace="", check=None):
+        """
+        Store a result.
+        :param phash: perceptual hash of the frame, for near-duplicate lookups
+        :param check: data handed to get_similar's `verify` (e.g. the light boxes)
+        """
+        if not self.enabled:
+            return
+        size = len(key) + _result_size(result) + _ENTRY_OVERHEAD
+        if check is not None:
+            size += _result_size(check)
+        now = time.monotonic()
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            entry = _Entry(dict(result), phash, namespace, check, size, now, now + self.ttl_seconds)
+            self._entries[key] = entry
+            self._touch(key, entry)
+            if phash is not None:
+                for band in _bands(phash, self.max_distance):
+                    self._band_index.setdefault(band, set()).add(key)
+            self._size += size
+            while self._size > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._band_index.clear()
+            self._size = 0
+
+    def _touch(self, key, entry):
+        self._entries.move_to_end(key)
+        entry.touched = next(self._touches)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._size -= entry.size
+        if entry.phash is not None:
+            for band in _bands(entry.phash, self.max_distance):
+                keys = self._band_index.get(band)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._band_index[band]
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "mode": self.mode,
+                "entries": len(self._entries),
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "near_duplicate_hits": self._near_hits,
+                "near_duplicates_rejected": self._near_rejected,
+                "near_ttl_seconds": self.near_ttl_seconds,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,113 @@
+"""Tests for result_cache."""
+
+import time
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from result_cache import ResultCache, perceptual_hash
+
+RESULT = {"command": "Stop", "confidence": 0.9, "traffic_light_detected": True, "message": "m"}
+
+
+class ResultCacheTest(unittest.TestCase):
+
+    def test_hit_and_miss(self):
+        cache = ResultCache()
+        key = cache.key_for_bytes(b"frame-1")
+        self.assertIsNone(cache.get(key))
+        cache.put(key, RESULT)
+        self.assertEqual(cache.get(key), RESULT)
+        self.assertEqual(cache.get(cache.key_for_bytes(b"frame-2")), None)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+
+    def test_returns_copies(self):
+        cache = ResultCache()
+        cache.put("k", RESULT)
+        cache.get("k")["command"] = "Go"
+        self.assertEqual(cache.get("k")["command"], "Stop")
+
+    def test_evicts_least_recently_used_within_budget(self):
+        cache = ResultCache(max_bytes=2500)
+        for i in range(10):
+            cache.put(f"key-{i}", RESULT)
+            cache.get("key-0")  # keep key-0 hot
+        stats = cache.stats()
+        self.assertLessEqual(stats["size_bytes"], 2500)
+        self.assertGreater(stats["evictions"], 0)
+        self.assertIsNotNone(cache.get("key-0"))
+        self.assertIsNone(cache.get("key-1"))
+
+    def test_ttl_expiry(self):
+        cache = ResultCache(ttl_seconds=0.05)
+        cache.put("k", RESULT)
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("k"))
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+    def test_disabled_cache(self):
+        cache = ResultCache(max_bytes=0)
+        cache.put("k", RESULT)
+        self.assertIsNone(cache.get("k"))
+
+    def test_perceptual_near_duplicates(self):
+        rng = np.random.RandomState(0)
+        frame = rng.randint(0, 256, (64, 96, 3)).astype(np.uint8)
+        noisy = np.clip(frame.astype(np.int16) + rng.randint(-2, 3, frame.shape), 0, 255).astype(np.uint8)
+        other = rng.randint(0, 256, (64, 96, 3)).astype(np.uint8)
+
+        cache = ResultCache(mode="perceptual", max_distance=6)
+        cache.put("frame", RESULT, perceptual_hash(Image.fromarray(frame)))
+        self.assertEqual(cache.get_similar(perceptual_hash(Image.fromarray(noisy))), RESULT)
+        self.assertIsNone(cache.get_similar(perceptual_hash(Image.fromarray(other))))
+        self.assertEqual(cache.stats()["near_duplicate_hits"], 1)
+
+    def test_perceptual_lookup_is_scoped_to_namespace(self):
+        frame = Image.fromarray(np.random.RandomState(1).randint(0, 256, (32, 32, 3)).astype(np.uint8))
+        cache = ResultCache(mode="perceptual")
+        cache.put("frame", RESULT, perceptual_hash(frame), namespace="model-a")
+        self.assertIsNone(cache.get_similar(perceptual_hash(frame), "model-b"))
+        self.assertEqual(cache.get_similar(perceptual_hash(frame), "model-a"), RESULT)
+
+    def test_near_duplicate_needs_verification_and_recency(self):
+        frame = Image.fromarray(np.random.RandomState(2).randint(0, 256, (32, 32, 3)).astype(np.uint8))
+        phash = perceptual_hash(frame)
+        cache = ResultCache(mode="perceptual", near_ttl_seconds=0.05)
+        cache.put("frame", RESULT, phash, check=[[0.1, 0.1, 0.5, 0.3]])
+        # e.g. the light at the cached box has turned green since
+        seen = []
+        self.assertIsNone(cache.get_similar(phash, verify=lambda check, cached: seen.append(check) or False))
+        self.assertEqual(seen, [[[0.1, 0.1, 0.5, 0.3]]])
+        self.assertEqual(cache.get_similar(phash, verify=lambda check, cached: cached["command"] == "Stop"), RESULT)
+        time.sleep(0.1)
+        self.assertIsNone(cache.get_similar(phash))
+        self.assertIsNotNone(cache.get("frame"))  # the exact key keeps the full TTL
+        stats = cache.stats()
+        self.assertEqual((stats["near_duplicate_hits"], stats["near_duplicates_rejected"]), (1, 1))
+
+    def test_band_index_finds_hashes_at_max_distance(self):
+        cache = ResultCache(mode="perceptual", max_distance=4)
+        base = 0x0123456789ABCDEF
+        cache.put("a", RESULT, base)
+        # Flip one bit in four different bands, and five bits in total for the miss
+        near = base ^ (1 << 0) ^ (1 << 13) ^ (1 << 26) ^ (1 << 39)
+        far = near ^ (1 << 52)
+        self.assertEqual(cache.get_similar(near), RESULT)
+        self.assertIsNone(cache.get_similar(far))
+        cache.put("b", dict(RESULT, command="Go"), base ^ 1)
+        self.assertEqual(cache.get_similar(base)["command"], "Go")  # most recent match wins
+        cache.clear()
+        self.assertIsNone(cache.get_similar(base))
+
+    def test_size_counts_nested_lights(self):
+        lights = {"scale": 10000, "boxes": [[1000, 2000, 3000, 4000]] * 20, "scores": [9000] * 20}
+        small, large = ResultCache(), ResultCache()
+        small.put("k", RESULT)
+        large.put("k", dict(RESULT, lights=lights))
+        self.assertGreater(large.stats()["size_bytes"] - small.stats()["size_bytes"], 20 * 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -14,6 +14,9 @@ if __name__ == "__main__":
     reload = not is_production
     
     # Run the FastAPI app
+    # Keep a single uvicorn worker: set INFERENCE_PROCESSES to scale inference
+    # across cores with worker processes (each holds its own copy of the model;
+    # the pool starts no more of them than fit in the memory limit)
     uvicorn.run(
         "main1:app",
         host="0.0.0.0",
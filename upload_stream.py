@@ -0,0 +1,197 @@
+"""
+Streaming reader for raw (non-multipart, non-base64) image uploads.
+
+The request body is copied chunk by chunk into one buffer, preallocated from
+Content-Length when the client sends it, and the size limit is enforced as
+the chunks arrive, so an oversized upload is rejected before it is buffered.
+
+Several images can be sent in one raw body as a length-prefixed envelope:
+each image is preceded by its size as a 4-byte big-endian unsigned integer.
+limit_stream applies the same streaming limit to bodies that go through
+another parser (e.g. a multipart batch), and copy_multipart_field streams one
+multipart field straight into a file without spooling the body first.
+"""
+import os
+import struct
+
+RAW_CONTENT_TYPES = ("application/octet-stream", "image/jpeg", "image/jpg", "image/png")
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the configured size limit."""
+
+
+class UploadIncomplete(Exception):
+    """Raised when the body is shorter than its declared Content-Length."""
+
+
+def max_upload_bytes_from_env():
+    """MAX_UPLOAD_MB env var (default 20 MB)."""
+    return int(float(os.environ.get("MAX_UPLOAD_MB", 20)) * 1024 * 1024)
+
+
+def max_batch_images_from_env():
+    """MAX_BATCH_IMAGES env var (default 32)."""
+    return int(os.environ.get("MAX_BATCH_IMAGES", 32))
+
+
+def max_batch_bytes_from_env():
+    """MAX_BATCH_MB env var (default 64 MB): whole body of one batch request."""
+    return int(float(os.environ.get("MAX_BATCH_MB", 64)) * 1024 * 1024)
+
+
+def declared_length(content_length):
+    """Parsed Content-Length header, None when absent; ValueError when malformed."""
+    if not content_length:
+        return None
+    try:
+        length = int(content_length)
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise ValueError(f"Invalid Content-Length: {content_length!r}")
+    return length
+
+
+def is_raw_content_type(content_type):
+    return (content_type or "").split(";")[0].strip().lower() in RAW_CONTENT_TYPES
+
+
+async def read_stream(chunks, content_length=None, max_bytes=20 * 1024 * 1024, inspect=None,
+                      inspect_bytes=64 * 1024):
+    """
+    Read an async iterator of byte chunks into a single buffer.
+    :param chunks: async iterator of bytes (e.g. starlette's request.stream())
+    :param content_length: declared body size (Content-Length header), if any
+    :param max_bytes: upload size limit
+    :param inspect: optional callable given a copy of the first `inspect_bytes` bytes as soon
+                    as they arrived (e.g. a header check); an exception it raises aborts the read
+    :return: memoryview over the received bytes
+    """
+    declared = declared_length(content_length)
+    if declared is not None and declared > max_bytes:
+        raise UploadTooLarge(f"Upload of {declared} bytes exceeds the {max_bytes} byte limit")
+
+    buffer = bytearray(declared if declared is not None else 64 * 1024)
+    size = 0
+    async for chunk in chunks:
+        end = size + len(chunk)
+        if end > max_bytes:
+            raise UploadTooLarge(f"Upload exceeds the {max_bytes} byte limit")
+        if end > len(buffer):
+            # Only without (or with a wrong) Content-Length: grow geometrically
+            buffer.extend(bytes(min(max_bytes, max(end, 2 * len(buffer))) - len(buffer)))
+        buffer[size:end] = chunk
+        size = end
+        if inspect is not None and size >= inspect_bytes:
+            inspect(bytes(buffer[:inspect_bytes]))
+            inspect = None
+    if declared is not None and size < declared:
+        raise UploadIncomplete(f"Received {size} of {declared} declared bytes")
+    return memoryview(buffer)[:size]
+
+
+async def limit_stream(chunks, content_length=None, max_bytes=20 * 1024 * 1024):
+    """
+    Pass an async iterator of byte chunks through, enforcing the upload size limit
+    on the declared Content-Length up front and on the bytes as they arrive.
+    """
+    declared = declared_length(content_length)
+    if declared is not None and declared > max_bytes:
+        raise UploadTooLarge(f"Upload of {declared} bytes exceeds the {max_bytes} byte limit")
+    size = 0
+    async for chunk in chunks:
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLarge(f"Upload exceeds the {max_bytes} byte limit")
+        yield chunk
+
+
+async def copy_multipart_field(content_type, chunks, field, out):
+    """
+    Write one field of a multipart/form-data body to a file as the body streams in.
+    Other parts are skipped, and nothing is spooled to memory or disk on the way.
+    :param content_type: Content-Type header of the request (carries the boundary)
+    :param chunks: async iterator of body bytes (wrap it in limit_stream for a size limit)
+    :param field: form field name; only its first occurrence is written
+    :param out: binary file object to write to
+    :return: number of bytes written
+    """
+    from multipart.multipart import MultipartParser, parse_options_header
+
+    boundary = parse_options_header(content_type)[1].get(b"boundary")
+    if not boundary:
+        raise ValueError("Missing boundary in multipart body")
+    state = {"name": b"", "value": b"", "headers": {}, "copying": False, "found": False}
+    pending = []
+
+    def on_header_field(data, start, end):
+        state["name"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        state["value"] += data[start:end]
+
+    def on_header_end():
+        state["headers"][state["name"].lower()] = state["value"]
+        state["name"], state["value"] = b"", b""
+
+    def on_headers_finished():
+        options = parse_options_header(state["headers"].get(b"content-disposition", b""))[1]
+        state["copying"] = not state["found"] and options.get(b"name") == field.encode()
+        state["found"] = state["found"] or state["copying"]
+        state["headers"] = {}
+
+    def on_part_data(data, start, end):
+        if state["copying"]:
+            pending.append(bytes(data[start:end]))
+
+    parser = MultipartParser(boundary, {
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+    })
+    written = 0
+    async for chunk in chunks:
+        parser.write(chunk)
+        for data in pending:
+            out.write(data)
+            written += len(data)
+        pending.clear()
+    parser.finalize()
+    if not state["found"]:
+        raise ValueError(f"Missing '{field}' field")
+    return written
+
+
+def split_envelope(data, max_items=None, max_item_bytes=None):
+    """
+    Split a length-prefixed envelope into its images (views, no copies).
+    :param data: bytes-like envelope
+    :param max_items: maximum number of images allowed
+    :param max_item_bytes: size limit of each image; UploadTooLarge above it
+    :return: list of memoryviews
+    """
+    view = memoryview(data)
+    items = []
+    offset = 0
+    while offset < len(view):
+        if offset + 4 > len(view):
+            raise ValueError(f"Truncated length prefix at byte {offset}")
+        (length,) = struct.unpack_from(">I", view, offset)
+        offset += 4
+        if max_item_bytes is not None and length > max_item_bytes:
+            raise UploadTooLarge(f"Image {len(items)} of {length} bytes exceeds the {max_item_bytes} byte limit")
+        if offset + length > len(view):
+            raise ValueError(f"Image {len(items)} declares {length} bytes, only {len(view) - offset} left")
+        items.append(view[offset:offset + length])
+        offset += length
+        if max_items is not None and len(items) > max_items:
+            raise ValueError(f"Too many images in one batch (limit {max_items})")
+    return items
+
+
+def build_envelope(images):
+    """Length-prefixed envelope of encoded images (the client side of split_envelope)."""
+    return b"".join(struct.pack(">I", len(image)) + bytes(image) for image in images)
@@ -0,0 +1,148 @@
+"""Tests for upload_stream."""
+
+import asyncio
+import io
+import unittest
+
+from upload_stream import (UploadIncomplete, UploadTooLarge, build_envelope, copy_multipart_field, declared_length,
+                           is_raw_content_type, limit_stream, read_stream, split_envelope)
+
+
+async def _chunks(*parts, consumed=None):
+    for part in parts:
+        if consumed is not None:
+            consumed.append(part)
+        yield part
+
+
+def _read(*args, **kwargs):
+    return asyncio.run(read_stream(*args, **kwargs))
+
+
+def _drain(*args, **kwargs):
+    async def drain():
+        return [chunk async for chunk in limit_stream(*args, **kwargs)]
+    return asyncio.run(drain())
+
+
+class UploadStreamTest(unittest.TestCase):
+
+    def test_reads_with_and_without_content_length(self):
+        parts = [b"a" * 1000, b"b" * 70000, b"c"]
+        body = b"".join(parts)
+        self.assertEqual(bytes(_read(_chunks(*parts), str(len(body)))), body)
+        self.assertEqual(bytes(_read(_chunks(*parts))), body)
+
+    def test_rejects_declared_oversize_without_reading(self):
+        consumed = []
+        with self.assertRaises(UploadTooLarge):
+            _read(_chunks(b"x" * 10, consumed=consumed), "5000", max_bytes=1000)
+        self.assertEqual(consumed, [])
+
+    def test_enforces_limit_while_streaming(self):
+        consumed = []
+        with self.assertRaises(UploadTooLarge):
+            _read(_chunks(b"x" * 600, b"x" * 600, b"x" * 600, consumed=consumed), max_bytes=1000)
+        self.assertEqual(len(consumed), 2)
+
+    def test_inspects_first_bytes_once(self):
+        seen = []
+        body = _read(_chunks(b"a" * 300, b"b" * 300, b"c" * 300), inspect=seen.append, inspect_bytes=500)
+        self.assertEqual(len(body), 900)
+        self.assertEqual(seen, [b"a" * 300 + b"b" * 200])
+
+    def test_inspect_aborts_read(self):
+        consumed = []
+
+        def reject(head):
+            raise ValueError("bad header")
+
+        with self.assertRaises(ValueError):
+            _read(_chunks(b"x" * 600, b"x" * 600, consumed=consumed), inspect=reject, inspect_bytes=100)
+        self.assertEqual(len(consumed), 1)
+
+    def test_short_body(self):
+        with self.assertRaises(UploadIncomplete):
+            _read(_chunks(b"x" * 10), "20")
+
+    def test_content_types(self):
+        self.assertTrue(is_raw_content_type("image/jpeg"))
+        self.assertTrue(is_raw_content_type("application/octet-stream; charset=binary"))
+        self.assertFalse(is_raw_content_type("multipart/form-data; boundary=x"))
+        self.assertFalse(is_raw_content_type(None))
+
+    def test_envelope_round_trip(self):
+        images = [b"\xff\xd8first", b"", b"\x89PNG" * 100]
+        self.assertEqual([bytes(v) for v in split_envelope(build_envelope(images))], images)
+        self.assertEqual(split_envelope(b""), [])
+
+    def test_malformed_envelopes(self):
+        envelope = build_envelope([b"abc", b"defg"])
+        with self.assertRaises(ValueError):
+            split_envelope(envelope[:-1])
+        with self.assertRaises(ValueError):
+            split_envelope(envelope + b"\x00\x00")
+        with self.assertRaises(ValueError):
+            split_envelope(envelope, max_items=1)
+
+    def test_envelope_item_limit(self):
+        envelope = build_envelope([b"abc", b"x" * 100])
+        self.assertEqual(len(split_envelope(envelope, max_item_bytes=100)), 2)
+        with self.assertRaises(UploadTooLarge):
+            split_envelope(envelope, max_item_bytes=99)
+
+    def test_limit_stream(self):
+        self.assertEqual(_drain(_chunks(b"ab", b"cd"), "4", max_bytes=4), [b"ab", b"cd"])
+        with self.assertRaises(UploadTooLarge):
+            _drain(_chunks(b"ab"), "5", max_bytes=4)
+        consumed = []
+        with self.assertRaises(UploadTooLarge):
+            _drain(_chunks(b"abc", b"def", b"ghi", consumed=consumed), max_bytes=4)
+        self.assertEqual(consumed, [b"abc", b"def"])
+
+    def test_declared_length(self):
+        self.assertIsNone(declared_length(None))
+        self.assertEqual(declared_length("42"), 42)
+        for bad in ("lots", "-1"):
+            with self.assertRaises(ValueError):
+                declared_length(bad)
+        with self.assertRaises(ValueError):
+            _read(_chunks(b"ab"), "lots")
+
+
+def _multipart(*parts, boundary="b0undary"):
+    body = b""
+    for name, data in parts:
+        body += (f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"; filename=\"{name}.bin\"\r\n"
+                 f"Content-Type: application/octet-stream\r\n\r\n").encode() + data + b"\r\n"
+    return f"multipart/form-data; boundary={boundary}", body + f"--{boundary}--\r\n".encode()
+
+
+class CopyMultipartFieldTest(unittest.TestCase):
+
+    def _copy(self, content_type, body, chunk_size=7, max_bytes=10 ** 6):
+        async def copy():
+            out = io.BytesIO()
+            chunks = _chunks(*[body[i:i + chunk_size] for i in range(0, len(body), chunk_size)])
+            written = await copy_multipart_field(content_type, limit_stream(chunks, max_bytes=max_bytes), "file", out)
+            return written, out.getvalue()
+        return asyncio.run(copy())
+
+    def test_copies_only_the_first_file_field(self):
+        video = bytes(range(256)) * 3
+        content_type, body = _multipart(("note", b"skip me"), ("file", video), ("file", b"second"))
+        self.assertEqual(self._copy(content_type, body), (len(video), video))
+
+    def test_missing_field_boundary_and_limit(self):
+        content_type, body = _multipart(("note", b"skip me"))
+        with self.assertRaises(ValueError):
+            self._copy(content_type, body)
+        with self.assertRaises(ValueError):
+            self._copy("multipart/form-data", body)
+        content_type, body = _multipart(("file", b"x" * 1000))
+        with self.assertRaises(UploadTooLarge):
+            self._copy(content_type, body, max_bytes=500)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,250 @@
+"""
+Pooled HTTP fetcher for /detect-url.
+
+Keeps idle keep-alive connections per (scheme, host, port), so repeated
+fetches from the same camera host skip the TCP/TLS handshake, and applies a
+timeout and a size limit to every fetch. Fetched images that carry an ETag
+or Last-Modified header are cached by URL and revalidated with a conditional
+request; a 304 answer reuses the cached bytes.
+
+Built on http.client, so it needs no extra dependency: the blocking fetch
+runs on an executor thread and fetch_async() awaits it, keeping the event
+loop free.
+"""
+import asyncio
+import http.client
+import os
+import threading
+from collections import OrderedDict, deque
+from urllib.parse import urljoin, urlsplit
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+_READ_CHUNK = 64 * 1024
+
+
+class FetchError(Exception):
+    """Raised when a URL cannot be fetched."""
+
+
+class FetchTooLarge(FetchError):
+    """Raised when the fetched body exceeds the size limit."""
+
+
+class _CachedImage:
+    __slots__ = ("data", "etag", "last_modified")
+
+    def __init__(self, data, etag, last_modified):
+        self.data = data
+        self.etag = etag
+        self.last_modified = last_modified
+
+
+class UrlFetcher:
+    """
+    HTTP(S) GET with per-host connection pooling, timeouts, size limits and ETag caching.
+    :param pool_size: idle connections kept per host
+    :param timeout: connect/read timeout in seconds
+    :param max_bytes: largest accepted body
+    :param cache_bytes: memory budget of the URL cache; 0 disables it
+    :param max_redirects: redirects followed per fetch
+    """
+
+    def __init__(self, pool_size=4, timeout=10.0, max_bytes=20 * 1024 * 1024,
+                 cache_bytes=32 * 1024 * 1024, max_redirects=5):
+        self.pool_size = max(0, int(pool_size))
+        self.timeout = float(timeout)
+        self.max_bytes = int(max_bytes)
+        self.cache_bytes = max(0, int(cache_bytes))
+        self.max_redirects = int(max_redirects)
+        self._idle = {}
+        self._cache = OrderedDict()
+        self._cache_size = 0
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._new_connections = 0
+        self._reused_connections = 0
+        self._not_modified = 0
+        self._bytes = 0
+
+    @classmethod
+    def from_env(cls):
+        """Build a fetcher from URL_FETCH_POOL_SIZE / URL_FETCH_TIMEOUT / URL_FETCH_MAX_MB / URL_FETCH_CACHE_MB."""
+        return cls(
+            pool_size=int(os.environ.get("URL_FETCH_POOL_SIZE", 4)),
+            timeout=float(os.environ.get("URL_FETCH_TIMEOUT", 10)),
+            max_bytes=float(os.environ.get("URL_FETCH_MAX_MB", 20)) * 1024 * 1024,
+            cache_bytes=float(os.environ.get("URL_FETCH_CACHE_MB", 32)) * 1024 * 1024,
+        )
+
+    async def fetch_async(self, url):
+        """fetch() on the loop's default executor, so the event loop never blocks on the network."""
+        return await asyncio.get_running_loop().run_in_executor(None, self.fetch, url)
+
+    def fetch(self, url):
+        """
+        Fetch `url`, following redirects.
+        :return: body bytes
+        """
+        for _ in range(self.max_redirects + 1):
+            status, location, data = self._fetch_once(url)
+            if status not in REDIRECT_CODES:
+                return data
+            if not location:
+                raise FetchError(f"Redirect without a Location from {url}")
+            url = urljoin(url, location)
+        raise FetchError(f"Too many redirects (limit {self.max_redirects})")
+
+    def _fetch_once(self, url):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise FetchError(f"Unsupported URL: {url}")
+        key = (parts.scheme, parts.hostname, parts.port)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+
+        headers = {"Accept": "image/*", "Connection": "keep-alive"}
+        cached = self._cache_get(url)
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        with self._lock:
+            self._requests += 1
+        conn, reused = self._acquire(key)
+        try:
+            try:
+                conn.request("GET", target, headers=headers)
+                response = conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                if not reused:
+                    raise
+                # The server closed an idle keep-alive connection; retry once on a fresh one
+                conn.close()
+                conn, reused = self._connect(key), False
+                conn.request("GET", target, headers=headers)
+                response = conn.getresponse()
+            status = response.status
+            location = response.getheader("Location")
+            if status == 304 and cached is not None:
+                response.read()
+                data = cached.data
+                with self._lock:
+                    self._not_modified += 1
+            elif status in REDIRECT_CODES:
+                response.read()
+                data = None
+            elif status != 200:
+                response.read()
+                raise FetchError(f"HTTP {status} fetching {url}")
+            else:
+                data = self._read_body(response)
+                self._cache_put(url, data, response.getheader("ETag"), response.getheader("Last-Modified"))
+        except FetchError:
+            conn.close()
+            raise
+        except (OSError, ValueError, http.client.HTTPException) as e:
+            conn.close()
+            raise FetchError(f"Error fetching {url}: {e}")
+        except BaseException:
+            # Never hand a connection with an unread response back to the pool
+            conn.close()
+            raise
+        self._release(key, conn, response)
+        return status, location, data
+
+    def _read_body(self, response):
+        declared = response.getheader("Content-Length")
+        if declared is not None:
+            try:
+                declared = int(declared)
+            except ValueError:
+                raise FetchError(f"Invalid Content-Length: {declared!r}")
+        if declared is not None and declared > self.max_bytes:
+            raise FetchTooLarge(f"Image of {declared} bytes exceeds the {self.max_bytes} byte limit")
+        chunks = []
+        size = 0
+        while True:
+            chunk = response.read(_READ_CHUNK)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > self.max_bytes:
+                raise FetchTooLarge(f"Image exceeds the {self.max_bytes} byte limit")
+            chunks.append(chunk)
+        with self._lock:
+            self._bytes += size
+        return b"".join(chunks)
+
+    def _connect(self, key):
+        scheme, host, port = key
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(host, port, timeout=self.timeout)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=self.timeout)
+        with self._lock:
+            self._new_connections += 1
+        return conn
+
+    def _acquire(self, key):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self._reused_connections += 1
+                return idle.pop(), True
+        return self._connect(key), False
+
+    def _release(self, key, conn, response):
+        if response.will_close or self.pool_size == 0:
+            conn.close()
+            return
+        with self._lock:
+            idle = self._idle.setdefault(key, deque())
+            if len(idle) < self.pool_size:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def _cache_get(self, url):
+        if not self.cache_bytes:
+            return None
+        with self._lock:
+            entry = self._cache.get(url)
+            if entry is not None:
+                self._cache.move_to_end(url)
+            return entry
+
+    def _cache_put(self, url, data, etag, last_modified):
+        if not self.cache_bytes or not (etag or last_modified) or len(data) > self.cache_bytes:
+            return
+        with self._lock:
+            previous = self._cache.pop(url, None)
+            if previous is not None:
+                self._cache_size -= len(previous.data)
+            self._cache[url] = _CachedImage(data, etag, last_modified)
+            self._cache_size += len(data)
+            while self._cache_size > self.cache_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_size -= len(evicted.data)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "new_connections": self._new_connections,
+                "reused_connections": self._reused_connections,
+                "idle_connections": sum(len(idle) for idle in self._idle.values()),
+                "not_modified": self._not_modified,
+                "bytes_fetched": self._bytes,
+                "cached_urls": len(self._cache),
+                "cache_size_bytes": self._cache_size,
+            }
+
+    def close(self):
+        with self._lock:
+            idle = [conn for conns in self._idle.values() for conn in conns]
+            self._idle.clear()
+        for conn in idle:
+            conn.close()
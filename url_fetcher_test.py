@@ -0,0 +1,96 @@
+"""Tests for url_fetcher, against a local stand-in HTTP server."""
+
+import asyncio
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from url_fetcher import FetchError, FetchTooLarge, UrlFetcher
+
+IMAGE = b"\xff\xd8" + b"frame" * 1000
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    requests = []
+
+    def do_GET(self):
+        _Handler.requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.path == "/redirect":
+            self._send(302, b"", {"Location": "/image.jpg"})
+        elif self.path == "/image.jpg":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self._send(304, None, {"ETag": '"v1"'})
+            else:
+                self._send(200, IMAGE, {"ETag": '"v1"', "Content-Type": "image/jpeg"})
+        elif self.path == "/big.jpg":
+            self._send(200, b"x" * 5000, {})
+        elif self.path == "/bad-length.jpg":
+            self._send(200, None, {"Content-Length": "lots", "Connection": "close"})
+            self.wfile.write(IMAGE)
+            self.close_connection = True
+        else:
+            self._send(404, b"missing", {})
+
+    def _send(self, status, body, headers):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if body is not None:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class UrlFetcherTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        _Handler.requests = []
+
+    def test_reuses_connections_and_revalidates_with_etag(self):
+        fetcher = UrlFetcher()
+        self.assertEqual(fetcher.fetch(self.base + "/image.jpg"), IMAGE)
+        self.assertEqual(asyncio.run(fetcher.fetch_async(self.base + "/image.jpg")), IMAGE)
+        stats = fetcher.stats()
+        self.assertEqual((stats["new_connections"], stats["reused_connections"]), (1, 1))
+        self.assertEqual(stats["not_modified"], 1)
+        self.assertEqual(_Handler.requests[1], ("/image.jpg", '"v1"'))
+        fetcher.close()
+
+    def test_follows_redirects(self):
+        fetcher = UrlFetcher(cache_bytes=0)
+        self.assertEqual(fetcher.fetch(self.base + "/redirect"), IMAGE)
+        fetcher.close()
+
+    def test_limits_and_errors(self):
+        fetcher = UrlFetcher(max_bytes=1000)
+        with self.assertRaises(FetchTooLarge):
+            fetcher.fetch(self.base + "/big.jpg")
+        with self.assertRaises(FetchError):
+            fetcher.fetch(self.base + "/missing.jpg")
+        with self.assertRaises(FetchError):
+            fetcher.fetch("ftp://example.com/image.jpg")
+        with self.assertRaisesRegex(FetchError, "Invalid Content-Length"):
+            fetcher.fetch(self.base + "/bad-length.jpg")
+        # Failed fetches never return their connection to the pool
+        self.assertEqual(fetcher.stats()["idle_connections"], 0)
+        fetcher.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
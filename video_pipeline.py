@@ -0,0 +1,178 @@
+"""
+Server-side video ingestion for /detect-video.
+
+A decoder thread reads the video with OpenCV, keeps frames per the sampling
+policy and pushes them into a bounded queue; the event loop side keeps up to
+`max_in_flight` detections running at once (so frames share detector
+batches) and yields results in frame order. The decoder only waits when the
+queue is full, never on a particular sess.run.
+"""
+import asyncio
+import os
+import threading
+from collections import deque
+
+import cv2
+import numpy as np
+
+_THUMB_SIZE = (32, 18)
+
+
+class FrameSampler:
+    """
+    Chooses which decoded frames go to the detector.
+    :param sample_fps: keep one frame per 1/sample_fps seconds of video (0 = no time-based sampling)
+    :param scene_threshold: also keep frames whose grayscale thumbnail differs from the
+                            last kept frame by more than this mean absolute value (0-255; 0 = off)
+    With both at 0 every frame is kept.
+    """
+
+    def __init__(self, sample_fps=2.0, scene_threshold=0.0):
+        self.sample_fps = max(0.0, float(sample_fps))
+        self.scene_threshold = max(0.0, float(scene_threshold))
+        self._next_time = 0.0
+        self._last_thumb = None
+
+    @classmethod
+    def from_env(cls, sample_fps=None, scene_threshold=None):
+        """Sampler from VIDEO_SAMPLE_FPS / VIDEO_SCENE_THRESHOLD, overridden by explicit values."""
+        return cls(
+            sample_fps=float(os.environ.get("VIDEO_SAMPLE_FPS", 2)) if sample_fps is None else sample_fps,
+            scene_threshold=(float(os.environ.get("VIDEO_SCENE_THRESHOLD", 0))
+                             if scene_threshold is None else scene_threshold),
+        )
+
+    @property
+    def needs_pixels(self):
+        """Whether every frame has to be decoded (scene detection looks at all of them)."""
+        return self.scene_threshold > 0 or self.sample_fps == 0
+
+    def due(self, timestamp):
+        """Whether time-based sampling wants the frame at `timestamp` seconds."""
+        return self.sample_fps > 0 and timestamp + 1e-9 >= self._next_time
+
+    def keep(self, timestamp, frame_bgr):
+        """Decide on one decoded frame; updates the sampler state when it is kept."""
+        if self.sample_fps == 0 and self.scene_threshold == 0:
+            return True
+        thumb = None
+        changed = False
+        if self.scene_threshold > 0:
+            gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
+            thumb = cv2.resize(gray, _THUMB_SIZE, interpolation=cv2.INTER_AREA).astype(np.int16)
+            changed = (self._last_thumb is None
+                       or float(np.mean(np.abs(thumb - self._last_thumb))) > self.scene_threshold)
+        if not (self.due(timestamp) or changed):
+            return False
+        if self.sample_fps > 0:
+            self._next_time = timestamp + 1.0 / self.sample_fps
+        if thumb is not None:
+            self._last_thumb = thumb
+        return True
+
+
+def iter_sampled_frames(path, sampler, stats=None):
+    """
+    Decode a video file and yield the sampled frames.
+    :param path: video file path
+    :param sampler: FrameSampler
+    :param stats: optional dict updated with "frames_decoded" and "fps"
+    :return: iterator of (frame_index, timestamp_ms, RGB uint8 array)
+    """
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError("Could not open the video (unsupported container or codec)")
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    if stats is not None:
+        stats["fps"] = fps
+    index = 0
+    try:
+        while True:
+            timestamp = index / fps
+            if sampler.needs_pixels or sampler.due(timestamp):
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                if sampler.keep(timestamp, frame):
+                    yield index, round(timestamp * 1000.0, 1), cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            elif not capture.grab():  # skipped frames are not converted to pixels
+                break
+            index += 1
+            if stats is not None:
+                stats["frames_decoded"] = index
+    finally:
+        capture.release()
+
+
+def pipeline_limits_from_env():
+    """(max_in_flight, prefetch) from VIDEO_MAX_IN_FLIGHT / VIDEO_PREFETCH (defaults 8 and 16)."""
+    return int(os.environ.get("VIDEO_MAX_IN_FLIGHT", 8)), int(os.environ.get("VIDEO_PREFETCH", 16))
+
+
+def max_video_bytes_from_env():
+    """MAX_VIDEO_MB env var (default 200 MB)."""
+    return int(float(os.environ.get("MAX_VIDEO_MB", 200)) * 1024 * 1024)
+
+
+_END = object()
+
+
+async def run_pipeline(frames, detect, max_in_flight=8, prefetch=16):
+    """
+    Run `detect` over frames decoded on a background thread.
+    :param frames: iterator of (frame_index, timestamp_ms, frame); iterated on a decoder thread
+    :param detect: async callable(frame) -> dict
+    :param max_in_flight: detections running at once
+    :param prefetch: decoded frames buffered ahead of the detector
+    :return: async iterator of (frame_index, timestamp_ms, result or exception), in frame order
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=max(1, prefetch))
+    stop = threading.Event()
+
+    def decode():
+        outcome = _END
+        try:
+            for item in frames:
+                if stop.is_set():
+                    break
+                asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+        except Exception as e:
+            outcome = e
+        finally:
+            close = getattr(frames, "close", None)
+            if close is not None:
+                close()  # releases the capture when the consumer stopped early
+        if not stop.is_set():
+            asyncio.run_coroutine_threadsafe(queue.put(outcome), loop).result()
+
+    decoder = threading.Thread(target=decode, name="video-decoder", daemon=True)
+    decoder.start()
+
+    async def run_one(item):
+        index, timestamp_ms, frame = item
+        try:
+            return index, timestamp_ms, await detect(frame)
+        except Exception as e:
+            return index, timestamp_ms, e
+
+    pending = deque()
+    try:
+        while True:
+            item = await queue.get()
+            if item is _END:
+                break
+            if isinstance(item, Exception):
+                raise item
+            pending.append(asyncio.ensure_future(run_one(item)))
+            if len(pending) >= max_in_flight:
+                yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+    finally:
+        stop.set()
+        for task in pending:
+            task.cancel()
+        # Unblock the decoder if it is waiting on a full queue
+        while not queue.empty():
+            queue.get_nowait()
@@ -0,0 +1,78 @@
+"""Tests for video_pipeline."""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+from video_pipeline import FrameSampler, iter_sampled_frames, run_pipeline
+
+
+def _write_video(path, frames=30, fps=10.0):
+    """Synthetic video: dark for the first half, bright for the second."""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (64, 48))
+    for i in range(frames):
+        writer.write(np.full((48, 64, 3), 20 if i < frames // 2 else 220, dtype=np.uint8))
+    writer.release()
+
+
+class VideoPipelineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "clip.avi")
+        _write_video(self.path)
+        if not cv2.VideoCapture(self.path).isOpened():
+            self.skipTest("OpenCV build cannot write/read MJPG")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_time_based_sampling(self):
+        stats = {}
+        frames = list(iter_sampled_frames(self.path, FrameSampler(sample_fps=2), stats))
+        self.assertEqual([index for index, _, _ in frames], [0, 5, 10, 15, 20, 25])
+        self.assertEqual(frames[1][1], 500.0)
+        self.assertEqual(frames[0][2].shape, (48, 64, 3))
+        self.assertEqual(stats["frames_decoded"], 30)
+
+    def test_scene_change_sampling(self):
+        frames = list(iter_sampled_frames(self.path, FrameSampler(sample_fps=0, scene_threshold=30)))
+        self.assertEqual([index for index, _, _ in frames], [0, 15])
+
+    def test_every_frame(self):
+        frames = list(iter_sampled_frames(self.path, FrameSampler(sample_fps=0)))
+        self.assertEqual(len(frames), 30)
+
+    def test_pipeline_keeps_frame_order(self):
+        async def detect(frame):
+            await asyncio.sleep(0.01 if frame.mean() < 100 else 0.0)  # dark frames finish later
+            return {"bright": bool(frame.mean() > 100)}
+
+        async def collect():
+            frames = iter_sampled_frames(self.path, FrameSampler(sample_fps=0))
+            return [item async for item in run_pipeline(frames, detect, max_in_flight=4, prefetch=2)]
+
+        results = asyncio.run(collect())
+        self.assertEqual([index for index, _, _ in results], list(range(30)))
+        self.assertEqual([r["bright"] for _, _, r in results], [False] * 15 + [True] * 15)
+
+    def test_pipeline_reports_per_frame_errors(self):
+        async def detect(frame):
+            raise RuntimeError("boom")
+
+        async def collect():
+            frames = iter([(0, 0.0, None), (1, 100.0, None)])
+            return [item async for item in run_pipeline(frames, detect)]
+
+        results = asyncio.run(collect())
+        self.assertEqual(len(results), 2)
+        self.assertIsInstance(results[0][2], RuntimeError)
+
+
+if __name__ == "__main__":
+    unittest.main()
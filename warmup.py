@@ -0,0 +1,157 @@
+"""
+Warm-up inference after a model is loaded.
+
+TF initialises kernels and allocates most of its buffers lazily, on the
+first session run with a given input shape, so the first real request
+after a deploy or a reload pays several seconds on top of its own
+inference. ModelWarmup runs a few synthetic batches at the resolutions the
+service expects before a model is registered, i.e. before it takes
+requests and MODEL_LOADED flips, and keeps the per-model warm-up timings
+for /health and /status.
+
+Inputs go through the same resize policy as uploads, so the warm-up sees
+the shapes that will really be fed. A worker pool gets one batch per
+worker per run, since every worker process has its own TF runtime, and a
+worker the pool restarts after a crash is warmed up again (warm_worker)
+before it takes requests.
+"""
+import os
+import threading
+import time
+
+import numpy as np
+
+STATE_WARMING = "warming"
+STATE_READY = "ready"
+STATE_FAILED = "failed"
+STATE_SKIPPED = "skipped"
+
+
+def parse_sizes(text):
+    """Parse "HEIGHTxWIDTH,HEIGHTxWIDTH" into [(height, width), ...]."""
+    sizes = []
+    for item in text.split(","):
+        if item.strip():
+            height, width = item.strip().lower().split("x")
+            sizes.append((int(height), int(width)))
+    return sizes
+
+
+class ModelWarmup:
+    """
+    Synthetic warm-up runs per model.
+    :param sizes: (height, width) input resolutions to warm up
+    :param runs: runs per size and batch size (the first is the cold one)
+    :param batch_sizes: batch sizes to warm up; match BATCH_MAX_SIZE when requests are batched
+    :param enabled: False skips the warm-up and marks models ready right away
+    :param target_size: the resize policy's target_size(width, height, model_name), or None
+    """
+
+    def __init__(self, sizes=((480, 640), (720, 1280)), runs=2, batch_sizes=(1,), enabled=True,
+                 target_size=None):
+        self.sizes = [tuple(size) for size in sizes]
+        self.runs = max(1, int(runs))
+        self.batch_sizes = [max(1, int(b)) for b in batch_sizes]
+        self.enabled = enabled
+        self.target_size = target_size
+        self._lock = threading.Lock()
+        self._models = {}
+
+    @classmethod
+    def from_env(cls, target_size=None):
+        """Build a warm-up from WARMUP (on/off), WARMUP_SIZES, WARMUP_RUNS and WARMUP_BATCH_SIZES."""
+        return cls(
+            sizes=parse_sizes(os.environ.get("WARMUP_SIZES", "480x640,720x1280")),
+            runs=int(os.environ.get("WARMUP_RUNS", 2)),
+            batch_sizes=[int(b) for b in os.environ.get("WARMUP_BATCH_SIZES", "1").split(",") if b.strip()],
+            enabled=os.environ.get("WARMUP", "1").lower() not in ("0", "false", "no"),
+            target_size=target_size,
+        )
+
+    def input_shapes(self, model_name=None):
+        """Distinct (height, width) tensors the warm-up feeds to `model_name`, after resizing."""
+        shapes = []
+        for height, width in self.sizes:
+            size = self.target_size(width, height, model_name) if self.target_size else None
+            shape = (size[1], size[0]) if size else (height, width)
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
+
+    def _batches(self, model_name):
+        """The synthetic warm-up batches of `model_name`, in run order."""
+        rng = np.random.RandomState(0)
+        for height, width in self.input_shapes(model_name):
+            for batch_size in self.batch_sizes:
+                batch = rng.randint(0, 256, (batch_size, height, width, 3), dtype=np.uint8)
+                for _ in range(self.runs):
+                    yield batch
+
+    def run(self, model_name, backend):
+        """
+        Warm up a freshly loaded backend; blocks until done. A failed run is recorded,
+        not raised: the model is still served, only without the warm-up.
+        :param backend: an InferenceEngine or InferenceWorkerPool (anything with run_batch;
+                        run_on_each is used instead when the backend has it)
+        :return: the warm-up record of `model_name`
+        """
+        record = {"state": STATE_WARMING if self.enabled else STATE_SKIPPED, "runs": [], "total_ms": None,
+                  "error": None}
+        with self._lock:
+            self._models[model_name] = record
+        if not self.enabled:
+            return record
+
+        # A worker pool runs every batch on each worker, since each has its own TF runtime
+        run = getattr(backend, "run_on_each", None) or backend.run_batch
+        started = time.perf_counter()
+        try:
+            for batch in self._batches(model_name):
+                run_started = time.perf_counter()
+                run(batch)
+                elapsed_ms = round((time.perf_counter() - run_started) * 1000.0, 1)
+                with self._lock:
+                    record["runs"].append({"shape": list(batch.shape[:3]), "ms": elapsed_ms})
+            state, error = STATE_READY, None
+        except Exception as e:
+            state, error = STATE_FAILED, str(e)
+        with self._lock:
+            record.update(state=state, error=error, total_ms=round((time.perf_counter() - started) * 1000.0, 1))
+        return record
+
+    def warm_worker(self, model_name, run_batch):
+        """
+        Warm up one restarted worker of a pool that is already serving `model_name`.
+        The model stays ready meanwhile, only its "worker_rewarms" count goes up; a
+        failure is raised.
+        :param run_batch: runs one batch on that worker only
+        :return: warm-up time in ms
+        """
+        if not self.enabled:
+            return 0.0
+        started = time.perf_counter()
+        for batch in self._batches(model_name):
+            run_batch(batch)
+        elapsed_ms = round((time.perf_counter() - started) * 1000.0, 1)
+        with self._lock:
+            record = self._models.get(model_name)
+            if record is not None:
+                record["worker_rewarms"] = record.get("worker_rewarms", 0) + 1
+        return elapsed_ms
+
+    def is_warming(self, model_name=None):
+        """Whether `model_name` (or any model, when None) is being warmed up right now."""
+        with self._lock:
+            records = [self._models.get(model_name)] if model_name else list(self._models.values())
+        return any(record is not None and record["state"] == STATE_WARMING for record in records)
+
+    def stats(self):
+        with self._lock:
+            models = {name: dict(record, runs=list(record["runs"])) for name, record in self._models.items()}
+        return {
+            "enabled": self.enabled,
+            "sizes": [f"{height}x{width}" for height, width in self.sizes],
+            "runs": self.runs,
+            "batch_sizes": self.batch_sizes,
+            "models": models,
+        }
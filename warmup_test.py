@@ -0,0 +1,119 @@
+"""Tests for warmup."""
+
+import os
+import threading
+import unittest
+
+from warmup import STATE_FAILED, STATE_READY, STATE_SKIPPED, STATE_WARMING, ModelWarmup, parse_sizes
+
+
+class _Engine:
+
+    def __init__(self, fail=False):
+        self.shapes = []
+        self.fail = fail
+
+    def run_batch(self, batch):
+        if self.fail:
+            raise RuntimeError("session broke")
+        self.shapes.append(batch.shape)
+        return None, None, None, None
+
+
+class _Pool(_Engine):
+
+    def __init__(self, num_workers=3):
+        super().__init__()
+        self.per_worker = [0] * num_workers
+
+    def run_on_each(self, batch):
+        for index in range(len(self.per_worker)):
+            self.per_worker[index] += 1
+        return [self.run_batch(batch) for _ in self.per_worker]
+
+
+class ModelWarmupTest(unittest.TestCase):
+
+    def test_runs_every_size_batch_size_and_repeat(self):
+        warmup = ModelWarmup(sizes=[(480, 640), (720, 1280)], runs=2, batch_sizes=[1, 4])
+        engine = _Engine()
+        record = warmup.run("ssd", engine)
+        self.assertEqual(record["state"], STATE_READY)
+        self.assertEqual(engine.shapes, [(1, 480, 640, 3)] * 2 + [(4, 480, 640, 3)] * 2 +
+                         [(1, 720, 1280, 3)] * 2 + [(4, 720, 1280, 3)] * 2)
+        self.assertEqual([run["shape"] for run in record["runs"]][:2], [[1, 480, 640]] * 2)
+        self.assertIsNotNone(record["total_ms"])
+        self.assertEqual(warmup.stats()["models"]["ssd"]["state"], STATE_READY)
+
+    def test_shapes_follow_resize_policy(self):
+        # A policy that feeds everything at 300x300 collapses both sizes into one shape
+        warmup = ModelWarmup(sizes=[(480, 640), (720, 1280)], runs=1,
+                             target_size=lambda width, height, model_name: (300, 300))
+        engine = _Engine()
+        warmup.run("ssd", engine)
+        self.assertEqual(engine.shapes, [(1, 300, 300, 3)])
+
+    def test_worker_pool_gets_one_batch_per_worker(self):
+        pool = _Pool()
+        ModelWarmup(sizes=[(100, 100)], runs=2).run("rcnn", pool)
+        self.assertEqual(pool.per_worker, [2, 2, 2])
+
+    def test_warm_worker_leaves_readiness_alone(self):
+        warmup = ModelWarmup(sizes=[(100, 100)], runs=2)
+        warmup.run("rcnn", _Engine())
+        worker = _Engine()
+        warmup.warm_worker("rcnn", worker.run_batch)
+        self.assertEqual(worker.shapes, [(1, 100, 100, 3)] * 2)
+        record = warmup.stats()["models"]["rcnn"]
+        self.assertEqual((record["state"], len(record["runs"]), record["worker_rewarms"]), (STATE_READY, 2, 1))
+        with self.assertRaises(RuntimeError):
+            warmup.warm_worker("rcnn", _Engine(fail=True).run_batch)
+
+    def test_failure_is_recorded_not_raised(self):
+        warmup = ModelWarmup(sizes=[(100, 100)])
+        record = warmup.run("rcnn", _Engine(fail=True))
+        self.assertEqual(record["state"], STATE_FAILED)
+        self.assertIn("session broke", record["error"])
+        self.assertFalse(warmup.is_warming())
+
+    def test_is_warming_while_running(self):
+        warmup = ModelWarmup(sizes=[(10, 10)], runs=1)
+        started, release = threading.Event(), threading.Event()
+
+        class Blocking(_Engine):
+            def run_batch(self, batch):
+                started.set()
+                release.wait(5)
+
+        thread = threading.Thread(target=warmup.run, args=("rcnn", Blocking()))
+        thread.start()
+        self.assertTrue(started.wait(5))
+        self.assertTrue(warmup.is_warming())
+        self.assertTrue(warmup.is_warming("rcnn"))
+        self.assertFalse(warmup.is_warming("ssd"))
+        self.assertEqual(warmup.stats()["models"]["rcnn"]["state"], STATE_WARMING)
+        release.set()
+        thread.join(5)
+        self.assertFalse(warmup.is_warming())
+
+    def test_disabled_and_from_env(self):
+        os.environ["WARMUP"] = "0"
+        os.environ["WARMUP_SIZES"] = "300x300, 600X1024"
+        os.environ["WARMUP_BATCH_SIZES"] = "1,8"
+        try:
+            warmup = ModelWarmup.from_env()
+        finally:
+            for name in ("WARMUP", "WARMUP_SIZES", "WARMUP_BATCH_SIZES"):
+                del os.environ[name]
+        self.assertEqual(warmup.sizes, [(300, 300), (600, 1024)])
+        self.assertEqual(warmup.batch_sizes, [1, 8])
+        engine = _Engine()
+        self.assertEqual(warmup.run("ssd", engine)["state"], STATE_SKIPPED)
+        self.assertEqual(engine.shapes, [])
+
+    def test_parse_sizes(self):
+        self.assertEqual(parse_sizes("480x640,,720x1280"), [(480, 640), (720, 1280)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,338 @@
+"""
+Multi-process inference worker pool.
+
+The API process owns no TF session in this mode. It starts `num_workers`
+worker processes that each load the frozen graph, build their own session,
+and serve batches sent over a pipe. Batches are dispatched to the
+least-loaded live worker, ties broken round-robin.
+
+TF sessions are not fork-safe once their thread pools exist, so workers are
+started with the `spawn` method by default and never inherit a live session.
+Every worker therefore holds its own copy of the decoded weights, and memory
+grows by one model per worker. The pool measures the first worker's RSS and
+starts only as many workers as fit in the container's memory limit (or the
+available memory), so a large INFERENCE_PROCESSES cannot overcommit a small
+instance.
+"""
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+
+from inference_engine import InferenceEngine
+from memory_governor import available_memory_bytes, container_memory_limit_bytes, current_rss_bytes, process_rss_bytes
+from prepare_model import keep_weights_quantized
+
+# Room for activations on top of a freshly loaded worker's RSS
+WORKER_MEMORY_HEADROOM = 1.5
+
+
+class WorkerPoolError(RuntimeError):
+    """Raised when a worker fails to start or dies while holding a batch."""
+
+
+def load_engine(model_path, inter_op_threads, intra_op_threads):
+    import tensorflow as tf
+
+    graph_def = tf.compat.v1.GraphDef()
+    with open(model_path, 'rb') as fid:
+        graph_def.ParseFromString(fid.read())
+
+    graph = tf.Graph()
+    with graph.as_default():
+        tf.import_graph_def(graph_def, name='')
+    del graph_def
+
+    config = tf.compat.v1.ConfigProto()
+    config.allow_soft_placement = True
+    config.inter_op_parallelism_threads = inter_op_threads
+    config.intra_op_parallelism_threads = intra_op_threads
+    keep_weights_quantized(config, model_path)
+    sess = tf.compat.v1.Session(graph=graph, config=config)
+    return InferenceEngine(graph, sess, name=os.path.basename(os.path.dirname(model_path)))
+
+
+def _worker_main(conn, model_path, inter_op_threads, intra_op_threads):
+    """Entry point of a worker process: load the graph, then serve batches until EOF."""
+    try:
+        engine = load_engine(model_path, inter_op_threads, intra_op_threads)
+    except Exception as e:
+        traceback.print_exc()
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        return
+    conn.send(("ready", os.getpid()))
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        job_id, batch = message
+        try:
+            outputs = engine.run_batch(batch)
+            conn.send((job_id, True, outputs))
+        except Exception as e:
+            conn.send((job_id, False, f"{type(e).__name__}: {e}"))
+    engine.close()
+
+
+def workers_that_fit(requested, worker_bytes, budget_bytes):
+    """
+    Number of workers to run once the first one is up: at most `requested`, at least one.
+    :param worker_bytes: estimated memory of one worker
+    :param budget_bytes: memory left for the additional workers (None when unknown: no cap)
+    """
+    requested = max(1, int(requested))
+    if budget_bytes is None or not worker_bytes:
+        return requested
+    return 1 + min(requested - 1, int(budget_bytes // worker_bytes))
+
+
+def worker_memory_from_env():
+    """INFERENCE_WORKER_MEMORY_MB env var: per-worker memory estimate overriding the measured one."""
+    value = os.environ.get('INFERENCE_WORKER_MEMORY_MB')
+    return int(float(value) * 1024 * 1024) if value else None
+
+
+class _Worker:
+    def __init__(self, index, process, conn):
+        self.index = index
+        self.process = process
+        self.conn = conn
+        self.pid = process.pid
+        self.outstanding = {}
+        self.completed = 0
+        self.send_lock = threading.Lock()
+        self.alive = True
+
+
+class InferenceWorkerPool:
+    """
+    Pool of inference worker processes, each with its own copy of the frozen graph.
+    :param model_path: path to frozen_inference_graph.pb
+    :param num_workers: number of worker processes requested; start() may run fewer
+                        when they would not fit in memory
+    :param inter_op_threads: TF inter-op threads per worker
+    :param intra_op_threads: TF intra-op threads per worker
+    :param start_method: multiprocessing start method ('spawn' by default)
+    :param warmup: optional callable(run_batch) run on a restarted worker before it takes
+                   requests; run_batch runs one batch on that worker only
+    """
+
+    def __init__(self, model_path, num_workers, inter_op_threads=1, intra_op_threads=1,
+                 start_method="spawn", warmup=None):
+        self.model_path = model_path
+        self.num_workers = max(1, int(num_workers))
+        self.inter_op_threads = inter_op_threads
+        self.intra_op_threads = intra_op_threads
+        self._context = multiprocessing.get_context(start_method)
+        self._workers = []
+        self._lock = threading.Lock()
+        self._job_ids = itertools.count()
+        self._round_robin = itertools.count()
+        self._closed = False
+        self._restarts = 0
+        self.requested_workers = self.num_workers
+        self.worker_bytes = None
+        self.warmup = warmup
+
+    def start(self, timeout=600):
+        """
+        Start the workers and wait until each one has its session ready. The first
+        worker's RSS sizes the rest: num_workers is lowered to what fits in memory.
+        """
+        if not os.path.exists(self.model_path):
+            raise WorkerPoolError(f"Model file not found: {self.model_path}")
+        first = self._spawn(0, timeout)
+        self._workers.append(first)
+        self.worker_bytes = worker_memory_from_env() or \
+            int((process_rss_bytes(first.pid) or 0) * WORKER_MEMORY_HEADROOM)
+        requested = self.num_workers
+        self.num_workers = workers_that_fit(requested, self.worker_bytes, self._memory_budget())
+        if self.num_workers < requested:
+            print(f"⚠️ Starting {self.num_workers} of {requested} inference workers: each needs about "
+                  f"{self.worker_bytes / 1e6:.0f} MB and the rest would not fit in memory")
+        for index in range(1, self.num_workers):
+            self._workers.append(self._spawn(index, timeout))
+
+    def _memory_budget(self):
+        """Memory left for additional workers, or None when it cannot be determined."""
+        limit = container_memory_limit_bytes()
+        if limit is None:
+            available = available_memory_bytes()
+            return int(available * 0.9) if available is not None else None
+        used = (current_rss_bytes() or 0) + self.worker_bytes * len(self._workers)
+        return max(0, int(limit * 0.9) - used)
+
+    def _spawn(self, index, timeout):
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(child_conn, self.model_path, self.inter_op_threads, self.intra_op_threads),
+            name=f"inference-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        try:
+            if not parent_conn.poll(timeout):
+                process.terminate()
+                process.join(5)
+                raise WorkerPoolError(f"Worker {index} did not become ready within {timeout}s")
+            try:
+                status, detail = parent_conn.recv()
+            except (EOFError, OSError):
+                # poll() also returns when the child dies before its handshake (OOM kill, crash in TF import)
+                process.join(5)
+                raise WorkerPoolError(f"Worker {index} exited before it was ready (exit code {process.exitcode})")
+            if status != "ready":
+                process.join(5)
+                raise WorkerPoolError(f"Worker {index} failed to load the model: {detail}")
+        except WorkerPoolError:
+            parent_conn.close()
+            raise
+        worker = _Worker(index, process, parent_conn)
+        threading.Thread(target=self._reader, args=(worker,), name=f"inference-reader-{index}", daemon=True).start()
+        print(f"✅ Inference worker {index} ready (pid {worker.pid})")
+        return worker
+
+    def _pick_worker(self):
+        live = [w for w in self._workers if w.alive]
+        if not live:
+            raise WorkerPoolError("No live inference workers")
+        offset = next(self._round_robin)
+        ordered = live[offset % len(live):] + live[:offset % len(live)]
+        return min(ordered, key=lambda w: len(w.outstanding))
+
+    def submit(self, batch, worker_index=None):
+        """
+        Send one batch to the least-loaded worker, or to worker `worker_index`.
+        :param batch: uint8 array [N, H, W, 3]
+        :return: Future resolving to (boxes, scores, classes, num)
+        """
+        with self._lock:
+            if self._closed:
+                raise WorkerPoolError("Worker pool is shut down")
+            worker = self._pick_worker() if worker_index is None else self._workers[worker_index]
+            job_id, future = self._register(worker)
+        return self._send(worker, job_id, future, batch)
+
+    def _run_on(self, worker, batch):
+        """Blocking run of one batch on `worker`, also before it has joined the pool."""
+        with self._lock:
+            job_id, future = self._register(worker)
+        return self._send(worker, job_id, future, batch).result()
+
+    def _register(self, worker):
+        # Called with self._lock held, which _handle_exit also holds while failing a dead worker's jobs
+        if not worker.alive:
+            raise WorkerPoolError(f"Worker {worker.index} is not running")
+        future = Future()
+        job_id = next(self._job_ids)
+        worker.outstanding[job_id] = future
+        return job_id, future
+
+    def _send(self, worker, job_id, future, batch):
+        try:
+            with worker.send_lock:
+                worker.conn.send((job_id, batch))
+        except (OSError, EOFError) as e:
+            with self._lock:
+                worker.outstanding.pop(job_id, None)
+            future.set_exception(WorkerPoolError(f"Worker {worker.index} is unreachable: {e}"))
+        return future
+
+    def run_batch(self, batch):
+        """Blocking form of submit(), usable as a MicroBatcher run_batch."""
+        return self.submit(batch).result()
+
+    def run_on_each(self, batch):
+        """Run `batch` once on every live worker (e.g. to warm each one up); blocks until all are done."""
+        with self._lock:
+            indexes = [worker.index for worker in self._workers if worker.alive]
+        futures = [self.submit(batch, index) for index in indexes]
+        return [future.result() for future in futures]
+
+    def _reader(self, worker):
+        while True:
+            try:
+                job_id, ok, payload = worker.conn.recv()
+            except (EOFError, OSError):
+                break
+            with self._lock:
+                future = worker.outstanding.pop(job_id, None)
+                worker.completed += 1
+            if future is None:
+                continue
+            if ok:
+                future.set_result(tuple(payload))
+            else:
+                future.set_exception(WorkerPoolError(payload))
+        self._handle_exit(worker)
+
+    def _handle_exit(self, worker):
+        with self._lock:
+            worker.alive = False
+            orphaned = list(worker.outstanding.values())
+            worker.outstanding.clear()
+            closed = self._closed
+        for future in orphaned:
+            future.set_exception(WorkerPoolError(f"Worker {worker.index} exited while processing a batch"))
+        if closed:
+            return
+        print(f"⚠️ Inference worker {worker.index} (pid {worker.pid}) exited, restarting...")
+        try:
+            replacement = self._spawn(worker.index, timeout=600)
+        except Exception:
+            traceback.print_exc()
+            return
+        if self.warmup is not None:
+            # Warm it up before dispatch can reach it, or the next request pays TF's lazy initialisation
+            try:
+                self.warmup(lambda batch: self._run_on(replacement, batch))
+            except Exception:
+                traceback.print_exc()
+                print(f"⚠️ Warm-up of restarted worker {worker.index} failed, serving it cold")
+        with self._lock:
+            self._workers[worker.index] = replacement
+            self._restarts += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": [
+                    {
+                        "index": w.index,
+                        "pid": w.pid,
+                        "alive": w.alive,
+                        "outstanding": len(w.outstanding),
+                        "completed": w.completed,
+                        "rss_mb": round((process_rss_bytes(w.pid) or 0) / 1e6, 1),
+                    }
+                    for w in self._workers
+                ],
+                "requested_workers": self.requested_workers,
+                "worker_mb_estimate": round(self.worker_bytes / 1e6, 1) if self.worker_bytes else None,
+                "restarts": self._restarts,
+            }
+
+    def shutdown(self, timeout=10):
+        with self._lock:
+            self._closed = True
+            workers = list(self._workers)
+        for worker in workers:
+            try:
+                with worker.send_lock:
+                    worker.conn.send(None)
+            except (OSError, EOFError):
+                pass
+        deadline = time.monotonic() + timeout
+        for worker in workers:
+            worker.process.join(max(0.0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                worker.process.terminate()
@@ -0,0 +1,113 @@
+"""Tests for worker_pool (the parts that do not need TensorFlow)."""
+
+import multiprocessing
+import os
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+
+from memory_governor import current_rss_bytes, process_rss_bytes
+from worker_pool import InferenceWorkerPool, WorkerPoolError, _Worker, workers_that_fit
+
+_MB = 1024 * 1024
+
+
+class WorkersThatFitTest(unittest.TestCase):
+
+    def test_caps_by_memory_budget(self):
+        # Two more 600 MB workers fit in 1.3 GB next to the first one
+        self.assertEqual(workers_that_fit(8, 600 * _MB, 1300 * _MB), 3)
+        self.assertEqual(workers_that_fit(2, 600 * _MB, 1300 * _MB), 2)
+
+    def test_always_keeps_the_first_worker(self):
+        self.assertEqual(workers_that_fit(4, 600 * _MB, 0), 1)
+        self.assertEqual(workers_that_fit(0, 600 * _MB, 0), 1)
+
+    def test_unknown_budget_or_size_does_not_cap(self):
+        self.assertEqual(workers_that_fit(4, 600 * _MB, None), 4)
+        self.assertEqual(workers_that_fit(4, 0, 100), 4)
+
+    @unittest.skipIf(current_rss_bytes() is None, "RSS not readable on this platform")
+    def test_process_rss_bytes(self):
+        self.assertGreater(process_rss_bytes(os.getpid()), 0)
+        self.assertIsNone(process_rss_bytes(2 ** 31))
+
+
+def _fake_worker(pool, index):
+    """A _Worker whose 'process' is a thread answering each batch with (worker index, batch shape)."""
+    parent_conn, child_conn = multiprocessing.Pipe()
+
+    def serve():
+        while True:
+            message = child_conn.recv()
+            if message is None:
+                break
+            job_id, batch = message
+            child_conn.send((job_id, True, (index, batch.shape)))
+
+    threading.Thread(target=serve, daemon=True).start()
+    worker = _Worker(index, SimpleNamespace(pid=1000 + index), parent_conn)
+    threading.Thread(target=pool._reader, args=(worker,), daemon=True).start()
+    return worker
+
+
+class DispatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = InferenceWorkerPool("unused.pb", num_workers=3)
+        self.pool._workers = [_fake_worker(self.pool, index) for index in range(3)]
+
+    def tearDown(self):
+        self.pool._closed = True
+        for worker in self.pool._workers:
+            worker.conn.send(None)
+
+    def test_run_on_each_reaches_every_live_worker(self):
+        self.pool._workers[1].alive = False
+        batch = np.zeros((2, 4, 4, 3), dtype=np.uint8)
+        self.assertEqual(self.pool.run_on_each(batch), [(0, (2, 4, 4, 3)), (2, (2, 4, 4, 3))])
+
+    def test_submit_to_a_given_worker(self):
+        batch = np.zeros((1, 4, 4, 3), dtype=np.uint8)
+        self.assertEqual(self.pool.submit(batch, worker_index=2).result(5), (2, (1, 4, 4, 3)))
+        self.pool._workers[2].alive = False
+        with self.assertRaises(WorkerPoolError):
+            self.pool.submit(batch, worker_index=2)
+
+    def test_restarted_worker_is_warmed_up_before_it_rejoins(self):
+        replacement = _fake_worker(self.pool, 1)
+        self.pool._spawn = lambda index, timeout: replacement
+        warmed = []
+
+        def warmup(run_batch):
+            # Not dispatchable yet, but reachable through run_batch
+            self.assertNotIn(replacement, self.pool._workers)
+            warmed.append(run_batch(np.zeros((1, 8, 8, 3), dtype=np.uint8)))
+
+        self.pool.warmup = warmup
+        crashed = self.pool._workers[1]
+        crashed.alive = False
+        self.pool._handle_exit(crashed)
+        self.assertEqual(warmed, [(1, (1, 8, 8, 3))])
+        self.assertIs(self.pool._workers[1], replacement)
+
+
+def _die_before_handshake(conn, *args):
+    os._exit(3)
+
+
+class SpawnTest(unittest.TestCase):
+
+    @unittest.skipUnless("fork" in multiprocessing.get_all_start_methods(), "needs the fork start method")
+    def test_worker_dying_before_handshake_raises_pool_error(self):
+        pool = InferenceWorkerPool("unused.pb", num_workers=1, start_method="fork")
+        with mock.patch("worker_pool._worker_main", _die_before_handshake):
+            with self.assertRaisesRegex(WorkerPoolError, "exit code 3"):
+                pool._spawn(0, timeout=30)
+
+
+if __name__ == "__main__":
+    unittest.main()